@@ -0,0 +1,199 @@
+"""Benchmarks of indexing a synthetic database.
+
+Generates a database with `knowviz.corpus.generate_database` in a temporary directory and measures rescans (cold,
+no-op, single changed file), the start-up of a no-op rescan with the `knowviz` command in a new process, loading and
+saving indices, keyword matching, YAML I/O and directory scans. Results are written as JSON, e.g. to compare versions:
+
+    python benchmarks/bench_indexing.py --models 2000 --output results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# the benchmarks run against the working tree they are part of, also if knowviz is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import knowviz
+from knowviz import git
+from knowviz.corpus import generate_database
+from knowviz.index import KeywordIndex, RelationIndex
+from knowviz.io import read_yaml_file, write_yaml_file, scan_directory
+
+
+def measure(run, setup=None, repeat: int = 5) -> dict:
+    """Time `run` (after calling `setup` each time, which is not timed) and return statistics in seconds."""
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if argument is None:
+                run()
+            else:
+                run(argument)
+            times.append(time.perf_counter() - start)
+    return dict(min=min(times), median=statistics.median(times), max=max(times), runs=repeat)
+
+
+def backdate(directory: str, seconds: float = 3600):
+    """Set the modification time of all files to the past, as for documents that are not currently edited."""
+    mtime = time.time() - seconds
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), (mtime, mtime))
+
+
+class Database:
+
+    def __init__(self, directory: str, workers: int = 1):
+        self.directory = directory
+        self.workers = workers
+        self.metadata = os.path.join(directory, "metadata")
+        self.quantities_file = os.path.join(self.metadata, "quantities.yml")
+        self.models_file = os.path.join(self.metadata, "models.yml")
+
+    def clear(self):
+        shutil.rmtree(self.metadata)
+        os.makedirs(self.metadata)
+
+    def new_indices(self) -> RelationIndex:
+        quantities = KeywordIndex(datadir=os.path.join(self.directory, "quantities"))
+        quantities.filename = self.quantities_file
+        models = RelationIndex(quantities, datadir=os.path.join(self.directory, "models"), data_file_ext=".tex")
+        models.filename = self.models_file
+        return models
+
+    def load_indices(self) -> RelationIndex:
+        quantities = KeywordIndex(self.quantities_file)
+        return RelationIndex(quantities, self.models_file, data_file_ext=".tex")
+
+    def rescan(self, models: RelationIndex):
+        models.keywords.rescan_documents(overwrite_file=True)
+        models.rescan_documents(overwrite_file=True, workers=self.workers)
+
+    def command(self, *args: str) -> list:
+        """Command line that runs `knowviz.cli.main` in a new interpreter like the `knowviz` console script, but with the
+        knowviz of this working tree (see `run_process`) instead of an installed one."""
+        script = "import sys; from knowviz.cli import main; sys.exit(main(sys.argv[1:]))"
+        return [sys.executable, "-c", script, *args]
+
+
+def run_process(command: list, **environment: str):
+    """Run a command in a new Python process that finds this version of knowviz and may write bytecode."""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(knowviz.__file__))),
+               **environment)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def run_benchmarks(directory: str, repeat: int = 5, workers: int = 1, **corpus) -> dict:
+    summary = generate_database(directory, **corpus)
+    backdate(directory)
+    database = Database(directory, workers)
+    models_dir = os.path.join(directory, "models")
+    results = dict()
+
+    results["scan_directory"] = measure(lambda: list(scan_directory(models_dir, ".tex")), repeat=repeat)
+
+    def cold_setup():
+        database.clear()
+        return database.new_indices()
+    results["rescan_cold"] = measure(database.rescan, cold_setup, repeat=repeat)
+
+    results["rescan_noop"] = measure(database.rescan, database.load_indices, repeat=repeat)
+
+    changed_file = os.path.join(models_dir, "m0.tex")
+    original = open(changed_file).read()
+
+    def change_setup():
+        models = database.load_indices()
+        with open(changed_file, "w") as file:
+            file.write(original + f"\n{time.perf_counter()}\n")
+        return models
+    results["rescan_single_change"] = measure(database.rescan, change_setup, repeat=repeat)
+
+    # start-up of short-lived processes, e.g. in git hooks, compared to the Python interpreter alone
+    arguments = ("rescan", database.quantities_file, database.models_file, "--extension", ".tex")
+    cache_dir = os.path.join(directory, "cache")
+    command = database.command(*arguments)
+    run_process(command, KNOWVIZ_CACHE_DIR=cache_dir)
+    results["command_rescan_noop"] = measure(lambda: run_process(command, KNOWVIZ_CACHE_DIR=cache_dir),
+                                             repeat=repeat)
+    uncached = database.command("--no-cache", *arguments)
+    results["command_rescan_noop_uncached"] = measure(lambda: run_process(uncached), repeat=repeat)
+    results["python_startup"] = measure(lambda: run_process([sys.executable, "-c", "pass"]), repeat=repeat)
+
+    results["load_index"] = measure(database.load_indices, repeat=repeat)
+
+    snapshot = os.path.join(directory, "snapshot.yml")
+    results["save_index_full"] = measure(lambda models: models.save_to_file(snapshot), database.load_indices,
+                                         repeat=repeat)
+
+    def journal_setup():
+        models = database.load_indices()
+        models["m0"] = dict(models["m0"], checksum=str(time.perf_counter()))
+        return models
+    results["save_index_journal"] = measure(lambda models: models.save_to_file(), journal_setup, repeat=repeat)
+
+    results["read_yaml_file"] = measure(lambda: read_yaml_file(snapshot), repeat=repeat)
+    content = read_yaml_file(snapshot)
+    results["write_yaml_file"] = measure(lambda: write_yaml_file(snapshot, content), repeat=repeat)
+
+    models = database.load_indices()
+    documents = sorted(scan_directory(models_dir, ".tex"))[:20]
+
+    def find_references(backend: str):
+        for fname in documents:
+            models.find_keyword_references(fname, backend=backend)
+    models.matcher  # build matcher outside of the measurement
+    for backend in ("matcher", "pyparsing"):
+        results[f"find_keyword_references_{backend}"] = measure(lambda: find_references(backend), repeat=repeat)
+        results[f"find_keyword_references_{backend}"]["documents"] = len(documents)
+
+    return dict(corpus=summary, results=results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--keywords", type=int, default=500, help="number of keyword documents")
+    parser.add_argument("--models", type=int, default=1000, help="number of model documents")
+    parser.add_argument("--words", type=int, default=1000, help="average number of words per model")
+    parser.add_argument("--density", type=float, default=0.05, help="fraction of words that are keywords")
+    parser.add_argument("--tables", type=float, default=0.0, help="size of data tables relative to the text")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus generator")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs of each benchmark")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes used by rescans")
+    parser.add_argument("--output", default="", help="path/to/results.json (default: standard output)")
+    args = parser.parse_args(argv)
+
+    corpus = dict(keywords=args.keywords, models=args.models, words=args.words, density=args.density,
+                  tables=args.tables, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="knowviz-bench-") as directory:
+        report = run_benchmarks(directory, repeat=args.repeat, workers=args.workers, **corpus)
+
+    source = os.path.dirname(os.path.abspath(__file__))
+    report.update(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                  commit=git.head_commit(source),
+                  python=sys.version.split()[0],
+                  platform=platform.platform(),
+                  parameters=dict(corpus, repeat=args.repeat, workers=args.workers))
+
+    content = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(content + "\n")
+    else:
+        print(content)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Run the command line interface with `python -m knowviz`."""
+import sys as _sys
+
+from knowviz.cli import main
+
+_sys.exit(main())
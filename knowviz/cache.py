@@ -0,0 +1,153 @@
+"""Content-addressed on-disk cache of keyword references found in documents.
+"""
+import hashlib as _hashlib
+import json as _json
+import os as _os
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# increment if the format of cached results changes, which invalidates all existing entries
+_FORMAT = 1
+
+
+def default_cache_dir() -> str:
+    """Cache directory given by the environment variable KNOWVIZ_CACHE_DIR. Defaults to knowviz/ in the user's cache
+    directory (XDG_CACHE_HOME or ~/.cache)."""
+    directory = _os.environ.get("KNOWVIZ_CACHE_DIR", "")
+    if directory == "":
+        cache_home = _os.environ.get("XDG_CACHE_HOME", "") or _os.path.join(_os.path.expanduser("~"), ".cache")
+        directory = _os.path.join(cache_home, "knowviz")
+    return directory
+
+
+class ReferenceCache:
+
+    def __init__(self, directory: str = "", max_size: int = 256 * 2 ** 20):
+        """
+        Cache of `RelationIndex.analyse_document` results (keyword occurrences, terms and mentions), shared between all
+        indices, checkouts and branches of a database on this machine.
+
+        Entries are keyed on the checksum of a document and the fingerprint of the set of keywords and synonyms it has
+        been matched against. Each entry is a small JSON file. Reading an entry updates its modification time, which
+        is used to evict the least recently used entries once the cache grows beyond `max_size`.
+
+        Parameters
+        ----------
+        directory
+            (Optional) path/to/cache/directory. Default: see `default_cache_dir`
+        max_size
+            (Optional) maximum total size of all entries in bytes. Default: 256 MiB
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # total size of entries, determined on first write
+        self._size = None
+
+    def __getstate__(self):
+        # counters and size only refer to the process that owns the cache
+        return dict(directory=self.directory, max_size=self.max_size)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def key(checksum: str, fingerprint: str) -> str:
+        """Cache key of a document checksum and a keyword fingerprint."""
+        return _hashlib.sha1(f"{_FORMAT}:{checksum}:{fingerprint}".encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        """Path of the cache entry `key`."""
+        return _os.path.join(self.directory, key[:2], key[2:] + ".json")
+
+    def get(self, checksum: str, fingerprint: str) -> _t.Any:
+        """Cached analysis of a document or None if there is no entry."""
+        path = self.path(self.key(checksum, fingerprint))
+        try:
+            with open(path, "r") as file:
+                value = _json.load(file)
+            _os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def put(self, checksum: str, fingerprint: str, value: _t.Any):
+        """Store the analysis of a document (any JSON-serializable value). Evicts least recently used entries if the
+        cache is full."""
+        path = self.path(self.key(checksum, fingerprint))
+        dirname = _os.path.dirname(path)
+        _os.makedirs(dirname, exist_ok=True)
+
+        # write to a temporary file first, so that concurrent readers never see partial entries
+        import tempfile as _tempfile
+        fd, tmpname = _tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        with _os.fdopen(fd, "w") as file:
+            _json.dump(value, file)
+        _os.replace(tmpname, path)
+
+        if self._size is None:
+            self._size = self.stats()["size"]
+        else:
+            self._size += _os.path.getsize(path)
+
+        if self._size > self.max_size:
+            self.prune()
+
+    def _entries(self) -> _t.Iterator[_t.Tuple[str, _os.stat_result]]:
+        if not _os.path.isdir(self.directory):
+            return
+        for subdir in _os.listdir(self.directory):
+            subdir = _os.path.join(self.directory, subdir)
+            if not _os.path.isdir(subdir):
+                continue
+            for fname in _os.listdir(subdir):
+                if fname.endswith(".json"):
+                    path = _os.path.join(subdir, fname)
+                    try:
+                        yield path, _os.stat(path)
+                    except OSError:
+                        # removed by another process
+                        continue
+
+    def stats(self) -> dict:
+        """Number of entries, total size in bytes and hit/miss counters of this process."""
+        entries = 0
+        size = 0
+        for _, stat in self._entries():
+            entries += 1
+            size += stat.st_size
+        return dict(directory=self.directory, entries=entries, size=size, max_size=self.max_size,
+                    hits=self.hits, misses=self.misses)
+
+    def prune(self, max_size: int = None) -> int:
+        """Remove least recently used entries until the cache is not larger than `max_size` (default: the maximum size
+        of this cache). Returns the number of removed entries."""
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime_ns)
+        size = sum(stat.st_size for _, stat in entries)
+
+        removed = 0
+        for path, stat in entries:
+            if size <= max_size:
+                break
+            try:
+                _os.remove(path)
+            except OSError:
+                continue
+            size -= stat.st_size
+            removed += 1
+
+        self._size = size
+        return removed
+
+    def clear(self) -> int:
+        """Remove all entries. Returns the number of removed entries."""
+        return self.prune(max_size=0)
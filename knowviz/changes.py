@@ -0,0 +1,105 @@
+"""Change sets of index updates, e.g. for consumers that update incrementally.
+"""
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+ACTIONS = ("added", "modified", "removed", "renamed")
+# fields of an entry that only record the file stat of a document, changes of them alone are not reported
+_STAT_FIELDS = ("mtime_ns", "size", "inode")
+
+
+class Change(_t.NamedTuple):
+    """Change of one entry of an index. `old` is None for added entries, `new` is None for removed ones. Renamed
+    entries (a document that has been moved, i.e. removed and added with the same checksum) have the new key as `key`
+    and the previous one as `old_key`."""
+    action: str
+    kind: str
+    key: str
+    old: _t.Any = None
+    new: _t.Any = None
+    old_key: str = None
+
+
+def _content(value):
+    """Value without the file stat fields of an entry."""
+    if value is None or isinstance(value, str):
+        return value
+    return {field: item for field, item in value.items() if field not in _STAT_FIELDS}
+
+
+class ChangeSet:
+
+    def __init__(self, index_name: str, changes: _t.Iterable[Change] = ()):
+        """
+        Changes of an index since the previous change set: added, modified, removed and renamed entries with their old
+        and new values. A change set is true if it contains any change.
+
+        Parameters
+        ----------
+        index_name
+            name of the index that has changed
+        changes
+            (Optional) changes in the order of the keys of the index
+        """
+        self.index_name = index_name
+        self.changes = list(changes)
+
+    @classmethod
+    def from_values(cls, index_name: str, values: _t.Iterable[_t.Tuple[str, _t.Any, _t.Any]],
+                    kind: _t.Callable[[_t.Any], str]) -> "ChangeSet":
+        """Change set from (key, old value, new value) of each key that may have changed, where None stands for a
+        missing entry. Entries that are equal apart from their file stat are not reported. Removed and added entries
+        with the same checksum are reported as renamed. `kind` returns the kind of an entry from its value, e.g.
+        "keyword" or "synonym"."""
+        changes = []
+        for key, old, new in values:
+            if old is None and new is None or _content(old) == _content(new):
+                continue
+            action = "added" if old is None else "removed" if new is None else "modified"
+            changes.append(Change(action, kind(new if new is not None else old), key, old, new))
+
+        # documents that have been moved to another name
+        removed = {}
+        for change in changes:
+            if change.action == "removed" and not isinstance(change.old, str) and change.old.get("checksum"):
+                removed.setdefault((change.kind, change.old["checksum"]), []).append(change)
+        renamed = set()
+        for position, change in enumerate(changes):
+            if change.action != "added" or isinstance(change.new, str):
+                continue
+            candidates = removed.get((change.kind, change.new.get("checksum")))
+            if candidates:
+                previous = candidates.pop(0)
+                renamed.add(previous.key)
+                changes[position] = Change("renamed", change.kind, change.key, previous.old, change.new, previous.key)
+        changes = [change for change in changes if not (change.action == "removed" and change.key in renamed)]
+        return cls(index_name, changes)
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def __iter__(self) -> _t.Iterator[Change]:
+        return iter(self.changes)
+
+    def __repr__(self) -> str:
+        counts = ", ".join(f"{action}={len(self.filter(action))}" for action in ACTIONS)
+        return f"ChangeSet({self.index_name!r}, {counts})"
+
+    def filter(self, action: str = "", kind: str = "") -> _t.List[Change]:
+        """Changes with the given action and/or kind (all if empty)."""
+        return [change for change in self.changes
+                if (action == "" or change.action == action) and (kind == "" or change.kind == kind)]
+
+    def keys(self, kind: str = "") -> _t.Set[str]:
+        """Keys of all entries that have been added, modified, removed or renamed (old and new keys)."""
+        keys = set()
+        for change in self.filter(kind=kind):
+            keys.add(change.key)
+            if change.old_key is not None:
+                keys.add(change.old_key)
+        return keys
@@ -1,26 +1,31 @@
 """Function to handle citations in markdown
 """
+import re as _re
 import typing as _t
-import pyparsing as _pp
+
+from knowviz.io import scan_document
 
 __author__ = "Daniel Rose"
 __status__ = "Development"
 
+# \cite{reference} or \cite{reference, other}, where a reference starts with a letter and may contain letters, digits,
+# ".", "-" and "_"
+_REFERENCE = rb"[A-Za-z][A-Za-z0-9._-]*"
+CITATION = _re.compile(rb"\\cite\{\s*(" + _REFERENCE + rb"(?:\s*,\s*" + _REFERENCE + rb")*)\s*\}")
+_SEPARATOR = _re.compile(rb"\s*,\s*")
 
-def find_citations(filename: str):
-    """Find citations in a file specified by `path`"""
-    # create grammar
-
-    # grammar: \cite{content}
-    start = _pp.Suppress(r"\cite{")
-    end = _pp.Suppress("}")
-    reference = _pp.Word(_pp.alphas, _pp.alphanums + "." + "-" + "_")
-
-    citation = start + reference + end
-
-    skip = _pp.Suppress(_pp.SkipTo(start))
 
-    grammar = _pp.ZeroOrMore(skip + citation)
+def scan_citations(filename: str, chunk_size: int = 0) -> _t.Iterator[_t.Tuple[int, str]]:
+    """Iterate over (offset, reference) of all cited references in a file, where offset is the byte offset of the
+    citation (the same for all references of one citation). The file is memory-mapped (or read in chunks of
+    `chunk_size` bytes) instead of being read into memory at once."""
+    # citations longer than this are not found across chunk boundaries
+    overlap = 4096
+    for offset, match in scan_document(filename, CITATION, chunk_size, overlap):
+        for reference in _SEPARATOR.split(match.group(1)):
+            yield offset, reference.decode()
 
-    return grammar.parseFile(filename)
 
+def find_citations(filename: str) -> _t.List[str]:
+    """Find citations in a file specified by `path`"""
+    return [reference for _, reference in scan_citations(filename)]
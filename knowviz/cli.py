@@ -0,0 +1,182 @@
+"""Command line interface to rescan, query and export indices, e.g. in git hooks:
+
+    knowviz rescan data/metadata/quantities.yml data/metadata/models.yml
+    knowviz query data/metadata/quantities.yml data/metadata/models.yml q1 q2
+    knowviz stats data/metadata/quantities.yml data/metadata/models.yml
+    knowviz export data/metadata/models.yml models.sqlite
+
+Each subcommand only imports the modules it needs when it runs, so that short-lived invocations start quickly.
+"""
+import argparse as _argparse
+import sys as _sys
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+
+def _open_index(cls, filename: str, *args, **kwargs):
+    """Index loaded from `filename`, or a new index that will be saved to it (data directory defaults to the one
+    derived from the file name, see `Index.datadir`)."""
+    import os
+
+    if os.path.isfile(filename):
+        return cls(*args, filename=filename, **kwargs)
+    index = cls(*args, **kwargs)
+    index.filename = filename
+    return index
+
+
+def _open_indices(args: _argparse.Namespace, relations: _t.List[str]) -> tuple:
+    """Keyword index given by the arguments of a subcommand and the relation indices of the files `relations`."""
+    from knowviz.index import KeywordIndex, RelationIndex
+
+    keywords = _open_index(KeywordIndex, args.keywords, datadir=args.datadir)
+    relations = [_open_index(RelationIndex, filename, keywords, data_file_ext=args.extension,
+                             backend=getattr(args, "backend", "matcher"))
+                 for filename in relations]
+    return keywords, relations
+
+
+def _print_json(content):
+    import json
+
+    print(json.dumps(content, indent=2, sort_keys=True))
+
+
+def rescan(args: _argparse.Namespace) -> int:
+    keywords, relations = _open_indices(args, args.relations)
+    overwrite_file = not args.dry_run
+    # relation indices rescan their keyword index as well, but do not save it
+    reports = [keywords.rescan_documents(overwrite_file=overwrite_file, paranoid=args.paranoid, git=args.git)]
+    reports.extend(index.rescan_documents(overwrite_file=overwrite_file, workers=args.workers, paranoid=args.paranoid,
+                                          git=args.git)
+                   for index in relations)
+
+    if args.json:
+        _print_json([report.as_dict() for report in reports])
+    else:
+        for report in reports:
+            print(f"{'updated' if report.changed else 'unchanged'}: {report.summary()}")
+    return 1 if args.check and any(reports) else 0
+
+
+def query(args: _argparse.Namespace) -> int:
+    keywords, (relations,) = _open_indices(args, [args.relations])
+    try:
+        found = relations.find_relations(*args.names, mode=args.mode)
+    except KeyError as e:
+        print(f"Unknown keyword {e}.", file=_sys.stderr)
+        return 2
+    for relation in found:
+        print(relation)
+    return 0
+
+
+def stats(args: _argparse.Namespace) -> int:
+    keywords, relations = _open_indices(args, args.relations)
+    unique_keys = list(keywords.unique_keys())
+    content = dict(keywords=dict(name=keywords.name, unique_keys=len(unique_keys),
+                                 synonyms=len(keywords) - len(unique_keys)),
+                   relations=[])
+    for index in relations:
+        unused = sum(1 for key in unique_keys if key not in index.occurrences.keywords)
+        content["relations"].append(dict(name=index.name, relations=len(index), unused_keywords=unused,
+                                         suggested_synonyms=len(index.suggest_synonyms(k=None))))
+
+    if args.json:
+        _print_json(content)
+        return 0
+    print(f"{keywords.name}: {content['keywords']['unique_keys']} keywords, "
+          f"{content['keywords']['synonyms']} synonyms")
+    for entry in content["relations"]:
+        print(f"{entry['name']}: {entry['relations']} relations, {entry['unused_keywords']} keywords without "
+              f"relations, {entry['suggested_synonyms']} suggested synonyms")
+    return 0
+
+
+def export(args: _argparse.Namespace) -> int:
+    """Copy the entries of an index file to another file (YAML, SQLite or JSON), whose storage backend is chosen by
+    file extension (see `knowviz.storage.storage_for`), or print them as JSON."""
+    from knowviz.storage import storage_for
+
+    entries = storage_for(args.index).load()
+    if args.output == "-":
+        _print_json(entries)
+    else:
+        storage_for(args.output).save(entries)
+    return 0
+
+
+def _add_index_arguments(parser: _argparse.ArgumentParser):
+    parser.add_argument("keywords", help="path/to/keyword_index.yml")
+    parser.add_argument("relations", nargs="*", help="path/to/relation_index.yml")
+    parser.add_argument("--datadir", default="",
+                        help="directory of keyword documents (default: derived from the keyword index file name)")
+    parser.add_argument("--extension", default="", help="file extension of relation documents (default: all files)")
+
+
+def create_parser() -> _argparse.ArgumentParser:
+    parser = _argparse.ArgumentParser(prog="knowviz", description="Rescan, query and export knowviz indices.")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="log progress (-v) and timings of rescans (-vv) to standard error")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always parse YAML index files instead of loading cached JSON copies")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    parser_rescan = subparsers.add_parser("rescan", help="update indices from their documents")
+    _add_index_arguments(parser_rescan)
+    parser_rescan.add_argument("--workers", type=int, default=1, help="processes that parse relation documents")
+    parser_rescan.add_argument("--backend", choices=("matcher", "pyparsing"), default="matcher",
+                               help="engine used to find keywords in documents")
+    parser_rescan.add_argument("--paranoid", action="store_true", help="hash documents even if their stat is unchanged")
+    parser_rescan.add_argument("--git", action="store_true", help="only scan documents that git reports as changed")
+    parser_rescan.add_argument("--dry-run", action="store_true", help="do not save updated indices")
+    parser_rescan.add_argument("--check", action="store_true", help="exit with status 1 if an index has changed")
+    parser_rescan.add_argument("--json", action="store_true", help="print rescan reports as JSON")
+    parser_rescan.set_defaults(run=rescan)
+
+    parser_query = subparsers.add_parser("query", help="list relations that reference keywords or synonyms")
+    parser_query.add_argument("keywords", help="path/to/keyword_index.yml")
+    parser_query.add_argument("relations", help="path/to/relation_index.yml")
+    parser_query.add_argument("names", nargs="+", help="keywords or synonyms")
+    parser_query.add_argument("--mode", choices=("and", "or"), default="and",
+                              help="relations that reference all (and) or any (or) of the names")
+    parser_query.set_defaults(run=query, datadir="", extension="")
+
+    parser_stats = subparsers.add_parser("stats", help="print the size of indices")
+    _add_index_arguments(parser_stats)
+    parser_stats.add_argument("--json", action="store_true", help="print statistics as JSON")
+    parser_stats.set_defaults(run=stats)
+
+    parser_export = subparsers.add_parser("export", help="copy an index to another storage backend or to JSON")
+    parser_export.add_argument("index", help="path/to/index.yml")
+    parser_export.add_argument("output", help="path/to/output (.yml, .sqlite or .json), or - for standard output")
+    parser_export.set_defaults(run=export)
+    return parser
+
+
+def main(argv: _t.List[str] = None) -> int:
+    args = create_parser().parse_args(argv)
+    if args.verbose:
+        import logging
+        logging.basicConfig(level=logging.DEBUG if args.verbose > 1 else logging.INFO, stream=_sys.stderr,
+                            format="%(levelname)s %(name)s: %(message)s")
+
+    if not args.no_cache:
+        import os
+        from knowviz import storage
+        from knowviz.cache import default_cache_dir
+        storage.PARSED_CACHE_DIR = os.path.join(default_cache_dir(), "indices")
+
+    from knowviz import ParserError
+    try:
+        return args.run(args)
+    except ParserError as e:
+        print(e, file=_sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    _sys.exit(main())
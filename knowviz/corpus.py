@@ -0,0 +1,118 @@
+"""Generator of synthetic databases, e.g. for benchmarks.
+"""
+import os as _os
+import random as _random
+
+from knowviz.io import write_yaml_file
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+_SYLLABLES = ("ka", "to", "ri", "mu", "sen", "la", "vo", "ne", "qui", "dor", "pha", "zel", "ion", "tra", "gi", "bo")
+_FILLER = ("the", "of", "and", "is", "a", "to", "in", "that", "we", "with", "for", "as", "by", "on", "which", "this",
+           "model", "equation", "assume", "given", "where", "relation", "between", "therefore", "constant", "system",
+           "follows", "approximation", "boundary", "condition", "limit", "small", "large", "term", "order", "first")
+
+
+def _word(rng: _random.Random, syllables: int) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(syllables))
+
+
+def generate_database(directory: str, keywords: int = 100, models: int = 200, categories: int = 10,
+                      synonyms: int = 2, words: int = 500, density: float = 0.05, tables: float = 0.0,
+                      citations: int = 3, seed: int = 0) -> dict:
+    """
+    Write a synthetic database of keyword and model documents to `directory`:
+
+    - quantities/<category>/<keyword>.yml: keyword documents with synonyms and categories
+    - models/m<number>.tex: LaTeX documents that mention keywords (or their synonyms) between filler text, with
+      inline equations, citations and optional data tables
+    - metadata/: empty directory for index files
+
+    The same arguments always produce the same database.
+
+    Parameters
+    ----------
+    directory
+        path/to/database, created if it does not exist
+    keywords
+        (Optional) number of keyword documents. Default: 100
+    models
+        (Optional) number of model documents. Default: 200
+    categories
+        (Optional) number of keyword categories (subdirectories). Default: 10
+    synonyms
+        (Optional) maximum number of synonyms per keyword. Default: 2
+    words
+        (Optional) average number of words of a model document. Default: 500
+    density
+        (Optional) fraction of words in model documents that are keywords. Default: 0.05
+    tables
+        (Optional) size of a data table appended to model documents, relative to the text. Default: 0 (no table)
+    citations
+        (Optional) average number of citations per model document. Default: 3
+    seed
+        (Optional) seed of the random generator. Default: 0
+
+    Returns
+    -------
+    summary
+        dictionary with the number of keywords, synonyms, models and bytes written
+    """
+    rng = _random.Random(seed)
+    quantities_dir = _os.path.join(directory, "quantities")
+    models_dir = _os.path.join(directory, "models")
+    _os.makedirs(_os.path.join(directory, "metadata"), exist_ok=True)
+    _os.makedirs(models_dir, exist_ok=True)
+
+    category_names = [f"{_word(rng, 2)}{number}" for number in range(max(1, categories))]
+    names = []
+    synonym_count = 0
+    for number in range(keywords):
+        name = f"{_word(rng, rng.randint(1, 3))}_{number}"
+        aliases = [f"{_word(rng, 2)}{number}" for _ in range(rng.randint(0, synonyms))]
+        category = rng.choice(category_names)
+        names.append(name)
+        names.extend(aliases)
+        synonym_count += len(aliases)
+
+        category_dir = _os.path.join(quantities_dir, category)
+        _os.makedirs(category_dir, exist_ok=True)
+        write_yaml_file(_os.path.join(category_dir, f"{name}.yml"),
+                        dict(files=[], synonyms=aliases, categories=["quantities", category]))
+
+    size = 0
+    references = [f"{_word(rng, 2)}{year}" for year in range(1950, 1950 + max(1, 10 * citations))]
+    for number in range(models):
+        length = max(1, int(rng.gauss(words, words / 4)))
+        # every model mentions at least one keyword
+        title = f"Model {number} of {rng.choice(names)}" if names else f"Model {number}"
+        lines = ["\\documentclass{article}", "\\begin{document}", f"\\section{{{title}}}"]
+        line = []
+        for _ in range(length):
+            if names and rng.random() < density:
+                line.append(rng.choice(names))
+            elif rng.random() < 0.02:
+                line.append(f"${rng.choice(_FILLER)}_{{{rng.randint(0, 9)}}} = {rng.random():.3f}$")
+            else:
+                line.append(rng.choice(_FILLER))
+            if citations and rng.random() < citations / length:
+                line.append(f"\\cite{{{', '.join(rng.sample(references, rng.randint(1, 2)))}}}")
+            if len(line) >= 12:
+                lines.append(" ".join(line) + ("." if rng.random() < 0.5 else ","))
+                line = []
+        lines.append(" ".join(line))
+
+        rows = int(length * tables / 8)
+        if rows:
+            lines.append("\\begin{tabular}{llllllll}")
+            lines.extend(" & ".join(f"{rng.random():.6f}" for _ in range(8)) + " \\\\" for _ in range(rows))
+            lines.append("\\end{tabular}")
+        lines.append("\\end{document}")
+
+        content = "\n".join(lines) + "\n"
+        with open(_os.path.join(models_dir, f"m{number}.tex"), "w") as file:
+            file.write(content)
+        size += len(content.encode())
+
+    return dict(keywords=keywords, synonyms=synonym_count, models=models, bytes=size)
@@ -0,0 +1,84 @@
+"""Queries to the git repository that contains a database.
+"""
+import os as _os
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+
+class GitError(Exception):
+    pass
+
+
+def run_git(path: str, *args: str) -> str:
+    """Run a git command in directory `path` and return its output."""
+    # imported here, since the package is also used in short-lived processes that never run git
+    import shutil as _shutil
+    import subprocess as _subprocess
+
+    if _shutil.which("git") is None:
+        raise GitError("git is not installed.")
+    try:
+        result = _subprocess.run(("git", *args), cwd=path, stdout=_subprocess.PIPE, stderr=_subprocess.PIPE,
+                                 check=True)
+    except (OSError, _subprocess.CalledProcessError) as e:
+        raise GitError(f"git {' '.join(args)} failed in {path}.") from e
+    return result.stdout.decode()
+
+
+def head_commit(path: str) -> str:
+    """Hash of the commit checked out in the repository that contains `path`, or '' if there is none."""
+    try:
+        return run_git(path, "rev-parse", "--verify", "--quiet", "HEAD").strip()
+    except GitError:
+        return ""
+
+
+def is_dirty(path: str) -> bool:
+    """Check whether there are uncommitted or untracked files in `path` (and below)."""
+    return run_git(path, "status", "--porcelain", "--untracked-files=all", "--", ".").strip() != ""
+
+
+def commit_exists(path: str, commit: str) -> bool:
+    """Check whether `commit` is known to the repository that contains `path`."""
+    try:
+        run_git(path, "cat-file", "-e", f"{commit}^{{commit}}")
+    except GitError:
+        return False
+    return True
+
+
+def changed_files(path: str, since: str) -> _t.Tuple[_t.List[str], _t.List[str]]:
+    """Files in `path` (and below) that changed between commit `since` and HEAD.
+
+    Returns
+    -------
+    changed
+        paths of added, modified, copied or renamed files (new name)
+    removed
+        paths of deleted or renamed files (old name)
+    """
+    output = run_git(path, "diff", "--name-status", "-z", "-M", "--relative",
+                     since, "HEAD", "--", ".")
+    fields = output.split("\0")
+    changed, removed = [], []
+
+    i = 0
+    while i < len(fields) - 1:
+        status = fields[i]
+        if status[0] in "RC":
+            old, new = fields[i + 1], fields[i + 2]
+            if status[0] == "R":
+                removed.append(_os.path.join(path, old))
+            changed.append(_os.path.join(path, new))
+            i += 3
+        else:
+            fname = _os.path.join(path, fields[i + 1])
+            if status[0] == "D":
+                removed.append(fname)
+            else:
+                changed.append(fname)
+            i += 2
+
+    return [_os.path.normpath(f) for f in changed], [_os.path.normpath(f) for f in removed]
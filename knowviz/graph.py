@@ -0,0 +1,435 @@
+"""Compact graph of keywords and the relations that connect them, backed by NumPy arrays.
+"""
+import itertools as _itertools
+import typing as _t
+
+import numpy as _np
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# ids of keywords and relations. Offsets into the edge arrays are 64 bit, so that the number of edges is not limited
+_ID = _np.int32
+_EMPTY = _np.zeros(0, dtype=_ID)
+
+
+def _positions(indptr: _np.ndarray, rows: _np.ndarray) -> _t.Tuple[_np.ndarray, _np.ndarray]:
+    """Positions of all entries of `rows` in a CSR structure, and the row of each position."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return _np.zeros(0, dtype=_np.int64), _EMPTY
+    # offset of each entry from the start of its row
+    offsets = _np.arange(total) - _np.repeat(_np.cumsum(lengths) - lengths, lengths)
+    return _np.repeat(starts, lengths) + offsets, _np.repeat(rows, lengths).astype(_ID, copy=False)
+
+
+def _transpose(indptr: _np.ndarray, indices: _np.ndarray, columns: int) -> _t.Tuple[_np.ndarray, _np.ndarray]:
+    """CSR structure of the transposed matrix, with sorted entries in each row."""
+    rows = _np.repeat(_np.arange(len(indptr) - 1, dtype=_ID), _np.diff(indptr))
+    order = _np.argsort(indices, kind="stable")
+    counts = _np.bincount(indices, minlength=columns)
+    return _np.concatenate(([0], _np.cumsum(counts))).astype(_np.int64), rows[order]
+
+
+def _changed_since(index, version: _t.Optional[int]) -> _t.Optional[_t.List[str]]:
+    """Keys of an index that changed since `version`, or None if they are unknown, e.g. for the first update or for
+    indices that do not keep a log of their changes."""
+    changed_since = getattr(index, "changed_since", None)
+    if version is None or changed_since is None:
+        return None
+    return changed_since(version)
+
+
+class KeywordGraph:
+
+    def __init__(self, relation_index, compaction_ratio: float = 0.1):
+        """
+        Bipartite graph of the keywords (unique keys of a `KeywordIndex`) and the relations of a `RelationIndex`, where
+        each relation is connected to the keywords it references.
+
+        Keywords and relations are interned to integer ids and edges are stored in compressed sparse row (CSR) arrays
+        in both directions (relation -> keywords and keyword -> relations), together with the number of occurrences of
+        each keyword in its relation (see `occurrence_counts`), which takes 12 bytes per edge. `update`
+        applies changes of the indices incrementally: changed relations are kept in a small overlay on top of the CSR
+        arrays, which are rebuilt once the overlay holds more than `compaction_ratio` times the number of edges.
+
+        Ids are stable as long as the graph exists, ids of removed relations are not reused.
+
+        Parameters
+        ----------
+        relation_index
+            `RelationIndex` the graph is built from, together with its keyword index
+        compaction_ratio
+            (Optional) maximum number of edges in the overlay relative to the number of edges in the CSR arrays.
+            Default: 0.1
+        """
+        self.index = relation_index
+        self.compaction_ratio = compaction_ratio
+
+        # id -> name, None for removed relations
+        self.keyword_names = []
+        self.relation_names = []
+        self._keyword_ids = dict()
+        self._relation_ids = dict()
+        # entry of each relation as found in the index, to detect changed entries without comparing them
+        self._sources = []
+
+        # relation -> keywords and keyword -> relations
+        self._indptr = _np.zeros(1, dtype=_np.int64)
+        self._indices = _EMPTY
+        # number of occurrences of each keyword of `_indices` in its relation
+        self._counts = _EMPTY
+        self._t_indptr = _np.zeros(1, dtype=_np.int64)
+        self._t_indices = _EMPTY
+        # relation id -> keyword ids (and occurrence counts) of relations that changed since the arrays have been built
+        self._overlay = dict()
+        self._overlay_counts = dict()
+        self._overlay_size = 0
+        self._overlay_arrays = None
+        # versions of the indices at the last update
+        self._version = None
+        self._changes = 0
+
+        self.update()
+
+    @property
+    def version(self) -> int:
+        """Counter that is incremented whenever edges or their occurrence counts change."""
+        return self._changes
+
+    @property
+    def relations(self) -> int:
+        """Number of relations (without removed relations)."""
+        return len(self._relation_ids)
+
+    @property
+    def edges(self) -> int:
+        """Number of references from relations to keywords."""
+        replaced = sum(int(self._indptr[rid + 1] - self._indptr[rid]) for rid in self._overlay
+                       if rid < len(self._indptr) - 1)
+        return len(self._indices) - replaced + self._overlay_size
+
+    def _intern_keyword(self, name: str) -> int:
+        kid = self._keyword_ids.get(name)
+        if kid is None:
+            kid = self._keyword_ids[name] = len(self.keyword_names)
+            self.keyword_names.append(name)
+        return kid
+
+    def _keyword_row(self, keywords: _t.Iterable[str]) -> _t.List[int]:
+        """Sorted ids of keywords, interning unknown keywords."""
+        try:
+            return sorted(set(map(self._keyword_ids.__getitem__, keywords)))
+        except KeyError:
+            return sorted({self._intern_keyword(key) for key in keywords})
+
+    def _row_counts(self, relation: str, row: _t.List[int]) -> _t.List[int]:
+        """Number of occurrences of the keywords `row` in a relation, 1 for each keyword if they are unknown."""
+        occurrences = getattr(self.index, "occurrences", None)
+        counts = occurrences.relations.get(relation) if occurrences is not None else None
+        if not counts:
+            return [1] * len(row)
+        return [len(counts.get(self.keyword_names[kid], ())) or 1 for kid in row]
+
+    def keyword_id(self, name: str) -> int:
+        """Id of a keyword, given by its unique key or a synonym."""
+        if name in self.index.keywords:
+            name = self.index.keywords.resolve(name)
+        return self._keyword_ids[name]
+
+    def relation_id(self, name: str) -> int:
+        return self._relation_ids[name]
+
+    def update(self) -> bool:
+        """Apply changes of the relation and keyword index since the last update. Returns whether edges changed.
+
+        Only the entries that changed since the last update are visited, if the indices still know them (see
+        `knowviz.index.Index.changed_since`), otherwise all entries are compared."""
+        version = (self.index.version, self.index.keywords.version)
+        if version == self._version:
+            return False
+        relation_version, keyword_version = self._version if self._version is not None else (None, None)
+
+        names = _changed_since(self.index.keywords, keyword_version)
+        if names is None:
+            names = self.index.keywords.unique_keys()
+        for key in names:
+            if self.index.keywords.is_unique(key):
+                self._intern_keyword(key)
+
+        relations = _changed_since(self.index, relation_version)
+        if relations is None:
+            relations = list(self.index)
+            removed = [relation for relation in self._relation_ids if relation not in self.index]
+        else:
+            removed = [relation for relation in relations
+                       if relation in self._relation_ids and relation not in self.index]
+
+        # relation id -> sorted keyword ids and their occurrence counts of changed relations
+        rows = dict()
+        counts = dict()
+        for relation in relations:
+            entry = self.index.get(relation)
+            if entry is None:
+                continue
+            keywords = entry.get("keywords", ()) if isinstance(entry, dict) else ()
+            rid = self._relation_ids.get(relation)
+            if rid is None:
+                rid = self._relation_ids[relation] = len(self.relation_names)
+                self.relation_names.append(relation)
+                self._sources.append(entry)
+                rows[rid] = self._keyword_row(keywords)
+                counts[rid] = self._row_counts(relation, rows[rid])
+                continue
+            if self._sources[rid] is entry:
+                continue
+            self._sources[rid] = entry
+
+            # occurrences are updated together with the entry of a relation
+            row = self._keyword_row(keywords)
+            row_counts = self._row_counts(relation, row)
+            if row != self._row(rid).tolist() or row_counts != self._counts_of(rid).tolist():
+                rows[rid] = row
+                counts[rid] = row_counts
+
+        for relation in removed:
+            rid = self._relation_ids.pop(relation)
+            self.relation_names[rid] = None
+            self._sources[rid] = None
+            rows[rid] = []
+            counts[rid] = []
+
+        self._version = version
+        if not rows:
+            return False
+
+        size = self._overlay_size + sum(len(row) for row in rows.values())
+        if size > self.compaction_ratio * len(self._indices) \
+                or len(self._overlay) + len(rows) > self.compaction_ratio * len(self.relation_names):
+            self._rebuild(rows, counts)
+        else:
+            for rid, row in rows.items():
+                self._set_row(rid, _np.array(row, dtype=_ID), _np.array(counts[rid], dtype=_ID))
+        self._changes += 1
+        return True
+
+    def _row(self, rid: int) -> _np.ndarray:
+        row = self._overlay.get(rid)
+        if row is not None:
+            return row
+        if rid < len(self._indptr) - 1:
+            return self._indices[self._indptr[rid]:self._indptr[rid + 1]]
+        return _EMPTY
+
+    def _counts_of(self, rid: int) -> _np.ndarray:
+        counts = self._overlay_counts.get(rid)
+        if counts is not None:
+            return counts
+        if rid < len(self._indptr) - 1:
+            return self._counts[self._indptr[rid]:self._indptr[rid + 1]]
+        return _EMPTY
+
+    def _set_row(self, rid: int, row: _np.ndarray, counts: _np.ndarray):
+        previous = self._overlay.get(rid)
+        if previous is not None:
+            self._overlay_size -= len(previous)
+        self._overlay[rid] = row
+        self._overlay_counts[rid] = counts
+        self._overlay_size += len(row)
+        self._overlay_arrays = None
+
+    def compact(self):
+        """Rebuild the CSR arrays with all changes in the overlay."""
+        self._rebuild(dict(), dict())
+
+    def incidence(self) -> _t.Tuple[_np.ndarray, _np.ndarray]:
+        """CSR structure (offsets and keyword ids) of the relation -> keyword incidence, with one row per relation id
+        and sorted keyword ids in each row. Rows of removed relations are empty."""
+        if self._overlay:
+            self.compact()
+        return self._indptr, self._indices
+
+    def occurrence_counts(self) -> _np.ndarray:
+        """Number of occurrences of each keyword id of `incidence` in its relation, as far as the relation index
+        knows them (see `knowviz.occurrences.OccurrenceIndex`), otherwise 1."""
+        if self._overlay:
+            self.compact()
+        return self._counts
+
+    def _rebuild(self, rows: _t.Dict[int, _t.Sequence[int]], counts: _t.Dict[int, _t.Sequence[int]]):
+        # rows of the overlay and the given rows replace those of the arrays
+        if self._overlay:
+            rows = {**self._overlay, **rows}
+            counts = {**self._overlay_counts, **counts}
+        relations = len(self.relation_names)
+        base = len(self._indptr) - 1
+        lengths = _np.zeros(relations, dtype=_np.int64)
+        lengths[:base] = _np.diff(self._indptr)
+        replaced = _np.zeros(relations, dtype=bool)
+        order = sorted(rows)
+        replaced[order] = True
+        lengths[order] = [len(rows[rid]) for rid in order]
+
+        indptr = _np.concatenate(([0], _np.cumsum(lengths))).astype(_np.int64)
+        indices = _np.empty(indptr[-1], dtype=_ID)
+        occurrence_counts = _np.empty(indptr[-1], dtype=_ID)
+        kept = _np.flatnonzero(~replaced[:base])
+        positions, previous_positions = _positions(indptr, kept)[0], _positions(self._indptr, kept)[0]
+        indices[positions] = self._indices[previous_positions]
+        occurrence_counts[positions] = self._counts[previous_positions]
+        if order:
+            positions, _ = _positions(indptr, _np.array(order))
+            indices[positions] = _np.fromiter(_itertools.chain.from_iterable(rows[rid] for rid in order),
+                                              dtype=_ID, count=len(positions))
+            occurrence_counts[positions] = _np.fromiter(_itertools.chain.from_iterable(counts[rid] for rid in order),
+                                                        dtype=_ID, count=len(positions))
+
+        self._indptr, self._indices, self._counts = indptr, indices, occurrence_counts
+        self._t_indptr, self._t_indices = _transpose(indptr, indices, len(self.keyword_names))
+        self._overlay = dict()
+        self._overlay_counts = dict()
+        self._overlay_size = 0
+        self._overlay_arrays = None
+
+    def _overlay_edges(self) -> _t.Tuple[_np.ndarray, _np.ndarray, _np.ndarray]:
+        """Relation ids and keyword ids of all edges in the overlay, and a mask of relations in the overlay."""
+        if self._overlay_arrays is None:
+            rids = sorted(self._overlay)
+            rows = [self._overlay[rid] for rid in rids]
+            replaced = _np.zeros(len(self.relation_names), dtype=bool)
+            replaced[rids] = True
+            self._overlay_arrays = (_np.repeat(_np.array(rids, dtype=_ID), [len(row) for row in rows]),
+                                    _np.concatenate(rows) if rows else _EMPTY, replaced)
+        return self._overlay_arrays
+
+    def _keywords_of(self, rids: _np.ndarray) -> _t.Tuple[_np.ndarray, _np.ndarray]:
+        """Keyword ids of all edges of the relations `rids`, and the relation id of each edge."""
+        if not self._overlay:
+            positions, rows = _positions(self._indptr, rids)
+            return self._indices[positions], rows
+
+        overlay_rids, overlay_kids, replaced = self._overlay_edges()
+        base = rids[~replaced[rids]]
+        positions, rows = _positions(self._indptr, base)
+        extra = _np.isin(overlay_rids, rids)
+        return (_np.concatenate((self._indices[positions], overlay_kids[extra])),
+                _np.concatenate((rows, overlay_rids[extra])))
+
+    def _relations_of(self, kids: _np.ndarray) -> _t.Tuple[_np.ndarray, _np.ndarray]:
+        """Relation ids of all edges of the keywords `kids`, and the keyword id of each edge."""
+        base = kids[kids < len(self._t_indptr) - 1]
+        positions, rows = _positions(self._t_indptr, base)
+        rids = self._t_indices[positions]
+        if not self._overlay:
+            return rids, rows
+
+        overlay_rids, overlay_kids, replaced = self._overlay_edges()
+        kept = ~replaced[rids]
+        extra = _np.isin(overlay_kids, kids)
+        return (_np.concatenate((rids[kept], overlay_rids[extra])),
+                _np.concatenate((rows[kept], overlay_kids[extra])))
+
+    def keywords_of(self, relation: str) -> _t.List[str]:
+        """Keywords referenced by a relation."""
+        return [self.keyword_names[kid] for kid in self._row(self.relation_id(relation))]
+
+    def relations_of(self, keyword: str) -> _t.List[str]:
+        """Relations that reference a keyword."""
+        rids, _ = self._relations_of(_np.array([self.keyword_id(keyword)], dtype=_ID))
+        return sorted(self.relation_names[rid] for rid in rids)
+
+    def neighbourhood(self, keyword: str, hops: int = 1) -> _t.Dict[str, int]:
+        """Keywords that are connected to a keyword through at most `hops` relations, with the number of relations on
+        the shortest connection (0 for the keyword itself)."""
+        start = self.keyword_id(keyword)
+        distances = {start: 0}
+        keyword_visited = _np.zeros(len(self.keyword_names), dtype=bool)
+        relation_visited = _np.zeros(len(self.relation_names), dtype=bool)
+        keyword_visited[start] = True
+        frontier = _np.array([start], dtype=_ID)
+
+        for hop in range(1, hops + 1):
+            rids, _ = self._relations_of(frontier)
+            rids = _np.unique(rids[~relation_visited[rids]])
+            relation_visited[rids] = True
+            kids, _ = self._keywords_of(rids)
+            frontier = _np.unique(kids[~keyword_visited[kids]])
+            if len(frontier) == 0:
+                break
+            keyword_visited[frontier] = True
+            distances.update(dict.fromkeys(frontier.tolist(), hop))
+
+        return {self.keyword_names[kid]: distance for kid, distance in distances.items()}
+
+    def shortest_path(self, source: str, target: str) -> _t.List[str]:
+        """Shortest connection between two keywords, as a list of alternating keywords and relations that starts with
+        `source` and ends with `target`. Empty if the keywords are not connected."""
+        start, end = self.keyword_id(source), self.keyword_id(target)
+        if start == end:
+            return [self.keyword_names[start]]
+
+        # parent of each visited node in the breadth-first search, -1 if not visited
+        keyword_parents = _np.full(len(self.keyword_names), -1, dtype=_ID)
+        relation_parents = _np.full(len(self.relation_names), -1, dtype=_ID)
+        keyword_parents[start] = start
+        frontier = _np.array([start], dtype=_ID)
+
+        while len(frontier) > 0 and keyword_parents[end] == -1:
+            rids, parents = self._relations_of(frontier)
+            new = relation_parents[rids] == -1
+            rids, first = _np.unique(rids[new], return_index=True)
+            relation_parents[rids] = parents[new][first]
+
+            kids, parents = self._keywords_of(rids)
+            new = keyword_parents[kids] == -1
+            frontier, first = _np.unique(kids[new], return_index=True)
+            keyword_parents[frontier] = parents[new][first]
+
+        if keyword_parents[end] == -1:
+            return []
+
+        path = [self.keyword_names[end]]
+        kid = end
+        while kid != start:
+            rid = keyword_parents[kid]
+            kid = relation_parents[rid]
+            path.extend((self.relation_names[rid], self.keyword_names[kid]))
+        return path[::-1]
+
+    def connected_components(self) -> _t.List[_t.Set[str]]:
+        """Sets of keywords that are connected through relations, largest first. Keywords that are neither in the
+        keyword index nor referenced by any relation are left out. Changes of the indices are applied first."""
+        self.update()
+        if self._overlay:
+            self.compact()
+
+        keywords = len(self.keyword_names)
+        # every keyword is labelled with the smallest id in its component, starting with its own
+        labels = _np.arange(keywords, dtype=_ID)
+        lengths = _np.diff(self._indptr)
+        nonempty = lengths > 0
+        while True:
+            # smallest label of the keywords of each relation, then of the relations of each keyword
+            relation_labels = _np.minimum.reduceat(labels[self._indices], self._indptr[:-1][nonempty]) \
+                if len(self._indices) else _EMPTY
+            updated = labels.copy()
+            _np.minimum.at(updated, self._indices, _np.repeat(relation_labels, lengths[nonempty]))
+            # shortcut chains of labels
+            while True:
+                shortcut = updated[updated]
+                if _np.array_equal(shortcut, updated):
+                    break
+                updated = shortcut
+            if _np.array_equal(updated, labels):
+                break
+            labels = updated
+
+        active = _np.zeros(keywords, dtype=bool)
+        active[:len(self._t_indptr) - 1] = _np.diff(self._t_indptr) > 0
+        active[[self._keyword_ids[key] for key in self.index.keywords.unique_keys()]] = True
+        components = dict()
+        for kid in _np.flatnonzero(active):
+            components.setdefault(labels[kid], set()).add(self.keyword_names[kid])
+        return sorted(components.values(), key=lambda component: (-len(component), min(component)))
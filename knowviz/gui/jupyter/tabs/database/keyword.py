@@ -1,14 +1,16 @@
 """Interactive gui based on ipywidgets and jupyter notebook."""
 import os as _os
+import threading as _threading
 
 from ipywidgets import Dropdown as _Dropdown, VBox as _VBox, Text as _Text, Select as _Select
 from ipywidgets import Button as _Button, HBox as _HBox, SelectMultiple as _SelectMultiple, Accordion as _Accordion
 
 import traitlets as _traitlets
-from tkinter import Tk as _Tk, filedialog as _filedialog
 
 from knowviz import io as _io
 from knowviz import index as _index
+from knowviz.prefix import PrefixIndex
+from knowviz.gui.jupyter.tabs.database.rescan import RescanBox
 
 long_description_style = {'description_width': 'initial'}
 
@@ -16,7 +18,8 @@ long_description_style = {'description_width': 'initial'}
 class KeywordDropdown(_Dropdown):
 
     def __init__(self, keyword_index: _index.KeywordIndex, *args, **kwargs):
-        """Dropdown menu to select a keyword."""
+        """Dropdown menu to select a keyword. All keywords are sent to the front end, see `KeywordPicker` for large
+        indices."""
 
         super().__init__(*args, **kwargs,
                          options=list(keyword_index.unique_keys()),
@@ -28,6 +31,89 @@ class KeywordDropdown(_Dropdown):
         self.keyword_index = keyword_index
 
 
+class KeywordPicker(_VBox):
+    # unique key of the selected keyword
+    value = _traitlets.Unicode(None, allow_none=True)
+
+    def __init__(self, keyword_index: _index.KeywordIndex, page_size: int = 20, lock=None, **kwargs):
+        """
+        Type-ahead selection of a keyword. Keywords and synonyms that start with the typed text (or contain a word
+        that does) are looked up in a `PrefixIndex`, and only one page of matches is sent to the front end. Selecting a
+        synonym selects its unique key (`value`).
+
+        Parameters
+        ----------
+        keyword_index
+            `KeywordIndex` to select keywords from
+        page_size
+            (Optional) number of matches shown at once. Default: 20
+        lock
+            (Optional) lock held while the keyword index is read, e.g. `RescanBox.lock` if the index is rescanned in
+            the background
+        """
+        self.keyword_index = keyword_index
+        self.page_size = page_size
+        self.lock = lock if lock is not None else _threading.RLock()
+        self._page = 0
+        self._prefix_index = None
+        self._prefix_index_version = None
+
+        self.search_text = _Text(description="Search keyword:",
+                                 placeholder="Type a keyword or synonym",
+                                 continuous_update=True,
+                                 style=long_description_style)
+        self.match_select = _Select(options=[], rows=min(page_size, 10))
+        self.previous_button = _Button(description="Previous", disabled=True)
+        self.next_button = _Button(description="Next", disabled=True)
+
+        super().__init__(children=(self.search_text, self.match_select,
+                                   _HBox((self.previous_button, self.next_button))), **kwargs)
+
+        self.search_text.observe(self.on_search_change, "value")
+        self.match_select.observe(self.on_match_selection, "value")
+        self.previous_button.on_click(self.show_previous_page)
+        self.next_button.on_click(self.show_next_page)
+
+        self.refresh()
+
+    @property
+    def prefix_index(self) -> PrefixIndex:
+        """Prefix index of the keyword index, rebuilt only if the keyword index has changed."""
+        version = (id(self.keyword_index), self.keyword_index.version)
+        if self._prefix_index is None or self._prefix_index_version != version:
+            self._prefix_index = PrefixIndex.from_keywords(self.keyword_index)
+            self._prefix_index_version = version
+        return self._prefix_index
+
+    def on_search_change(self, change):
+        self._page = 0
+        self.refresh()
+
+    def on_match_selection(self, change):
+        if change.new is not None:
+            self.value = change.new
+
+    def show_previous_page(self, b):
+        self._page = max(0, self._page - 1)
+        self.refresh()
+
+    def show_next_page(self, b):
+        self._page += 1
+        self.refresh()
+
+    def refresh(self):
+        # one more match than shown tells whether there is a next page
+        with self.lock:
+            matches = self.prefix_index.search(self.search_text.value, self.page_size + 1,
+                                               self._page * self.page_size)
+        options = [(name if name == key else f"{name} ({key})", key) for name, key in matches[:self.page_size]]
+
+        self.match_select.options = options
+        self.match_select.value = self.value if self.value in {key for _, key in options} else None
+        self.previous_button.disabled = self._page == 0
+        self.next_button.disabled = len(matches) <= self.page_size
+
+
 class KeywordName(_Text):
 
     def __init__(self, *args, **kwargs):
@@ -151,18 +237,33 @@ class KeywordTab(_VBox):
 
     def __init__(self, keyword_index: _index.KeywordIndex, **kwargs):
         self.keyword_index = keyword_index
-        self.keyword_dropdown = KeywordDropdown(keyword_index)
+        self.rescan_box = RescanBox(keyword_index)
+        self.keyword_picker = KeywordPicker(keyword_index, lock=self.rescan_box.lock)
         self.keyword_box = KeywordInfoBox(keyword_index)
 
-        super().__init__(children=(self.keyword_dropdown, self.keyword_box), **kwargs)
+        super().__init__(children=(self.rescan_box, self.keyword_picker, self.keyword_box), **kwargs)
 
-        self.keyword_dropdown.observe(self.display_keyword_info, "value")
+        self.keyword_picker.observe(self.display_keyword_info, "value")
+        self.rescan_box.on_update(self.refresh)
 
     def display_keyword_info(self, change):
         # collect keyword info and hand over to keyword info box
-        keyword_info = self.keyword_index.keyword_info(change.new)
+        with self.rescan_box.lock:
+            keyword_info = self.keyword_index.keyword_info(change.new)
         self.keyword_box.refresh(keyword_info)
 
+    def refresh(self):
+        """Show keywords added by a rescan and the current info of the selected keyword."""
+        self.keyword_picker.refresh()
+        keyword = self.keyword_picker.value
+        if keyword is None:
+            return
+        if self.keyword_index.is_unique(keyword):
+            self.keyword_box.refresh(self.keyword_index.keyword_info(keyword))
+        else:
+            # keyword has been removed
+            self.keyword_box.refresh(disable=True)
+
 
 class SelectFilesButton(_Button):
     """Acknowledgement: This class is based on this code review:
@@ -191,6 +292,9 @@ class SelectFilesButton(_Button):
         b : obj:
             An instance of ipywidgets.widgets.Button
         """
+        # tkinter is only imported when files are selected, it is slow to import and not available everywhere
+        from tkinter import Tk as _Tk, filedialog as _filedialog
+
         # Create Tk root
         root = _Tk()
         # Hide the main window
@@ -0,0 +1,128 @@
+"""Background rescans of database indices with progress reporting."""
+import logging as _logging
+import threading as _threading
+import time as _time
+import typing as _t
+
+from ipywidgets import Button as _Button, HBox as _HBox, IntProgress as _IntProgress, Label as _Label, VBox as _VBox
+
+from knowviz import index as _index
+from knowviz.report import RescanReport, RescanCancelled
+
+_logger = _logging.getLogger(__name__)
+
+
+def format_eta(seconds: float) -> str:
+    """Remaining time as e.g. '1:05' (minutes:seconds) or '1:02:05' (hours:minutes:seconds)."""
+    if seconds == float("inf"):
+        return "unknown"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class RescanBox(_VBox):
+
+    def __init__(self, index: _index.Index, refresh_interval: float = 0.5, **kwargs):
+        """
+        Buttons to rescan an index in a background thread and to cancel the rescan, and a progress bar with the
+        number of processed files and the estimated remaining time. The notebook stays responsive while the rescan
+        runs, and the index is saved when the rescan has finished.
+
+        The rescan holds `lock` while it updates the index and releases it after each file. Widgets that read the index
+        in callbacks of the front end should hold `lock` as well. Callbacks registered with `on_update` are called from
+        the rescan thread at most every `refresh_interval` seconds and when the rescan has finished, e.g. to refresh
+        widgets with new entries of the index.
+
+        Parameters
+        ----------
+        index
+            index to rescan, e.g. a `KeywordIndex` or a `RelationIndex` (which rescans its keyword index first)
+        refresh_interval
+            (Optional) minimum number of seconds between calls of update callbacks. Default: 0.5
+        """
+        self.index = index
+        self.refresh_interval = refresh_interval
+        self.lock = _threading.RLock()
+        self.report = None
+        self._callbacks = []
+        self._thread = None
+        self._cancel_event = _threading.Event()
+        self._last_update = 0.0
+
+        self.rescan_button = _Button(description="Rescan")
+        self.cancel_button = _Button(description="Cancel", disabled=True)
+        self.progress_bar = _IntProgress(value=0, min=0, max=1)
+        self.status_label = _Label(value="")
+
+        super().__init__(children=(_HBox((self.rescan_button, self.cancel_button)),
+                                   _HBox((self.progress_bar, self.status_label))), **kwargs)
+
+        self.rescan_button.on_click(self.start_rescan)
+        self.cancel_button.on_click(self.cancel_rescan)
+
+    def on_update(self, callback: _t.Callable[[], None]):
+        """Register a callable without arguments that is called when the index may have changed during a rescan."""
+        self._callbacks.append(callback)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_rescan(self, b=None):
+        if self.running:
+            return
+        self._cancel_event.clear()
+        self.rescan_button.disabled = True
+        self.cancel_button.disabled = False
+        self.status_label.value = "Collecting documents..."
+        self._thread = _threading.Thread(target=self._run, name=f"knowviz-rescan-{self.index.name}", daemon=True)
+        self._thread.start()
+
+    def cancel_rescan(self, b=None):
+        self._cancel_event.set()
+        self.cancel_button.disabled = True
+
+    def wait(self, timeout: float = None):
+        """Block until the running rescan (if any) has finished, e.g. in scripts and tests."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        status = ""
+        with self.lock:
+            try:
+                self.report = self.index.rescan_documents(overwrite_file=True, progress=self._progress)
+            except RescanCancelled:
+                status = "Cancelled, changes are not saved."
+            except Exception as e:
+                _logger.exception(f"Rescan of '{self.index.name}' index failed.")
+                status = f"Failed: {e}"
+            else:
+                status = f"{'Updated' if self.report.changed else 'No changes'} " \
+                         f"({self.report.duration:.1f} s)."
+        self.status_label.value = status
+        self.rescan_button.disabled = False
+        self.cancel_button.disabled = True
+        self._notify()
+
+    def _progress(self, report: RescanReport):
+        # give widgets that read the index a chance to do so between two files
+        self.lock.release()
+        try:
+            if self._cancel_event.is_set():
+                raise RescanCancelled()
+            self.progress_bar.max = max(report.total, 1)
+            self.progress_bar.value = report.done
+            self.status_label.value = f"{report.name}: {report.done}/{report.total} files, " \
+                                      f"{format_eta(report.eta)} remaining"
+            if _time.monotonic() - self._last_update >= self.refresh_interval:
+                self._notify()
+        finally:
+            self.lock.acquire()
+
+    def _notify(self):
+        self._last_update = _time.monotonic()
+        for callback in self._callbacks:
+            with self.lock:
+                callback()
@@ -1,22 +1,143 @@
 """Creating and updating database indices."""
+import functools as _functools
+import logging as _logging
 import os as _os
+import sys as _sys
+import time as _time
 import typing as _t
-import pyparsing as _pp
+from collections.abc import Mapping as _Mapping
 
-from knowviz.io import parse_document, read_yaml_file, write_yaml_file, md5_checksum, scan_directory
+from knowviz.io import parse_document, match_document, match_occurrences, parse_occurrences, read_document, \
+    map_document, read_yaml_file, read_yaml_file_cached, write_yaml_file, checksum as _checksum, file_stat, \
+    scan_directory
+from knowviz.matcher import KeywordMatcher, keyword_fingerprint
+from knowviz.storage import storage_for
+from knowviz.cache import ReferenceCache
+from knowviz.terms import TermIndex, extract_terms
+from knowviz.occurrences import OccurrenceIndex
+from knowviz.nearmiss import NearMissIndex, NgramIndex, extract_mentions
+from knowviz.citation import scan_citations
+from knowviz.report import RescanReport
+from knowviz.changes import ChangeSet
+from knowviz import git as _git
+
+if _t.TYPE_CHECKING:
+    # pyparsing and multiprocessing are imported where they are used, so that short-lived processes (e.g. the
+    # command line interface in git hooks) start quickly
+    import pyparsing as _pp
+
+_logger = _logging.getLogger(__name__)
+
+
+# files modified less than this many nanoseconds before they are indexed could change again without a visible change of
+# their modification time (depending on the timestamp resolution of the file system), so their stat is not recorded
+_RACY_INTERVAL_NS = 2 * 10 ** 9
 
 
 class Index(dict):
 
-    def __init__(self, filename: str = "", datadir: str = "", **kwargs):
+    def __init__(self, filename: str = "", datadir: str = "", hash_algorithm: str = "md5", **kwargs):
 
         if filename is not "":
-            super().__init__(read_yaml_file(filename), **kwargs)
+            # storage backend is chosen by file extension, e.g. YAML (.yml) or SQLite (.sqlite). All entries are loaded,
+            # also from SQLite, whose saves are incremental
+            self.storage = storage_for(filename)
+            super().__init__(self.storage.load(), **kwargs)
         else:
+            self.storage = None
             super().__init__(**kwargs)
 
         self.filename = _os.path.normpath(filename)
         self._datadir = datadir
+        self.hash_algorithm = hash_algorithm
+        # whether documents in subdirectories of `datadir` belong to the index
+        self.recursive = True
+        self._version = 0
+        # keys set or removed since the index has been loaded or saved
+        self._changed_keys = set(kwargs)
+        self._removed_keys = set()
+        self.state = self._load_state()
+        self._state_changed = False
+        # callables that receive the `RescanReport` of each rescan of this index, e.g. to export metrics
+        self.hooks = []
+        # callables that receive each non-empty `ChangeSet` of this index (see `publish_changes`)
+        self.subscribers = []
+        # key -> value (None if missing) before the first change since the last change set
+        self._previous = dict()
+        # keys set or removed at the most recent versions, starting at version `_log_start` (see `changed_since`)
+        self._log = []
+        self._log_start = 0
+
+    @property
+    def version(self) -> int:
+        """Counter that is incremented whenever an entry of the index is set or removed."""
+        return self._version
+
+    def changed_since(self, version: int) -> _t.Optional[_t.List[str]]:
+        """Keys that have been set or removed since the index had `version`, in order of their first change, e.g. to
+        update data derived from the index incrementally. None if the changes are no longer known, since only the
+        most recent changes are kept."""
+        if version < self._log_start or version > self._version:
+            return None
+        return list(dict.fromkeys(self._log[version - self._log_start:]))
+
+    def _log_change(self, key):
+        self._log.append(key)
+        self._version += 1
+        if len(self._log) > 2 * len(self) + 1024:
+            # older changes are dropped, so that the log does not grow with the number of changes
+            dropped = len(self._log) // 2
+            del self._log[:dropped]
+            self._log_start += dropped
+
+    def _mark_changed(self, key):
+        self._changed_keys.add(key)
+        self._removed_keys.discard(key)
+        self._log_change(key)
+
+    def _mark_removed(self, key):
+        self._removed_keys.add(key)
+        self._changed_keys.discard(key)
+        self._log_change(key)
+
+    def _record_previous(self, key):
+        if key not in self._previous:
+            self._previous[key] = dict.get(self, key)
+
+    def __setitem__(self, key, value):
+        self._record_previous(key)
+        super().__setitem__(key, value)
+        self._mark_changed(key)
+
+    def __delitem__(self, key):
+        self._record_previous(key)
+        super().__delitem__(key)
+        self._mark_removed(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *args):
+        if key in self:
+            self._record_previous(key)
+            self._mark_removed(key)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._previous.setdefault(key, value)
+        self._mark_removed(key)
+        return key, value
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
 
     @property
     def name(self):
@@ -47,86 +168,464 @@ class Index(dict):
         return self._datadir
 
     def save_to_file(self, filename: str = ""):
-        """Save index to a yaml file. If no filename is given, will try to use already defined filename."""
+        """Save index to a file. If no filename is given, will try to use already defined filename.
+
+        The storage backend is chosen by file extension: YAML files (.yml, .yaml) are rewritten as a whole, SQLite
+        databases (.sqlite, .sqlite3, .db) are only updated with entries that changed since loading or saving. Saving
+        to a file of another type exports the whole index, e.g. a YAML snapshot of an index stored in SQLite."""
 
         if filename is not "":
             self.filename = filename
         elif self.filename is "":
             raise ValueError("No filename defined. Please define a filename.")
-        write_yaml_file(self.filename, dict(self))
+
+        entries = self._stored_entries()
+        if self.storage is None or _os.path.normpath(self.storage.filename) != _os.path.normpath(self.filename):
+            self.storage = storage_for(self.filename)
+            self.storage.save(entries)
+        else:
+            self.storage.save(entries, self._changed_keys, self._removed_keys)
+        self._changed_keys.clear()
+        self._removed_keys.clear()
+
+        self.save_state()
+
+    def compact(self):
+        """Rewrite the index file with all entries, e.g. to merge the journal of a YAML index into the YAML file."""
+        if self.storage is None:
+            raise ValueError("Index has not been saved to a file yet.")
+        self.storage.compact(self._stored_entries())
+        self._changed_keys.clear()
+        self._removed_keys.clear()
+
+    def entry_kind(self, value) -> str:
+        """Kind of an entry in change sets, e.g. "relation" for entries of a `RelationIndex`."""
+        return "document"
+
+    def publish_changes(self) -> ChangeSet:
+        """Change set of all entries added, modified, removed or renamed since the previous change set, which is passed
+        to all `subscribers` unless it is empty. Rescans publish their changes when they finish, other updates (e.g.
+        `update_documents`) are collected until this is called."""
+        previous, self._previous = self._previous, dict()
+        changes = ChangeSet.from_values(self.name, ((key, value, self.get(key)) for key, value in previous.items()),
+                                        self.entry_kind)
+        if changes:
+            for subscriber in self.subscribers:
+                subscriber(changes)
+        return changes
+
+    def _stored_entries(self) -> _Mapping:
+        """Entries as they are passed to the storage backend, i.e. with values of built-in types."""
+        return self
+
+    @property
+    def state_file(self) -> str:
+        """Path to the file next to the index file that stores the state of the index, e.g. the commit of the last
+        rescan."""
+        return _os.path.join(self.indexdir, f"{self.name}.state.yml")
+
+    def _load_state(self) -> dict:
+        if self.filename != "." and _os.path.isfile(self.state_file):
+            return read_yaml_file(self.state_file)
+        return dict()
+
+    def save_state(self):
+        """Save the state of the index next to the index file."""
+        # an empty state is written as well if there is a state file, e.g. to clear the commit of a previous git rescan
+        if self.state or _os.path.isfile(self.state_file):
+            write_yaml_file(self.state_file, self.state)
+        self._state_changed = False
 
     def rescan_documents(self):
         raise NotImplementedError
 
-    def report_update(self, changed: bool, overwrite_file: bool) -> bool:
+    def collect_documents(self, extension: str = "", git: bool = False) -> _t.Tuple[_t.List[str], _t.List[str]]:
+        """Documents in `datadir` (and below) that need to be scanned and keys of entries whose documents have been
+        removed (see `document_keys`).
+
+        With `git`, only files that have been added, modified, deleted or renamed since the commit recorded in the
+        index state are returned. All files are returned if `datadir` is not part of a git repository, has uncommitted
+        or untracked files, or if no commit has been recorded yet."""
+
+        commit = ""
+        if git:
+            head = _git.head_commit(self.datadir)
+            if head != "" and not _git.is_dirty(self.datadir):
+                commit = head
+
+        previous = self.state.get("commit", "")
+        self._record_commit(commit)
+
+        if commit != "" and previous != "" and _git.commit_exists(self.datadir, previous):
+            changed, removed = _git.changed_files(self.datadir, previous)
+            if not self.recursive:
+                datadir = _os.path.normpath(self.datadir)
+                changed = [fname for fname in changed if _os.path.dirname(_os.path.normpath(fname)) == datadir]
+                removed = [fname for fname in removed if _os.path.dirname(_os.path.normpath(fname)) == datadir]
+            changed = [fname for fname in changed if fname.endswith(extension)]
+            removed = [self.document_key(fname) for fname in removed if fname.endswith(extension)]
+            return changed, removed
+
+        fnames = list(scan_directory(self.datadir, extension=extension, recursive=self.recursive))
+        present = {self.document_key(fname) for fname in fnames}
+        return fnames, [key for key in self.document_keys() if key not in present]
+
+    def document_keys(self) -> _t.List[str]:
+        """Keys of entries that belong to a document."""
+        return [key for key, value in self.items() if not isinstance(value, str)]
+
+    def _record_commit(self, commit: str):
+        if self.state.get("commit", "") != commit:
+            if commit == "":
+                del self.state["commit"]
+            else:
+                self.state["commit"] = commit
+            self._state_changed = True
+
+    def remove_document(self, key: str) -> bool:
+        """Remove the entry of a document that no longer exists. Returns whether the index has changed."""
+        if key in self:
+            del self[key]
+            return True
+        return False
+
+    @staticmethod
+    def document_key(fname: str) -> str:
+        """Key of the index entry of a document, which is its file name without extension."""
+        key, _ = _os.path.splitext(_os.path.split(fname)[-1])
+        return key
+
+    def checksum(self, fname: str) -> str:
+        """Checksum of a document computed with the hash algorithm of this index."""
+        return _checksum(fname, self.hash_algorithm)
+
+    @staticmethod
+    def stat_record(stat: dict) -> dict:
+        """File stat to be stored in an index entry. Empty if the file has been modified too recently to be trusted."""
+        if _time.time() * 10 ** 9 - stat["mtime_ns"] < _RACY_INTERVAL_NS:
+            return dict()
+        return stat
+
+    def stat_unchanged(self, key: str, stat: dict) -> bool:
+        """Check whether the entry `key` has been recorded for a file with identical modification time, size and inode,
+        in which case the file does not need to be read."""
+        entry = self.get(key)
+        if entry is None or isinstance(entry, str):
+            return False
+        return all(field in entry and entry[field] == value for field, value in stat.items())
+
+    def report_update(self, report: RescanReport, overwrite_file: bool) -> RescanReport:
+        """Save the index if it has changed and `overwrite_file` is set, log the result of a rescan and pass its report
+        to the hooks of the index."""
 
-        if changed:
+        if report.changed:
             if overwrite_file:
-                self.save_to_file()
-                print(f"Updated '{self.name}' index and saved to file '{self.filename}'.")
+                with report.phase("save"):
+                    self.save_to_file()
+                report.saved = True
+                report.filename = self.filename
+                _logger.info(f"Updated '{self.name}' index and saved to file '{self.filename}'.")
             else:
-                print(f"Updated '{self.name}' index, not saved to file.")
+                _logger.info(f"Updated '{self.name}' index, not saved to file.")
         else:
-            print(f"No changes detected.")
-        return changed
+            if overwrite_file and self._state_changed:
+                with report.phase("save"):
+                    self.save_state()
+            _logger.info(f"No changes detected in '{self.name}' index.")
+
+        report.changes = self.publish_changes()
+        report.finish()
+        _logger.debug(report.summary())
+        for hook in self.hooks:
+            hook(report)
+        return report
+
+
+class KeywordEntry(_Mapping):
+    """Entry of a keyword document in a `KeywordIndex`: checksum, relative path and file stat of the document.
+
+    Entries are read-only mappings like the dictionaries they are created from, but store their fields in slots, which
+    takes a fraction of the memory of a dictionary. Fields other than the known ones are kept in a dictionary."""
+
+    __slots__ = ("checksum", "file", "mtime_ns", "size", "inode", "extra")
+    FIELDS = ("checksum", "file", "mtime_ns", "size", "inode")
+
+    def __init__(self, checksum: str = None, file: str = None, mtime_ns: int = None, size: int = None,
+                 inode: int = None, **extra):
+        self.checksum = checksum
+        self.file = file
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.inode = inode
+        self.extra = extra or None
+
+    def __getitem__(self, field: str):
+        if field in KeywordEntry.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                return value
+        elif self.extra is not None and field in self.extra:
+            return self.extra[field]
+        raise KeyError(field)
+
+    def __iter__(self) -> _t.Iterator[str]:
+        for field in KeywordEntry.FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"KeywordEntry({dict(self)!r})"
+
+
+class _PlainEntries(_Mapping):
+    """View of a keyword index with entries converted to dictionaries, e.g. to serialise them."""
+
+    def __init__(self, index: "KeywordIndex"):
+        self.index = index
+
+    def __getitem__(self, key: str):
+        value = self.index[key]
+        return dict(value) if isinstance(value, KeywordEntry) else value
+
+    def __iter__(self) -> _t.Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
 
 
 class KeywordIndex(Index):
 
+    def __init__(self, filename: str = "", datadir: str = "", hash_algorithm: str = "md5", **kwargs):
+        """
+        Index of keywords: unique keys refer to a `KeywordEntry` of their document, synonyms refer to their unique key
+        (a string).
+
+        The unique keys and the synonyms of each unique key are kept up to date on every change of the index, so that
+        `unique_keys`, `synonyms_of` and `resolve` do not scan the index. The references of synonyms to their unique key
+        share the string object of the unique key (or are interned), so that each name is stored only once, however
+        many synonyms refer to it.
+
+        Parameters
+        ----------
+        filename
+            (Optional) path/to/file to load previous index data from.
+        datadir
+            (Optional) relative or absolute path to directory that contains the keyword documents. Default directory is
+            defined by the index filename as given in `filename`
+        hash_algorithm
+            (Optional) name of the `hashlib` algorithm used for document checksums, e.g. "blake2b". Default: "md5"
+        kwargs
+            (Optional) keyword arguments that are passed on to the `dict` constructor (will become dictionary entries).
+        """
+        # unique key -> the string object that is the key of the index (in order of insertion), and unique key ->
+        # synonyms
+        self._unique = dict()
+        self._synonyms = dict()
+        super().__init__(filename, datadir, hash_algorithm, **kwargs)
+
+        # unique keys first, so that the references of synonyms can share their strings
+        synonyms = []
+        for key, value in list(dict.items(self)):
+            if isinstance(value, str):
+                synonyms.append((key, value))
+                continue
+            if isinstance(value, dict):
+                dict.__setitem__(self, key, KeywordEntry(**value))
+            self._unique[key] = key
+        for key, value in synonyms:
+            value = self._shared(value)
+            dict.__setitem__(self, key, value)
+            self._synonyms.setdefault(value, []).append(key)
+
+    def _shared(self, name: str) -> str:
+        """String object of the unique key `name` (or the interned `name` if it is no unique key)."""
+        shared = self._unique.get(name)
+        return _sys.intern(name) if shared is None else shared
+
+    def _link(self, key: str, value):
+        if isinstance(value, str):
+            self._synonyms.setdefault(value, []).append(key)
+        else:
+            self._unique.setdefault(key, key)
+
+    def _unlink(self, key: str, value):
+        if isinstance(value, str):
+            synonyms = self._synonyms.get(value)
+            if synonyms is not None and key in synonyms:
+                synonyms.remove(key)
+                if not synonyms:
+                    del self._synonyms[value]
+        else:
+            self._unique.pop(key, None)
+
+    def __setitem__(self, key, value):
+        if isinstance(value, str):
+            value = self._shared(value)
+        elif isinstance(value, _Mapping) and not isinstance(value, KeywordEntry):
+            value = KeywordEntry(**value)
+        if key in self:
+            previous = dict.__getitem__(self, key)
+            # a unique key whose entry is replaced keeps its position
+            if isinstance(previous, str) or isinstance(value, str):
+                self._unlink(key, previous)
+        super().__setitem__(key, value)
+        self._link(key, value)
+
+    def __delitem__(self, key):
+        value = dict.__getitem__(self, key)
+        super().__delitem__(key)
+        self._unlink(key, value)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._unlink(key, dict.__getitem__(self, key))
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._unlink(key, value)
+        return key, value
+
+    def _stored_entries(self) -> _Mapping:
+        return _PlainEntries(self)
+
+    def entry_kind(self, value) -> str:
+        return "synonym" if isinstance(value, str) else "keyword"
+
+    def document_keys(self) -> _t.List[str]:
+        return list(self._unique)
+
     def unique_keys(self) -> _t.Iterator:
         """Iterator of unique keys in the keyword index, i.e. keys that refer to themselves rather than others."""
-        return (key for key, value in self.items() if isinstance(value, dict))
+        return iter(self._unique)
+
+    def is_unique(self, name: str) -> bool:
+        """Whether `name` is a unique key, rather than a synonym or an unknown name."""
+        return name in self._unique
+
+    def synonyms_of(self, key: str) -> _t.List[str]:
+        """Synonyms of a unique key."""
+        return list(self._synonyms.get(key, ()))
 
     def synonyms(self) -> dict:
         """Dictionary with unique keys as key and a list of synonyms as values."""
+        synonyms = self._synonyms
+        return {key: list(synonyms.get(key, ())) for key in self._unique}
 
-        synonyms = dict()
-        for key in self.unique_keys():
-            synonyms[key] = []
+    def resolve(self, name: str) -> str:
+        """Unique key of a keyword name, which is either a unique key itself or a synonym."""
+        value = self[name]
+        return value if isinstance(value, str) else name
 
-        for key, value in self.items():
-            if type(value) is str:
-                synonyms[value].append(key)
+    def remove_document(self, key: str) -> bool:
+        """Remove a keyword whose document no longer exists, together with its synonyms."""
+        if key not in self._unique:
+            return False
+        for synonym in self.synonyms_of(key):
+            del self[synonym]
+        del self[key]
+        return True
 
-        return synonyms
+    def rescan_documents(self, overwrite_file=False, paranoid=False, git=False,
+                         progress: _t.Callable[[RescanReport], None] = None) -> RescanReport:
+        """Scan through documents given in `datadir` (and below). Returns a `RescanReport`, which is true if the index
+        has changed.
 
-    def rescan_documents(self, overwrite_file=False) -> bool:
-        """Scan through documents given in `datadir` (and below)."""
-        changed = False
+        Files whose modification time, size and inode are unchanged are skipped without being read, unless `paranoid`
+        is set. With `git`, only files that changed since the last rescan according to git are scanned (see
+        `collect_documents`). `progress` is called with the report after each file and may raise `RescanCancelled`
+        to stop the rescan."""
+        report = RescanReport(self.name, progress)
         # get list of filenames
-        for fname in scan_directory(self.datadir, extension=".yml"):
-            checksum = md5_checksum(fname)
-            keyword, _ = _os.path.splitext(_os.path.split(fname)[-1])
-
-            try:
-                # see if key is already known and if checksum has been changed
-                assert self[keyword]["checksum"] == checksum
-            except (KeyError, AssertionError, TypeError):
-                # index will be changed
+        with report.phase("walk"):
+            fnames, removed = self.collect_documents(".yml", git)
+        self.update_documents(fnames, removed, paranoid, report)
+        return self.report_update(report, overwrite_file)
+
+    def update_documents(self, fnames: _t.Iterable[str], removed: _t.Iterable[str] = (), paranoid=False,
+                         report: RescanReport = None) -> RescanReport:
+        """Update the index from the given keyword documents and remove the keywords `removed`, whose documents no
+        longer exist. Timings and counters are added to `report` (or a new report), which is returned and is true if
+        the index has changed."""
+        report = RescanReport(self.name) if report is None else report
+        changed = False
+        for keyword in removed:
+            if self.remove_document(keyword):
+                report.count("files_removed")
                 changed = True
-                # load keyword data into index
-                keyword_info = read_yaml_file(fname)
-                for synonym in keyword_info["synonyms"]:
-                    self[synonym] = keyword
 
-                # save new checksum and relative path of file
-                relpath = _os.path.relpath(fname, self.datadir)
-                relpath.replace("\\", "/")
-                self[keyword] = dict(checksum=checksum,
-                                     file=relpath)
+        fnames = list(fnames)
+        report.expect(len(fnames))
+        for fname in fnames:
+            changed = self._update_document(fname, paranoid, report) or changed
+            report.advance()
+
+        report.changed = report.changed or changed
+        return report
+
+    def _update_document(self, fname: str, paranoid: bool, report: RescanReport) -> bool:
+        keyword = self.document_key(fname)
+        report.count("files_seen")
+        with report.phase("stat"):
+            stat = file_stat(fname)
+        if not paranoid and self.stat_unchanged(keyword, stat):
+            report.count("files_skipped")
+            return False
+
+        with report.phase("hash"):
+            checksum = self.checksum(fname)
+        size = stat["size"]
+        report.count("files_hashed")
+        report.count("bytes_read", size)
+        stat = self.stat_record(stat)
+
+        try:
+            # see if key is already known and if checksum has been changed
+            assert self[keyword]["checksum"] == checksum
+        except (KeyError, AssertionError, TypeError):
+            # load keyword data into index
+            with report.phase("yaml"):
+                keyword_info = read_yaml_file(fname, typ="safe")
+            report.count("files_parsed")
+            report.count("bytes_read", size)
+            synonyms = keyword_info["synonyms"]
+            # synonyms that have been removed from the document are published as removed entries
+            for synonym in sorted(set(self.synonyms_of(keyword)) - set(synonyms)):
+                del self[synonym]
+            for synonym in synonyms:
+                self[synonym] = keyword
 
-        return self.report_update(changed, overwrite_file)
+            # save new checksum and relative path of file
+            relpath = _os.path.relpath(fname, self.datadir)
+            relpath.replace("\\", "/")
+            self[keyword] = dict(checksum=checksum,
+                                 file=relpath,
+                                 **stat)
+            return True
+
+        # content is unchanged, only update file stat
+        if stat and not self.stat_unchanged(keyword, stat):
+            self[keyword] = dict(self[keyword], **stat)
+            return True
+        return False
 
     def keyword_info(self, key: str):
+        """Content of the document of a keyword. Parsed documents are cached as long as the file is unchanged."""
         filename = _os.path.join(self.datadir, self[key]["file"])
-        return read_yaml_file(filename)
+        return read_yaml_file_cached(filename)
 
 
 class RelationIndex(Index):
 
     def __init__(self, keyword_index: KeywordIndex, filename: str = "",
-                 datadir: str = "", data_file_ext: str = "",
-                 **kwargs):
+                 datadir: str = "", data_file_ext: str = "", backend: str = "matcher",
+                 hash_algorithm: str = "md5", cache: ReferenceCache = None, **kwargs):
         """
         Index type for relations between keywords. Parses document files to collect keyword mentions. One document
         corresponds to one relation.
@@ -143,45 +642,283 @@ class RelationIndex(Index):
         data_file_ext
             (Optional) file extension of documents related to this index. If none is given, the index will search
             through all files in `datadir` (and below).
+        backend
+            (Optional) engine used to find keywords in documents. Either "matcher" (default) for a `KeywordMatcher`
+            that is built once per version of the keyword index, or "pyparsing" for a grammar that is created for each
+            document.
+        hash_algorithm
+            (Optional) name of the `hashlib` algorithm used for document checksums, e.g. "blake2b". Default: "md5"
+        cache
+            (Optional) `ReferenceCache` that stores keyword references by document checksum and keyword fingerprint,
+            so that documents already parsed elsewhere (e.g. on another branch) are not parsed again.
         kwargs
             (Optional) keyword arguments that are passed on to the `dict` constructor (will become dictionary entries).
         """
 
-        super().__init__(filename, datadir, **kwargs)
+        super().__init__(filename, datadir, hash_algorithm, **kwargs)
 
         self.keywords = keyword_index
         self.data_file_ext = data_file_ext
+        self.backend = backend
+        self.cache = cache
+        self.terms = TermIndex(self.terms_file if filename != "" else "")
+        self.occurrences = OccurrenceIndex(self.occurrences_file if filename != "" else "")
+        # mentions in documents that are similar to, but do not match keywords
+        self.near_misses = NearMissIndex(self.near_misses_file if filename != "" else "")
+        self._matcher = None
+        self._matcher_version = None
+        self._fingerprint = ""
+        self._fingerprint_version = None
+        self._ngrams = None
+        self._ngrams_version = None
+        # version of the keyword index at the last update
+        self._keywords_version = None
 
-    def rescan_documents(self, overwrite_file=False) -> bool:
-        """Update index from files in the database."""
+    def rescan_documents(self, overwrite_file=False, workers: int = 1, paranoid=False, git=False,
+                         progress: _t.Callable[[RescanReport], None] = None) -> RescanReport:
+        """Update index from files in the database. Returns a `RescanReport`, which is true if the index has changed
+        and includes the report of the rescan of the keyword index.
 
-        self.keywords.rescan_documents()
+        Parameters
+        ----------
+        overwrite_file
+            (Optional) save the index and the keyword index to their files if they have changed. Default: False
+        workers
+            (Optional) number of processes that hash and parse documents in parallel. The keyword matcher is sent to
+            each process only once and results are merged in the same order as in a serial run. Default: 1 (serial)
+        paranoid
+            (Optional) hash every document, even if its modification time, size and inode are unchanged.
+            Default: False
+        git
+            (Optional) only scan documents that have been added, modified, deleted or renamed since the commit of the
+            last rescan, as reported by git. Falls back to a full scan for directories with uncommitted changes or
+            outside of git repositories. Default: False
+        progress
+            (Optional) callable that receives the `RescanReport` of the keyword index and then of this index after each
+            file. It may raise `RescanCancelled` to stop the rescan, e.g. to cancel it from a GUI.
+        """
+
+        report = RescanReport(self.name, progress)
+        # the keyword index is saved with this index, so that the commit recorded in its state is never newer than its
+        # entries on disk
+        report.subreports.append(self.keywords.rescan_documents(overwrite_file=overwrite_file, paranoid=paranoid,
+                                                                git=git, progress=progress))
 
         # load all models in model directory / relations in relation directory
+        with report.phase("walk"):
+            fnames, removed = self.collect_documents(self.data_file_ext, git)
+        self.update_documents(fnames, removed, workers, paranoid, report)
+        return self.report_update(report, overwrite_file)
+
+    def update_documents(self, fnames: _t.Iterable[str], removed: _t.Iterable[str] = (), workers: int = 1,
+                         paranoid=False, report: RescanReport = None) -> RescanReport:
+        """Update the index from the given documents and remove the models `removed`, whose documents no longer exist.
+        Models affected by changes of the keyword index since the last update are matched again as well (see
+        `affected_documents`). Timings and counters are added to `report` (or a new report), which is returned and is
+        true if the index has changed."""
+        report = RescanReport(self.name) if report is None else report
         changed = False
-        for fname in scan_directory(self.datadir, extension=self.data_file_ext):
-            checksum = md5_checksum(fname)
-            model, _ = _os.path.splitext(_os.path.split(fname)[-1])
-            try:
-                # see if model is already known and if checksum has been changed
-                assert self[model]["checksum"] == checksum
-            except (KeyError, AssertionError):
-                # update/create model entry
-                refs = self.find_keyword_references(fname)
-                refs = tuple({self.keywords[ref] for ref in refs})
-                self[model] = dict(checksum=checksum,
-                                   keywords=refs)
-                # note that model index has changed
+        for model in removed:
+            if self.remove_document(model):
+                report.count("files_removed")
                 changed = True
-            else:
-                # model is known and checksum is identical
+
+        # models that may mention keywords or synonyms that have been added, removed or changed
+        affected = self.affected_documents()
+        if any("file" not in self[model] for model in affected):
+            # location of documents indexed by an older version is unknown
+            with report.phase("walk"):
+                fnames = list(scan_directory(self.datadir, extension=self.data_file_ext, recursive=self.recursive))
+        else:
+            fnames = sorted(set(fnames).union(_os.path.normpath(_os.path.join(self.datadir, self[model]["file"]))
+                                              for model in affected))
+
+        with report.phase("stat"):
+            stats = {fname: file_stat(fname) for fname in fnames}
+        fnames = [fname for fname, stat in stats.items()
+                  if paranoid or self.document_key(fname) in affected
+                  or not self.stat_unchanged(self.document_key(fname), stat)]
+        report.count("files_seen", len(stats))
+        report.count("files_skipped", len(stats) - len(fnames))
+        report.expect(len(fnames))
+
+        if fnames:
+            # the matcher is built here (if the keyword index has changed) rather than while matching the first document
+            with report.phase("grammar"):
+                if self.backend == "matcher":
+                    self.matcher
+                fingerprint = self.fingerprint if self.cache is not None else ""
+                self.ngrams
+        else:
+            fingerprint = ""
+        for fname, checksum, analysis, cached, seconds in self._scan_documents(fnames, workers, affected):
+            model = self.document_key(fname)
+            size = stats[fname]["size"]
+            stat = self.stat_record(stats[fname])
+            hash_seconds, match_seconds = seconds
+            report.add_time("hash", hash_seconds)
+            report.count("files_hashed")
+            report.count("bytes_read", size)
+            if analysis is not None:
+                report.add_time("match", match_seconds)
+                if self.cache is not None:
+                    report.count("cache_hits" if cached else "cache_misses")
+                if not cached:
+                    report.count("files_parsed")
+                    report.count("bytes_read", size)
+
+            if analysis is None:
+                # model is known and checksum is identical, only update file stat
+                if stat and not self.stat_unchanged(model, stat):
+                    self[model] = dict(self[model], **stat)
+                    changed = True
+                report.advance()
                 continue
 
-        return self.report_update(changed, overwrite_file)
+            occurrences, terms, mentions = analysis
+            if self.cache is not None and not cached:
+                self.cache.put(checksum, fingerprint, dict(occurrences=occurrences, terms=terms, mentions=mentions))
+
+            # update/create model entry
+            refs = dict()
+            for offset, name in occurrences:
+                refs.setdefault(self.keywords.resolve(name), []).append(offset)
+            relpath = _os.path.relpath(fname, self.datadir).replace("\\", "/")
+            self[model] = dict(checksum=checksum,
+                               file=relpath,
+                               keywords=tuple(sorted(refs)),
+                               **stat)
+            self.terms.set_terms(model, terms)
+            self.occurrences.set_occurrences(model, refs)
+            with report.phase("near_miss"):
+                near_misses = self.ngrams.check(terms + mentions)
+            report.count("near_misses", len(near_misses))
+            self.near_misses.set_near_misses(model, near_misses)
+            # note that model index has changed
+            changed = True
+            report.advance()
+
+        version = (id(self.keywords), self.keywords.version)
+        if self._keywords_version != version:
+            keywords = self._keyword_names()
+            if self.terms.keywords != keywords:
+                self.terms.keywords = keywords
+                self._state_changed = True
+            self._keywords_version = version
+
+        report.changed = report.changed or changed
+        return report
+
+    def _keyword_names(self) -> _t.Dict[str, str]:
+        return {name: self.keywords.resolve(name) for name in self.keywords}
+
+    def affected_documents(self) -> _t.Set[str]:
+        """Models that may mention keywords or synonyms that have been added, removed or assigned to another unique key
+        since the models have been matched, as well as models without known terms or occurrences. All models are
+        affected if the keywords of the last match are unknown."""
+        if self.terms.keywords is None:
+            return set(self)
+        unknown = {model for model in self if model not in self.terms.documents or model not in self.occurrences}
+        if self._keywords_version == (id(self.keywords), self.keywords.version):
+            # keyword index has not changed since the last update
+            return unknown
+        names = self.terms.changed_keywords(self._keyword_names())
+        if not names:
+            return unknown
+        # near-misses of removed or reassigned names are checked again, although such documents may not contain them
+        affected = self.terms.documents_containing(names) | self.near_misses.documents_referring(names)
+        return (affected | unknown) & set(self)
+
+    def remove_document(self, key: str) -> bool:
+        self.terms.remove(key)
+        self.occurrences.remove(key)
+        self.near_misses.remove(key)
+        return super().remove_document(key)
+
+    def entry_kind(self, value) -> str:
+        return "relation"
+
+    def find_relations(self, *names: str, mode: str = "and") -> _t.List[str]:
+        """Relations that reference all (mode "and") or any (mode "or") of the given keywords or synonyms."""
+        keys = [self.keywords.resolve(name) for name in names]
+        if mode == "and":
+            relations = self.occurrences.all_of(*keys)
+        elif mode == "or":
+            relations = self.occurrences.any_of(*keys)
+        else:
+            raise ValueError(f"Unknown mode '{mode}'. Use either 'and' or 'or'.")
+        return sorted(relations)
+
+    @property
+    def occurrences_file(self) -> str:
+        """Path to the file next to the index file that stores the keyword occurrences in each document."""
+        return _os.path.join(self.indexdir, f"{self.name}.occurrences.json")
+
+    @property
+    def near_misses_file(self) -> str:
+        """Path to the file next to the index file that stores the near-misses of keywords in each document."""
+        return _os.path.join(self.indexdir, f"{self.name}.near_misses.json")
+
+    @property
+    def terms_file(self) -> str:
+        """Path to the file next to the index file that stores the terms contained in each document."""
+        return _os.path.join(self.indexdir, f"{self.name}.terms.json")
+
+    def save_state(self):
+        super().save_state()
+        # only the documents that changed are appended to the journals of these files
+        self.terms.save_to_file(self.terms_file)
+        self.occurrences.save_to_file(self.occurrences_file)
+        self.near_misses.save_to_file(self.near_misses_file)
+
+    def compact(self):
+        """Rewrite the index file and the files next to it (terms, occurrences and near-misses) with all entries."""
+        super().compact()
+        for index in (self.terms, self.occurrences, self.near_misses):
+            if index.storage is not None:
+                index.compact()
+
+    def _known_checksum(self, fname: str) -> str:
+        try:
+            return self[self.document_key(fname)]["checksum"]
+        except (KeyError, TypeError):
+            return ""
+
+    def _scan_documents(self, fnames: _t.List[str], workers: int = 1,
+                        forced: _t.Collection[str] = ()) -> _t.Iterator[tuple]:
+        """Hash documents and analyse those that changed or whose keys are in `forced`. Yields (fname, checksum,
+        analysis, cached, seconds) in the order of `fnames`, where analysis is a tuple of keyword references, terms and
+        mentions (None for unchanged documents), cached tells whether it has been taken from the cache and seconds is a
+        tuple of the time spent hashing and analysing the document."""
+
+        known = ["" if self.document_key(fname) in forced else self._known_checksum(fname) for fname in fnames]
+        fingerprint = self.fingerprint if self.cache is not None else ""
+
+        if workers > 1 and len(fnames) > 1:
+            engine = self.matcher if self.backend == "matcher" else tuple(self.keywords.keys())
+            chunksize = max(1, len(fnames) // (4 * workers))
+            tasks = ((fname, previous, self.hash_algorithm) for fname, previous in zip(fnames, known))
+            initargs = (self.backend, engine, self.cache, fingerprint)
+            import multiprocessing as _multiprocessing
+            with _multiprocessing.Pool(workers, _init_worker, initargs) as pool:
+                results = pool.imap(_scan_worker, tasks, chunksize=chunksize)
+                for fname, (checksum, analysis, cached, seconds) in zip(fnames, results):
+                    if self.cache is not None and analysis is not None:
+                        # cache counters of worker processes are not sent back
+                        if cached:
+                            self.cache.hits += 1
+                        else:
+                            self.cache.misses += 1
+                    yield fname, checksum, analysis, cached, seconds
+        else:
+            for fname, previous in zip(fnames, known):
+                yield (fname, *_scan_document(fname, previous, self.analyse_document, self.hash_algorithm,
+                                              self.cache, fingerprint))
 
     @staticmethod
-    def create_grammar(keywords: _t.Iterable[str]) -> _pp.ParserElement:
+    def create_grammar(keywords: _t.Iterable[str]) -> "_pp.ParserElement":
         """Create a pyparsing grammar that matches keywords, ignoring the remainder of the text.."""
+        import pyparsing as _pp
         keywords = _pp.oneOf(keywords, caseless=False)  # matches longest string first if substrings exist
         keywords = _pp.MatchFirst(keywords)
         other_text = _pp.Suppress(_pp.SkipTo(keywords))
@@ -189,11 +926,267 @@ class RelationIndex(Index):
         grammar = _pp.OneOrMore(other_text + keywords) + line_end
         return grammar
 
-    def find_keyword_references(self, fname):
-        """Load a file (e.g. model) and find references to a given set of keywords."""
+    @property
+    def matcher(self) -> KeywordMatcher:
+        """Matcher for all keywords and synonyms. Only rebuilt if the keyword index has changed."""
+        version = (id(self.keywords), self.keywords.version)
+        if self._matcher is None or self._matcher_version != version:
+            self._matcher = KeywordMatcher(self.keywords.keys())
+            self._matcher_version = version
+        return self._matcher
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of all keywords and synonyms, under which keyword references are stored in the cache. Computed from the
+        keywords rather than the matcher, so that the pyparsing backend does not need to build one."""
+        version = (id(self.keywords), self.keywords.version)
+        if self._matcher is not None and self._matcher_version == version:
+            return self._matcher.fingerprint
+        if self._fingerprint_version != version:
+            self._fingerprint = keyword_fingerprint(self.keywords.keys())
+            self._fingerprint_version = version
+        return self._fingerprint
+
+    @property
+    def ngrams(self) -> NgramIndex:
+        """Trigram index of all keywords and synonyms to find near-misses in documents. Only rebuilt if the keyword
+        index has changed."""
+        version = (id(self.keywords), self.keywords.version)
+        if self._ngrams is None or self._ngrams_version != version:
+            self._ngrams = NgramIndex.from_keywords(self.keywords)
+            self._ngrams_version = version
+        return self._ngrams
+
+    def suggest_synonyms(self, k: int = 10, keys: _t.Iterable[str] = None) -> list:
+        """Up to `k` suggested synonyms from near-misses of keywords in documents (see
+        `knowviz.nearmiss.NearMissIndex.suggestions`), as (mention, unique key, score, documents). Near-misses of
+        keywords that are no longer in the keyword index are left out."""
+        return self.near_misses.suggestions(k, keys, self.keywords)
+
+    def find_keyword_references(self, fname, backend: str = ""):
+        """Load a file (e.g. model) and find references to a given set of keywords.
 
-        keywords = self.keywords.keys()
-        grammar = self.create_grammar(keywords)
-        results = list(parse_document(fname, grammar))
+        `backend` overrides the backend chosen for this index ("matcher" or "pyparsing")."""
+
+        backend = backend or self.backend
+        if backend == "matcher":
+            results = match_document(fname, self.matcher)
+        elif backend == "pyparsing":
+            keywords = self.keywords.keys()
+            grammar = self.create_grammar(keywords)
+            results = list(parse_document(fname, grammar))
+        else:
+            raise ValueError(f"Unknown backend '{backend}'. Use either 'matcher' or 'pyparsing'.")
 
         return results
+
+    @staticmethod
+    def create_expression(keywords: _t.Iterable[str]) -> "_pp.ParserElement":
+        """Create a pyparsing expression that matches keywords and can be used to scan a text for them."""
+        import pyparsing as _pp
+        return _pp.oneOf(keywords, caseless=False).parseWithTabs()
+
+    def analyse_document(self, fname) -> tuple:
+        """Keyword occurrences as a list of (byte offset, keyword), terms (see `knowviz.terms`) and compound mentions
+        (see `knowviz.nearmiss.extract_mentions`) of a document."""
+        if self.backend == "pyparsing":
+            return _analyse_document(fname, expression=self.create_expression(self.keywords.keys()))
+        return _analyse_document(fname, matcher=self.matcher)
+
+
+class CitationIndex(Index):
+
+    def __init__(self, filename: str = "", datadir: str = "", data_file_ext: str = "", hash_algorithm: str = "md5",
+                 **kwargs):
+        """
+        Index of the references cited in documents with \\cite{reference} or \\cite{reference, other}. One entry
+        per document holds the checksum of the document and its cited references. Documents are updated in the same
+        way as those of other indices: only documents with a changed checksum (or file stat) are scanned again.
+
+        References can be looked up in both directions, by document (`citations`) and by reference (`citing`).
+
+        Parameters
+        ----------
+        filename
+            (Optional) path/to/file to load previous index data from.
+        datadir
+            (Optional) relative or absolute path to directory that contains the documents, e.g. the directory of the
+            documents of a `RelationIndex`. Default directory is defined by the index filename as given in `filename`
+        data_file_ext
+            (Optional) file extension of documents related to this index. If none is given, the index will search
+            through all files in `datadir` (and below).
+        hash_algorithm
+            (Optional) name of the `hashlib` algorithm used for document checksums, e.g. "blake2b". Default: "md5"
+        kwargs
+            (Optional) keyword arguments that are passed on to the `dict` constructor (will become dictionary entries).
+        """
+        super().__init__(filename, datadir, hash_algorithm, **kwargs)
+        self.data_file_ext = data_file_ext
+
+        # reference -> documents that cite it
+        self.cited_by = dict()
+        for document, entry in self.items():
+            for reference in entry.get("citations", ()):
+                self.cited_by.setdefault(reference, set()).add(document)
+
+    def _set_citations(self, document: str, references: _t.Iterable[str]):
+        self._remove_citations(document)
+        for reference in references:
+            self.cited_by.setdefault(reference, set()).add(document)
+
+    def _remove_citations(self, document: str):
+        entry = self.get(document)
+        if not isinstance(entry, dict):
+            return
+        for reference in entry.get("citations", ()):
+            documents = self.cited_by.get(reference)
+            if documents is not None:
+                documents.discard(document)
+                if not documents:
+                    del self.cited_by[reference]
+
+    def rescan_documents(self, overwrite_file=False, paranoid=False, git=False,
+                         progress: _t.Callable[[RescanReport], None] = None) -> RescanReport:
+        """Scan through documents given in `datadir` (and below). Returns a `RescanReport`, which is true if the index
+        has changed.
+
+        Files whose modification time, size and inode are unchanged are skipped without being read, unless `paranoid`
+        is set. With `git`, only files that changed since the last rescan according to git are scanned (see
+        `collect_documents`). `progress` is called with the report after each file and may raise `RescanCancelled`
+        to stop the rescan."""
+        report = RescanReport(self.name, progress)
+        with report.phase("walk"):
+            fnames, removed = self.collect_documents(self.data_file_ext, git)
+        self.update_documents(fnames, removed, paranoid, report)
+        return self.report_update(report, overwrite_file)
+
+    def update_documents(self, fnames: _t.Iterable[str], removed: _t.Iterable[str] = (), paranoid=False,
+                         report: RescanReport = None) -> RescanReport:
+        """Update the index from the given documents and remove the documents `removed`, which no longer exist.
+        Timings and counters are added to `report` (or a new report), which is returned and is true if the index has
+        changed."""
+        report = RescanReport(self.name) if report is None else report
+        changed = False
+        for document in removed:
+            if self.remove_document(document):
+                report.count("files_removed")
+                changed = True
+
+        fnames = list(fnames)
+        report.expect(len(fnames))
+        for fname in fnames:
+            changed = self._update_document(fname, paranoid, report) or changed
+            report.advance()
+
+        report.changed = report.changed or changed
+        return report
+
+    def _update_document(self, fname: str, paranoid: bool, report: RescanReport) -> bool:
+        document = self.document_key(fname)
+        report.count("files_seen")
+        with report.phase("stat"):
+            stat = file_stat(fname)
+        if not paranoid and self.stat_unchanged(document, stat):
+            report.count("files_skipped")
+            return False
+
+        with report.phase("hash"):
+            checksum = self.checksum(fname)
+        size = stat["size"]
+        report.count("files_hashed")
+        report.count("bytes_read", size)
+        stat = self.stat_record(stat)
+        entry = self.get(document)
+        if isinstance(entry, dict) and entry.get("checksum") == checksum:
+            # content is unchanged, only update file stat
+            if stat and not self.stat_unchanged(document, stat):
+                self[document] = dict(entry, **stat)
+                return True
+            return False
+
+        with report.phase("match"):
+            references = tuple(sorted({reference for _, reference in scan_citations(fname)}))
+        report.count("files_parsed")
+        report.count("bytes_read", size)
+        self._set_citations(document, references)
+        relpath = _os.path.relpath(fname, self.datadir).replace("\\", "/")
+        self[document] = dict(checksum=checksum,
+                              file=relpath,
+                              citations=references,
+                              **stat)
+        return True
+
+    def remove_document(self, key: str) -> bool:
+        self._remove_citations(key)
+        return super().remove_document(key)
+
+    def citations(self, document: str) -> _t.List[str]:
+        """References cited by a document."""
+        return list(self[document].get("citations", ()))
+
+    def citing(self, *references: str, mode: str = "and") -> _t.List[str]:
+        """Documents that cite all (mode "and") or any (mode "or") of the given references."""
+        sets = [self.cited_by.get(reference, set()) for reference in references]
+        if not sets:
+            return []
+        if mode == "and":
+            documents = set.intersection(*sets)
+        elif mode == "or":
+            documents = set.union(*sets)
+        else:
+            raise ValueError(f"Unknown mode '{mode}'. Use either 'and' or 'or'.")
+        return sorted(documents)
+
+
+def _analyse_document(fname: str, matcher: KeywordMatcher = None,
+                      expression: "_pp.ParserElement" = None) -> tuple:
+    """Keyword occurrences, found with either a matcher or a pyparsing expression, terms and compound mentions of a
+    document. With a matcher, the document is scanned memory-mapped instead of being read into memory."""
+    if matcher is not None:
+        with map_document(fname) as data:
+            return match_occurrences(fname, matcher, data), extract_terms(data), extract_mentions(data)
+
+    data = read_document(fname)
+    return parse_occurrences(fname, expression, data), extract_terms(data), extract_mentions(data)
+
+
+def _scan_document(fname: str, previous_checksum: str, analyse: _t.Callable, hash_algorithm: str = "md5",
+                   cache: ReferenceCache = None, fingerprint: str = "") -> tuple:
+    """Hash a document and analyse it if the checksum differs from `previous_checksum`. The analysis is looked up in
+    `cache` first, if given. Returns (checksum, analysis, cached, (seconds hashing, seconds analysing))."""
+    start = _time.perf_counter()
+    checksum = _checksum(fname, hash_algorithm)
+    hashed = _time.perf_counter()
+    if checksum == previous_checksum:
+        return checksum, None, False, (hashed - start, 0.0)
+
+    if cache is not None:
+        cached = cache.get(checksum, fingerprint)
+        if cached is not None:
+            analysis = (cached["occurrences"], cached["terms"], cached["mentions"])
+            return checksum, analysis, True, (hashed - start, _time.perf_counter() - hashed)
+
+    analysis = analyse(fname)
+    return checksum, analysis, False, (hashed - start, _time.perf_counter() - hashed)
+
+
+# state of a worker process, set once per process by `_init_worker`
+_worker_analyse = None
+_worker_cache = None
+_worker_fingerprint = ""
+
+
+def _init_worker(backend: str, engine, cache: ReferenceCache = None, fingerprint: str = ""):
+    global _worker_analyse, _worker_cache, _worker_fingerprint
+    if backend == "matcher":
+        _worker_analyse = _functools.partial(_analyse_document, matcher=engine)
+    else:
+        _worker_analyse = _functools.partial(_analyse_document, expression=RelationIndex.create_expression(engine))
+    _worker_cache = cache
+    _worker_fingerprint = fingerprint
+
+
+def _scan_worker(args: tuple) -> tuple:
+    fname, previous_checksum, hash_algorithm = args
+    return _scan_document(fname, previous_checksum, _worker_analyse, hash_algorithm,
+                          _worker_cache, _worker_fingerprint)
@@ -1,18 +1,39 @@
 """Set of file-related operations
 """
+import contextlib as _contextlib
+import copy as _copy
+import hashlib as _hashlib
+import json as _json
+import mmap as _mmap
 import os as _os
+import threading as _threading
 import typing as _t
-from hashlib import md5 as _md5
-
-import pyparsing as _pp
+from collections import OrderedDict as _OrderedDict
 
 from knowviz import ParserError as _ParserError
 
+if _t.TYPE_CHECKING:
+    # pyparsing takes longer to import than the rest of the package and is only imported where it is used
+    import pyparsing as _pp
+
 __author__ = "Daniel Rose"
 __status__ = "Development"
 
+CHUNK_SIZE = 1 << 20
+
+# maximum number of documents kept by `read_yaml_file_cached`
+YAML_CACHE_SIZE = 1024
+
+_yaml_instances = _threading.local()
+_yaml_cache = _OrderedDict()
+_yaml_cache_lock = _threading.Lock()
+
+_NO_KEYWORD_MESSAGE = ("Could not find any known keyword in file {}.\n"
+                       "You can resolve this error by either adding an alias for a keyword in the index or by "
+                       "reviewing the file and properly referencing known keywords.")
+
 
-def parse_document(fname: str, grammar: _pp.ParserElement, parse_all=True) -> list:
+def parse_document(fname: str, grammar: "_pp.ParserElement", parse_all=True) -> list:
     """Open a document file and parse its content.
 
     Parameters:
@@ -29,23 +50,181 @@ def parse_document(fname: str, grammar: _pp.ParserElement, parse_all=True) -> li
     results
         list of results
         """
+    import pyparsing as _pp
 
     try:
         results = grammar.parseFile(fname, parseAll=parse_all)
     except _pp.ParseException as e:
-        raise _ParserError(f"Could not find any known keyword in file {fname}.\n"
-                           "You can resolve this error by either adding an alias for a keyword in the index or by "
-                           "reviewing the file and properly referencing known keywords.")
+        raise _ParserError(_NO_KEYWORD_MESSAGE.format(fname))
+
+    return results
+
+
+def read_document(fname: str) -> bytes:
+    """Read the raw content of a document file."""
+    with open(fname, "rb") as file:
+        return file.read()
+
+
+@_contextlib.contextmanager
+def map_document(fname: str) -> _t.Iterator[_t.Union[_mmap.mmap, bytes]]:
+    """Context in which the content of a document file is available as a read-only memory map, which can be searched
+    with (bytes) regular expressions like `bytes` without reading the whole file into memory. Files that cannot be
+    mapped, e.g. empty files, are read instead."""
+    with open(fname, "rb") as file:
+        try:
+            data = _mmap.mmap(file.fileno(), 0, access=_mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            data = None
+
+        if data is None:
+            yield file.read()
+        else:
+            with data:
+                yield data
+
+
+def scan_document(fname: str, pattern: _t.Pattern[bytes], chunk_size: int = 0,
+                  overlap: int = 0) -> _t.Iterator[_t.Tuple[int, _t.Match[bytes]]]:
+    """Find all matches of a regular expression in a document file without reading the whole file into memory.
+
+    Parameters:
+    -----------
+    fname
+        path/to/file
+    pattern
+        compiled regular expression for bytes
+    chunk_size
+        (Optional) read the file in chunks of this many bytes instead of mapping it into memory. Matches that cross
+        the boundary of two chunks are found as long as they are not longer than `overlap` bytes. Default: 0 (map the
+        file into memory)
+    overlap
+        (Optional) maximum length of a match in bytes, only used when reading in chunks
+
+    Returns:
+    --------
+    results
+        iterator of (offset, match) in order of appearance, where offset is the byte offset of the match in the file
+        """
+
+    if chunk_size <= 0:
+        with map_document(fname) as data:
+            for match in pattern.finditer(data):
+                yield match.start(), match
+        return
+
+    with open(fname, "rb") as file:
+        # file offset of the start of the buffer
+        base = 0
+        buffer = b""
+        while True:
+            chunk = file.read(chunk_size)
+            buffer += chunk
+            # matches that start after the limit may continue in the next chunk
+            limit = len(buffer) if not chunk else len(buffer) - overlap
+            position = 0
+            for match in pattern.finditer(buffer):
+                if match.start() >= limit:
+                    break
+                yield base + match.start(), match
+                position = match.end()
+            if not chunk:
+                return
+            start = max(position, limit)
+            base += start
+            buffer = buffer[start:]
+
+
+def match_document(fname: str, matcher, data: bytes = None) -> list:
+    """Open a document file and find all keywords of a `KeywordMatcher` in its content.
+
+    Parameters:
+    -----------
+    fname
+        path/to/file
+    matcher
+        a `knowviz.matcher.KeywordMatcher`
+    data
+        (Optional) content of the file, if it has already been read
+
+    Returns:
+    --------
+    results
+        list of matched keywords in order of appearance
+        """
+
+    if data is None:
+        with map_document(fname) as data:
+            results = matcher.findall(data)
+    else:
+        results = matcher.findall(data)
+
+    if not results:
+        raise _ParserError(_NO_KEYWORD_MESSAGE.format(fname))
+
+    return results
+
+
+def match_occurrences(fname: str, matcher, data: bytes = None) -> _t.List[_t.Tuple[int, str]]:
+    """Like `match_document`, but returns (offset, keyword) for each occurrence, where offset is a byte offset."""
+
+    if data is None:
+        with map_document(fname) as data:
+            results = list(matcher.finditer(data))
+    else:
+        results = list(matcher.finditer(data))
+
+    if not results:
+        raise _ParserError(_NO_KEYWORD_MESSAGE.format(fname))
 
     return results
 
 
-def read_yaml_file(fname: str) -> dict:
-    """Load index of quantities and pseudonyms from a YAML file."""
+def parse_occurrences(fname: str, expression: "_pp.ParserElement",
+                      data: bytes = None) -> _t.List[_t.Tuple[int, str]]:
+    """Scan a document for matches of a pyparsing expression and return (offset, match) for each of them, where offset
+    is a byte offset."""
+
+    if data is None:
+        data = read_document(fname)
+    # pyparsing needs the whole document as str. Bytes that are not valid UTF-8 are decoded to lone surrogates, which
+    # are encoded to the same single bytes again, so that offsets are the same as with the matcher
+    text = bytes(data).decode(errors="surrogateescape")
+
+    results = []
+    position = offset = 0
+    for tokens, start, _ in expression.scanString(text):
+        offset += len(text[position:start].encode(errors="surrogateescape"))
+        position = start
+        results.append((offset, tokens[0]))
+
+    if not results:
+        raise _ParserError(_NO_KEYWORD_MESSAGE.format(fname))
+
+    return results
+
+
+def yaml_instance(typ: str = "rt"):
+    """Reusable ruamel `YAML` object of this thread.
+
+    Parameters:
+    -----------
+    typ
+        "rt" (round-trip, default) preserves comments and ordering for files that are written back, "safe" uses the
+        C-accelerated loader (if available) and is faster when round-trip fidelity is not needed.
+    """
+    instances = _yaml_instances.__dict__
+    if typ not in instances:
+        from ruamel.yaml import YAML
+        instances[typ] = YAML(typ=typ)
+    return instances[typ]
+
+
+def read_yaml_file(fname: str, typ: str = "rt") -> dict:
+    """Load index of quantities and pseudonyms from a YAML file. See `yaml_instance` for `typ`."""
 
     fname = _os.path.normpath(fname)
-    from ruamel.yaml import YAML
-    yaml = YAML()
+    yaml = yaml_instance(typ)
     try:
         with open(fname, "r") as file:
             return dict(yaml.load(file))
@@ -54,33 +233,112 @@ def read_yaml_file(fname: str) -> dict:
             return dict()
 
 
+def read_yaml_file_cached(fname: str, typ: str = "safe") -> dict:
+    """Load a YAML file like `read_yaml_file`, but keep up to `YAML_CACHE_SIZE` parsed documents in memory. A cached
+    document is used as long as modification time and size of the file are unchanged. Returns a copy that can be
+    modified without affecting the cache."""
+
+    path = _os.path.abspath(fname)
+    stat = _os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _yaml_cache_lock:
+        entry = _yaml_cache.get((path, typ))
+        if entry is not None and entry[0] == signature:
+            _yaml_cache.move_to_end((path, typ))
+            return _copy.deepcopy(entry[1])
+
+    content = read_yaml_file(path, typ)
+
+    with _yaml_cache_lock:
+        _yaml_cache[(path, typ)] = (signature, content)
+        _yaml_cache.move_to_end((path, typ))
+        while len(_yaml_cache) > YAML_CACHE_SIZE:
+            _yaml_cache.popitem(last=False)
+
+    return _copy.deepcopy(content)
+
+
+def clear_yaml_cache():
+    """Remove all documents from the cache of `read_yaml_file_cached`."""
+    with _yaml_cache_lock:
+        _yaml_cache.clear()
+
+
+@_contextlib.contextmanager
+def _replaced_file(fname: str) -> _t.Iterator[_t.TextIO]:
+    """Context in which a temporary file is written that replaces `fname` at once when the context is left. The
+    temporary file is synced to disk first, so that an interrupted write never leaves a truncated file behind."""
+    tmpname = fname + ".tmp"
+    with open(tmpname, "w") as file:
+        yield file
+        file.flush()
+        _os.fsync(file.fileno())
+    _os.replace(tmpname, fname)
+
+
 def write_yaml_file(fname: str, content: _t.Iterable):
-    """Write content to a yaml file"""
+    """Write content to a yaml file. The file is replaced at once, so it is never left partially written."""
     fname = _os.path.normpath(fname)
     if not (fname.endswith(".yml") or fname.endswith(".yaml")):
         fname = _os.path.join(fname, ".yml")
 
-    from ruamel.yaml import YAML
-    yaml = YAML()
-
-    with open(fname, "w+") as file:
+    yaml = yaml_instance("rt")
+    with _replaced_file(fname) as file:
         yaml.dump(content, file)
 
 
-def md5_checksum(fname: str):
-    """Compute md5 checksum of a file."""
-    hasher = _md5()
+def read_json_file(fname: str) -> dict:
+    """Load a JSON file, e.g. data derived from an index."""
+    with open(_os.path.normpath(fname), "r") as file:
+        return _json.load(file)
+
+
+def write_json_file(fname: str, content: _t.Any):
+    """Write content to a JSON file. The file is replaced at once, so it is never left partially written."""
+    with _replaced_file(_os.path.normpath(fname)) as file:
+        _json.dump(content, file, separators=(",", ":"))
+
+
+def checksum(fname: str, algorithm: _t.Union[str, _t.Callable] = "md5", chunk_size: int = CHUNK_SIZE) -> str:
+    """Compute the checksum of a file.
+
+    Parameters:
+    -----------
+    fname
+        path/to/file
+    algorithm
+        name of a `hashlib` algorithm (e.g. "md5" or "blake2b") or a callable that returns a new hash object.
+        Default: "md5"
+    chunk_size
+        number of bytes read at once. Default: 1 MiB
+    """
+    hasher = _hashlib.new(algorithm) if isinstance(algorithm, str) else algorithm()
     with open(fname, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        for chunk in iter(lambda: f.read(chunk_size), b""):
             hasher.update(chunk)
     return hasher.hexdigest()
 
 
-def scan_directory(dirname, extension="") -> _t.Iterator[str]:
-    """Recursively scan directory and subdirectories for files with given file extension (default: '') """
-    for file_or_dir in _os.listdir(dirname):
+def md5_checksum(fname: str):
+    """Compute md5 checksum of a file."""
+    return checksum(fname, "md5")
+
+
+def file_stat(fname: str) -> dict:
+    """Modification time (ns), size and inode of a file, which are used to detect changes without reading it."""
+    stat = _os.stat(fname)
+    return dict(mtime_ns=stat.st_mtime_ns, size=stat.st_size, inode=stat.st_ino)
+
+
+def scan_directory(dirname, extension="", recursive: bool = True) -> _t.Iterator[str]:
+    """Recursively scan directory and subdirectories (unless `recursive` is False) for files with given file extension
+    (default: ''). Files are yielded in sorted order."""
+    for file_or_dir in sorted(_os.listdir(dirname)):
         file_or_dir = _os.path.normpath(_os.path.join(dirname, file_or_dir))
         if _os.path.isdir(file_or_dir):
+            if not recursive:
+                continue
             for file in scan_directory(file_or_dir, extension):
                 yield file
         elif _os.path.isfile(file_or_dir) and file_or_dir.endswith(extension):
@@ -0,0 +1,230 @@
+"""Force-directed 2D layout of the keyword graph.
+"""
+import math as _math
+import os as _os
+import typing as _t
+
+import numpy as _np
+
+from knowviz.io import read_json_file, write_json_file
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# nodes whose repulsion by other cells is computed at once, limits memory to about chunk size x cells x 40 bytes
+_CHUNK_SIZE = 1024
+# cells with more nodes are divided again instead of computing the repulsion of all pairs of nodes in them
+_LEAF_SIZE = 64
+
+
+def _repulsion(positions: _np.ndarray, k: float) -> _np.ndarray:
+    """Approximate repulsive forces (k^2 / distance between each pair of nodes), similar to Barnes-Hut. Nodes are binned
+    into a grid of about n^(2/3) cells with similar numbers of nodes per row and column. Other cells repel a node from
+    their center of mass, which takes O(nodes x cells) instead of O(nodes^2) operations. Nodes in the same cell repel
+    each other exactly, or recursively in a finer grid if the cell is crowded."""
+    n = len(positions)
+    forces = _np.zeros_like(positions)
+    if n < 2:
+        return forces
+    x, y = positions[:, 0], positions[:, 1]
+    minimum = 1e-4 * k * k
+
+    # grid lines at quantiles, so that outliers do not leave most nodes in a few cells
+    size = max(1, int(_math.ceil(n ** (1 / 3))))
+    quantiles = _np.linspace(0, 1, size + 1)[1:-1]
+    cell_ids = _np.searchsorted(_np.quantile(x, quantiles), x) * size \
+        + _np.searchsorted(_np.quantile(y, quantiles), y)
+
+    counts = _np.bincount(cell_ids, minlength=size * size)
+    occupied = _np.flatnonzero(counts)
+    masses = counts[occupied].astype(float)
+    center_x = _np.bincount(cell_ids, weights=x, minlength=size * size)[occupied] / masses
+    center_y = _np.bincount(cell_ids, weights=y, minlength=size * size)[occupied] / masses
+    # column of the cell of each node
+    own = _np.searchsorted(occupied, cell_ids)
+
+    for start in range(0, n, _CHUNK_SIZE):
+        stop = min(start + _CHUNK_SIZE, n)
+        dx = x[start:stop, _np.newaxis] - center_x[_np.newaxis, :]
+        dy = y[start:stop, _np.newaxis] - center_y[_np.newaxis, :]
+        weights = k * k * masses[_np.newaxis, :] / _np.maximum(dx * dx + dy * dy, minimum)
+        weights[_np.arange(stop - start), own[start:stop]] = 0
+        forces[start:stop, 0] = (dx * weights).sum(axis=1)
+        forces[start:stop, 1] = (dy * weights).sum(axis=1)
+
+    # nodes within the same cell repel each other exactly, crowded cells are divided into a grid again
+    crowded = counts[occupied] > _LEAF_SIZE
+    if len(occupied) > 1:
+        for cell in occupied[crowded]:
+            members = _np.flatnonzero(cell_ids == cell)
+            forces[members] += _repulsion(positions[members], k)
+        sparse = ~crowded[own]
+    else:
+        sparse = _np.ones(n, dtype=bool)
+
+    order = _np.flatnonzero(sparse)[_np.argsort(cell_ids[sparse], kind="stable")]
+    sorted_ids = cell_ids[order]
+    sizes = counts[sorted_ids]
+    starts = _np.searchsorted(sorted_ids, sorted_ids)
+    first = _np.repeat(order, sizes)
+    offsets = _np.arange(len(first)) - _np.repeat(_np.cumsum(sizes) - sizes, sizes)
+    second = order[_np.repeat(starts, sizes) + offsets]
+    different = first != second
+    first, second = first[different], second[different]
+    dx, dy = x[first] - x[second], y[first] - y[second]
+    weights = k * k / _np.maximum(dx * dx + dy * dy, minimum)
+    forces[:, 0] += _np.bincount(first, weights=dx * weights, minlength=n)
+    forces[:, 1] += _np.bincount(first, weights=dy * weights, minlength=n)
+
+    return forces
+
+
+class ForceLayout:
+
+    def __init__(self, graph, filename: str = "", seed: int = 0, iterations: int = 100, warm_iterations: int = 20,
+                 gravity: float = 0.05):
+        """
+        Force-directed layout (Fruchterman-Reingold) of the keywords and relations of a `KeywordGraph`, where each
+        relation is attracted by the keywords it references and all nodes repel each other.
+
+        Forces are computed for all nodes at once with NumPy: attraction along the edges in O(edges), repulsion with a
+        grid approximation (see `_repulsion`) in O(nodes x cells) per iteration. A weak gravity keeps unconnected
+        parts of the graph close to the origin.
+
+        Positions are saved next to the relation index (`<name>.layout.json`). If positions are known from a previous
+        run, the layout is warm-started: known nodes start at their previous positions and new nodes next to their
+        neighbours, and only `warm_iterations` iterations are run, in which known nodes take much smaller steps than
+        new ones, so that the layout changes little when a few documents are added.
+
+        Parameters
+        ----------
+        graph
+            `KeywordGraph` to lay out
+        filename
+            (Optional) path/to/file.json to load and save positions. Default: next to the file of the relation index
+        seed
+            (Optional) seed of the random initial positions. Default: 0
+        iterations
+            (Optional) number of iterations of a layout from scratch. Default: 100
+        warm_iterations
+            (Optional) number of iterations of a warm-started layout. Default: 20
+        gravity
+            (Optional) strength of the attraction towards the origin. Default: 0.05
+        """
+        self.graph = graph
+        self.seed = seed
+        self.iterations = iterations
+        self.warm_iterations = warm_iterations
+        self.gravity = gravity
+        index = graph.index
+        if filename == "" and index.filename not in ("", "."):
+            filename = _os.path.join(index.indexdir, f"{index.name}.layout.json")
+        self.filename = filename
+
+        # name -> position of keywords and relations
+        self.keywords = dict()
+        self.relations = dict()
+        if filename != "" and _os.path.isfile(filename):
+            content = read_json_file(filename)
+            self.keywords = {name: tuple(position) for name, position in content["keywords"].items()}
+            self.relations = {name: tuple(position) for name, position in content["relations"].items()}
+
+    def save_to_file(self, filename: str = ""):
+        if filename != "":
+            self.filename = filename
+        elif self.filename == "":
+            raise ValueError("No filename defined. Please define a filename.")
+        content = dict(keywords={name: [round(x, 4), round(y, 4)] for name, (x, y) in sorted(self.keywords.items())},
+                       relations={name: [round(x, 4), round(y, 4)] for name, (x, y) in sorted(self.relations.items())})
+        write_json_file(self.filename, content)
+
+    def _nodes(self) -> _t.Tuple[list, list, _np.ndarray, _np.ndarray]:
+        """Names of keyword and relation nodes, and edges between nodes (keyword nodes first, then relations)."""
+        graph = self.graph
+        graph.update()
+        indptr, indices = graph.incidence()
+
+        relation_ids = [rid for rid, name in enumerate(graph.relation_names) if name is not None]
+        referenced = _np.zeros(len(graph.keyword_names), dtype=bool)
+        referenced[indices] = True
+        keyword_ids = sorted(set(_np.flatnonzero(referenced).tolist())
+                             | {graph.keyword_id(key) for key in graph.index.keywords.unique_keys()})
+
+        keyword_nodes = _np.full(len(graph.keyword_names), -1, dtype=_np.int64)
+        keyword_nodes[keyword_ids] = _np.arange(len(keyword_ids))
+        relation_nodes = _np.full(len(graph.relation_names), -1, dtype=_np.int64)
+        relation_nodes[relation_ids] = _np.arange(len(relation_ids)) + len(keyword_ids)
+
+        rows = _np.repeat(_np.arange(len(indptr) - 1), _np.diff(indptr))
+        sources, targets = relation_nodes[rows], keyword_nodes[indices]
+        return ([graph.keyword_names[kid] for kid in keyword_ids], [graph.relation_names[rid] for rid in relation_ids],
+                sources, targets)
+
+    @staticmethod
+    def _initial_positions(known: list, sources: _np.ndarray, targets: _np.ndarray, rng: _np.random.Generator,
+                           k: float) -> _t.Tuple[_np.ndarray, _np.ndarray]:
+        """Start positions of all nodes, given the known position (or None) of each node, and a mask of nodes whose
+        position is known."""
+        n = len(known)
+        positions = _np.full((n, 2), _np.nan)
+        for node, position in enumerate(known):
+            if position is not None:
+                positions[node] = position
+        missing = _np.isnan(positions[:, 0])
+        if missing.all():
+            return rng.uniform(-1, 1, (n, 2)) * _math.sqrt(n) * k / 2, ~missing
+
+        # place new nodes at the center of their known neighbours (or neighbours placed in the first pass), or anywhere
+        # if no neighbour is known
+        ends, other_ends = _np.concatenate((sources, targets)), _np.concatenate((targets, sources))
+        for _ in range(2):
+            known_neighbour = ~_np.isnan(positions[other_ends, 0]) & _np.isnan(positions[ends, 0])
+            nodes, neighbours = ends[known_neighbour], other_ends[known_neighbour]
+            counts = _np.bincount(nodes, minlength=n)
+            placed = counts > 0
+            for d in range(2):
+                sums = _np.bincount(nodes, weights=positions[neighbours, d], minlength=n)
+                positions[placed, d] = sums[placed] / counts[placed]
+        missing_now = _np.isnan(positions[:, 0])
+        low, high = _np.nanmin(positions, axis=0), _np.nanmax(positions, axis=0)
+        positions[missing_now] = rng.uniform(low, high, (int(missing_now.sum()), 2))
+        positions[missing] += rng.normal(0, 0.1 * k, (int(missing.sum()), 2))
+        return positions, ~missing
+
+    def run(self, iterations: int = None) -> _t.Tuple[_t.Dict[str, tuple], _t.Dict[str, tuple]]:
+        """Compute the layout and return the positions of keywords and relations (name -> (x, y))."""
+        keyword_names, relation_names, sources, targets = self._nodes()
+        n = len(keyword_names) + len(relation_names)
+        known = [self.keywords.get(name) for name in keyword_names] \
+            + [self.relations.get(name) for name in relation_names]
+
+        rng = _np.random.default_rng(self.seed)
+        # ideal distance between connected nodes
+        k = 1.0
+        positions, fixed = self._initial_positions(known, sources, targets, rng, k)
+        warm = fixed.any()
+        if iterations is None:
+            iterations = self.warm_iterations if warm else self.iterations
+        # maximum step size, which decreases linearly to zero
+        temperature = 2 * k if warm else _math.sqrt(n) * k / 2
+        mobility = _np.where(fixed, 0.05, 1.0)
+
+        for iteration in range(iterations):
+            forces = _repulsion(positions, k)
+
+            delta = positions[sources] - positions[targets]
+            distance = _np.sqrt((delta ** 2).sum(axis=1))
+            pull = delta * (distance / k)[:, _np.newaxis]
+            for d in range(2):
+                forces[:, d] -= _np.bincount(sources, weights=pull[:, d], minlength=n)
+                forces[:, d] += _np.bincount(targets, weights=pull[:, d], minlength=n)
+            forces -= self.gravity * positions * _np.sqrt((positions ** 2).sum(axis=1))[:, _np.newaxis] / k
+
+            length = _np.maximum(_np.sqrt((forces ** 2).sum(axis=1)), 1e-9)
+            step = temperature * (1 - iteration / iterations)
+            positions += forces * (_np.minimum(length, step * mobility) / length)[:, _np.newaxis]
+
+        self.keywords = {name: (float(x), float(y)) for name, (x, y) in zip(keyword_names, positions)}
+        self.relations = {name: (float(x), float(y))
+                          for name, (x, y) in zip(relation_names, positions[len(keyword_names):])}
+        return self.keywords, self.relations
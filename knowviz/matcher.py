@@ -0,0 +1,92 @@
+"""Multi-pattern matching of keywords in documents.
+"""
+import hashlib as _hashlib
+import re as _re
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+_TERMINAL = None
+
+
+def keyword_fingerprint(keywords: _t.Iterable[str]) -> str:
+    """Hash of a set of keywords (including synonyms) that identifies the results of matching them in a document.
+    Empty strings are ignored, like in `KeywordMatcher`."""
+    return _hashlib.sha1("\n".join(sorted(set(keyword for keyword in keywords if keyword))).encode()).hexdigest()
+
+
+class KeywordMatcher:
+
+    def __init__(self, keywords: _t.Iterable[str]):
+        """
+        Find occurrences of a fixed set of keywords in a single pass over a document.
+
+        The keywords are stored in a trie (the goto-function of an Aho-Corasick automaton) that is compiled into a
+        single regular expression, so that the scan itself runs inside the regex engine. Matching follows the same
+        rules as the pyparsing grammar of `RelationIndex.create_grammar`: the text is searched from left to right, at
+        each position the longest keyword wins and matches do not overlap.
+
+        Documents are matched as bytes, keywords are encoded as UTF-8. Offsets returned by `finditer` are therefore
+        byte offsets.
+
+        Parameters
+        ----------
+        keywords
+            Keywords (including synonyms) to search for. Empty strings are ignored.
+        """
+        self.keywords = frozenset(keyword for keyword in keywords if keyword)
+        self._names = {keyword.encode(): keyword for keyword in self.keywords}
+        # length of the longest keyword in bytes, e.g. the overlap needed to scan a document in chunks
+        self.max_length = max(map(len, self._names), default=0)
+        self.pattern = _re.compile(self._compile_trie(self._build_trie(self._names)))
+        self.fingerprint = keyword_fingerprint(self.keywords)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    @staticmethod
+    def _build_trie(words: _t.Iterable[bytes]) -> dict:
+        trie = dict()
+        for word in words:
+            node = trie
+            for byte in word:
+                node = node.setdefault(byte, dict())
+            node[_TERMINAL] = True
+        return trie
+
+    @classmethod
+    def _compile_trie(cls, node: dict) -> bytes:
+        """Turn a trie into a regular expression. Longer matches are preferred because optional groups are greedy."""
+        if not node:
+            # never matches
+            return rb"(?!)"
+
+        branches = [_re.escape(bytes((byte,))) + cls._compile_trie(child)
+                    for byte, child in sorted((k, v) for k, v in node.items() if k is not _TERMINAL)]
+        if not branches:
+            # leaf node: end of a keyword
+            return b""
+
+        if len(branches) == 1 and _TERMINAL not in node:
+            return branches[0]
+
+        pattern = b"(?:" + b"|".join(branches) + b")"
+        if _TERMINAL in node:
+            pattern += b"?"
+        return pattern
+
+    def finditer(self, text: _t.Union[str, bytes]) -> _t.Iterator[_t.Tuple[int, str]]:
+        """Iterate over (offset, keyword) for all keyword occurrences in `text`."""
+        if isinstance(text, str):
+            text = text.encode()
+        names = self._names
+        for match in self.pattern.finditer(text):
+            yield match.start(), names[match.group()]
+
+    def findall(self, text: _t.Union[str, bytes]) -> _t.List[str]:
+        """List of all keyword occurrences in `text` in order of appearance."""
+        if isinstance(text, str):
+            text = text.encode()
+        names = self._names
+        return [names[word] for word in self.pattern.findall(text)]
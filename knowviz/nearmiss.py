@@ -0,0 +1,232 @@
+"""Near-misses of keywords in documents, i.e. mentions that are probably meant as a keyword but do not match it, e.g.
+"Q1" or "q_{1}" for the keyword "q1", or typos.
+"""
+import re as _re
+import typing as _t
+
+from knowviz.storage import JsonDocumentIndex
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# runs of word characters joined by braces, carets or hyphens, e.g. "q_{1}", "c^{2}" or "heat-capacity", which are split
+# into several terms by `knowviz.terms.extract_terms`
+_COMPOUND = _re.compile(rb"[\w\x80-\xff]+(?:[{}^\-]+[\w\x80-\xff]+)+}*")
+# padding of names before they are split into trigrams, so that the first and last characters are part of 3 trigrams
+_START = "\x02\x02"
+_END = "\x03\x03"
+
+
+class NearMiss(_t.NamedTuple):
+    """Mention in a document that is similar to the keyword `name` (unique key `key`). `score` is 1 for mentions
+    that only differ in case and punctuation, and decreases with the edit distance."""
+    mention: str
+    key: str
+    name: str
+    score: float
+
+
+def extract_mentions(data: _t.Union[str, bytes]) -> _t.List[str]:
+    """Sorted list of distinct compound mentions in a text (see `_COMPOUND`), which complement the terms of a document
+    (see `knowviz.terms.extract_terms`) as candidates of near-misses."""
+    if isinstance(data, str):
+        data = data.encode()
+    mentions = {match.group() for match in _COMPOUND.finditer(data)}
+    return sorted(mention.decode(errors="surrogateescape") for mention in mentions)
+
+
+def normalize(name: str) -> str:
+    """Name in lower case without punctuation, e.g. "q1" for "Q_{1}"."""
+    return "".join(character for character in name.casefold() if character.isalnum())
+
+
+def _trigrams(form: str) -> _t.Set[str]:
+    padded = _START + form + _END
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> _t.Optional[int]:
+    """Levenshtein distance of two strings, or None if it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, character in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (character != other)))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class NgramIndex:
+
+    def __init__(self, names: _t.Mapping[str, str], max_distance: int = 2, min_length: int = 2):
+        """
+        Trigram index of keyword names (unique keys and synonyms) to find the keyword closest to a mention.
+
+        Names are compared in normalized form (see `normalize`), so that mentions that only differ in case and
+        punctuation are found directly. Other candidates are looked up in posting lists of (trigram, length), which only
+        contain names of similar length: two strings within edit distance d share all but at most 3 d of the trigrams
+        of either string, so only names that share enough trigrams with a mention are compared by edit distance. The
+        allowed distance grows with the length of a mention, from 0 for up to 3 characters to 1 for up to 7 and
+        `max_distance` for longer ones, so that short mentions such as "q2" are not reported for "q1".
+
+        Results are cached per mention, since most terms recur in many documents.
+
+        Parameters
+        ----------
+        names
+            dictionary of name -> unique key, where the unique key of a unique key is itself
+        max_distance
+            (Optional) maximum edit distance between the normalized forms of a mention and a name. Default: 2
+        min_length
+            (Optional) minimum length of normalized mentions. Default: 2
+        """
+        self.keys = dict(names)
+        self.max_distance = max_distance
+        self.min_length = min_length
+        # normalized form -> names, unique keys first
+        self._forms = dict()
+        for name in sorted(self.keys, key=lambda name: (self.keys[name] != name, name)):
+            self._forms.setdefault(normalize(name), []).append(name)
+        self._form_list = list(self._forms)
+        # (trigram, length of form) -> positions in `_form_list`
+        self._postings = dict()
+        for position, form in enumerate(self._form_list):
+            for gram in _trigrams(form):
+                self._postings.setdefault((gram, len(form)), []).append(position)
+        self._cache = dict()
+
+    @classmethod
+    def from_keywords(cls, keyword_index, **kwargs) -> "NgramIndex":
+        """Trigram index of all keywords and synonyms of a `KeywordIndex`."""
+        return cls({name: keyword_index.resolve(name) for name in keyword_index}, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def allowed_distance(self, form: str) -> int:
+        """Maximum edit distance of a normalized mention to a name."""
+        return min(self.max_distance, len(form) // 4)
+
+    def _candidates(self, form: str, distance: int) -> _t.Iterator[str]:
+        grams = _trigrams(form)
+        threshold = len(grams) - 3 * distance
+        counts = dict()
+        for length in range(len(form) - distance, len(form) + distance + 1):
+            for gram in grams:
+                for position in self._postings.get((gram, length), ()):
+                    counts[position] = counts.get(position, 0) + 1
+        return (self._form_list[position] for position, count in counts.items() if count >= threshold)
+
+    def search(self, mention: str) -> _t.Optional[NearMiss]:
+        """Closest keyword to a mention that is not a keyword name itself, or None if there is none within the allowed
+        edit distance. Of several names with equal distance, the one that sorts first is chosen."""
+        try:
+            return self._cache[mention]
+        except KeyError:
+            pass
+
+        result = None
+        form = normalize(mention)
+        if mention not in self.keys and len(form) >= self.min_length and not form.isdigit():
+            if form in self._forms:
+                best, distance = form, 0
+            else:
+                best, distance = None, None
+                limit = self.allowed_distance(form)
+                if limit > 0:
+                    for candidate in self._candidates(form, limit):
+                        found = edit_distance(form, candidate, limit)
+                        if found is not None and (distance is None or (found, candidate) < (distance, best)):
+                            best, distance = candidate, found
+            if best is not None:
+                name = self._forms[best][0]
+                result = NearMiss(mention, self.keys[name], name, 1.0 - distance / max(len(form), len(best)))
+        self._cache[mention] = result
+        return result
+
+    def check(self, mentions: _t.Iterable[str]) -> _t.List[NearMiss]:
+        """Near-misses among mentions (e.g. the terms of a document), in order of decreasing score."""
+        near_misses = (self.search(mention) for mention in mentions)
+        return sorted((near_miss for near_miss in near_misses if near_miss is not None),
+                      key=lambda near_miss: (-near_miss.score, near_miss.mention))
+
+
+class NearMissIndex(JsonDocumentIndex):
+
+    def __init__(self, filename: str = ""):
+        """
+        Near-misses of keywords found in each document (document -> list of `NearMiss`), from which new synonyms can
+        be suggested (see `suggestions`).
+
+        Parameters
+        ----------
+        filename
+            (Optional) path/to/file.json to load previous data from
+        """
+        super().__init__(filename)
+        self.documents = {document: [NearMiss(*near_miss) for near_miss in near_misses]
+                          for document, near_misses in self._load_entries().items()}
+
+    def _stored_keys(self) -> _t.List[str]:
+        return sorted(self.documents)
+
+    def _stored_value(self, document: str):
+        return [list(near_miss) for near_miss in self.documents[document]]
+
+    def __contains__(self, document: str) -> bool:
+        return document in self.documents
+
+    def set_near_misses(self, document: str, near_misses: _t.Iterable[NearMiss]):
+        """Set the near-misses of a document. Documents without near-misses are not stored."""
+        near_misses = list(near_misses)
+        if near_misses:
+            if self.documents.get(document) != near_misses:
+                self.documents[document] = near_misses
+                self._set_changed(document)
+        else:
+            self.remove(document)
+
+    def remove(self, document: str):
+        """Remove all near-misses of a document."""
+        if self.documents.pop(document, None) is not None:
+            self._set_removed(document)
+
+    def documents_referring(self, names: _t.Iterable[str]) -> _t.Set[str]:
+        """Documents with near-misses of any of the keyword `names`, either as unique key or as the closest name."""
+        names = set(names)
+        return {document for document, near_misses in self.documents.items()
+                if any(near_miss.key in names or near_miss.name in names for near_miss in near_misses)}
+
+    def suggestions(self, k: int = None, keys: _t.Iterable[str] = None,
+                    keywords=None) -> _t.List[_t.Tuple[str, str, float, _t.List[str]]]:
+        """Suggested synonyms as (mention, unique key, score, documents), ranked by score and then by the number of
+        documents that contain the mention.
+
+        Parameters
+        ----------
+        k
+            (Optional) maximum number of suggestions. Default: all
+        keys
+            (Optional) only suggest synonyms of these unique keys. Default: all keys
+        keywords
+            (Optional) current `KeywordIndex`, near-misses of names that it no longer contains or that belong to
+            another unique key are left out. Default: no check
+        """
+        keys = None if keys is None else set(keys)
+        found = dict()
+        for document, near_misses in self.documents.items():
+            for near_miss in near_misses:
+                if keywords is not None and (near_miss.name not in keywords
+                                             or keywords.resolve(near_miss.name) != near_miss.key):
+                    continue
+                if keys is None or near_miss.key in keys:
+                    entry = found.setdefault((near_miss.mention, near_miss.key), (near_miss.score, []))
+                    entry[1].append(document)
+        suggestions = sorted(((mention, key, score, sorted(documents))
+                              for (mention, key), (score, documents) in found.items()),
+                             key=lambda suggestion: (-suggestion[2], -len(suggestion[3]), suggestion[0]))
+        return suggestions if k is None else suggestions[:k]
@@ -0,0 +1,98 @@
+"""Reverse index from keywords to the relations that reference them, with positions of each occurrence.
+"""
+import typing as _t
+
+from knowviz.storage import JsonDocumentIndex
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+
+class OccurrenceIndex(JsonDocumentIndex):
+
+    def __init__(self, filename: str = ""):
+        """
+        Occurrences of keywords in relation documents, stored per relation (relation -> keyword -> offsets) and
+        inverted for lookups by keyword (keyword -> relation -> offsets).
+
+        Keywords are unique keys of a `KeywordIndex`, i.e. occurrences of synonyms are counted for the keyword they
+        refer to. Offsets are byte offsets into the document.
+
+        Parameters
+        ----------
+        filename
+            (Optional) path/to/file.json to load previous data from
+        """
+        super().__init__(filename)
+        # relation -> keyword -> offsets
+        self.relations = dict()
+        # keyword -> relation -> offsets
+        self.keywords = dict()
+
+        for relation, occurrences in self._load_entries().items():
+            self.set_occurrences(relation, occurrences)
+        self._changed_keys.clear()
+
+    def _stored_keys(self) -> _t.List[str]:
+        return sorted(self.relations)
+
+    def _stored_value(self, relation: str):
+        return {key: list(offsets) for key, offsets in sorted(self.relations[relation].items())}
+
+    def __contains__(self, relation: str) -> bool:
+        return relation in self.relations
+
+    def set_occurrences(self, relation: str, occurrences: _t.Dict[str, _t.Sequence[int]]):
+        """Set the occurrences (keyword -> offsets) of a relation."""
+        self.remove(relation)
+        occurrences = {key: tuple(offsets) for key, offsets in occurrences.items()}
+        self.relations[relation] = occurrences
+        self._set_changed(relation)
+        for key, offsets in occurrences.items():
+            self.keywords.setdefault(key, dict())[relation] = offsets
+
+    def remove(self, relation: str):
+        """Remove all occurrences in a relation."""
+        occurrences = self.relations.pop(relation, None)
+        if occurrences is None:
+            return
+        self._set_removed(relation)
+        for key in occurrences:
+            relations = self.keywords[key]
+            del relations[relation]
+            if not relations:
+                del self.keywords[key]
+
+    def occurrences(self, keyword: str, relation: str) -> _t.Tuple[int, ...]:
+        """Offsets of all occurrences of a keyword in a relation."""
+        return self.keywords.get(keyword, {}).get(relation, ())
+
+    def count(self, keyword: str, relation: str = "") -> int:
+        """Number of occurrences of a keyword in a relation, or in all relations if no relation is given."""
+        if relation != "":
+            return len(self.occurrences(keyword, relation))
+        return sum(len(offsets) for offsets in self.keywords.get(keyword, {}).values())
+
+    def counts(self, relation: str) -> _t.Dict[str, int]:
+        """Number of occurrences of each keyword in a relation."""
+        return {key: len(offsets) for key, offsets in self.relations.get(relation, {}).items()}
+
+    def any_of(self, *keywords: str) -> _t.Set[str]:
+        """Relations that reference at least one of the keywords."""
+        relations = set()
+        for key in keywords:
+            relations.update(self.keywords.get(key, ()))
+        return relations
+
+    def all_of(self, *keywords: str) -> _t.Set[str]:
+        """Relations that reference all of the keywords."""
+        if not keywords:
+            return set()
+        # intersect starting with the rarest keyword
+        candidates = sorted((self.keywords.get(key, {}) for key in keywords), key=len)
+        relations = set(candidates[0])
+        for other in candidates[1:]:
+            relations.intersection_update(other)
+            if not relations:
+                break
+        return relations
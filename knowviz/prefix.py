@@ -0,0 +1,78 @@
+"""Prefix search of keyword names, e.g. for type-ahead selection.
+"""
+import bisect as _bisect
+import re as _re
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# separators between words of a keyword name, e.g. "surface_temperature" or "heat capacity"
+_SEPARATORS = _re.compile(r"[\s_\-./]+")
+
+
+def _word_starts(name: str) -> _t.List[int]:
+    return [match.end() for match in _SEPARATORS.finditer(name) if 0 < match.end() < len(name)]
+
+
+class PrefixIndex:
+
+    def __init__(self, names: _t.Mapping[str, str]):
+        """
+        Case-insensitive prefix index of keyword names (unique keys and synonyms).
+
+        Names are kept in sorted lists, so that all names starting with a prefix form a contiguous range that is found
+        by binary search in O(log n), and only as many entries as requested are read from it. Besides whole names, every
+        word of a name is indexed (words are separated by whitespace, "_", "-", "." or "/"), so that "temp" also finds
+        "surface_temperature". Matches at the start of a name are listed before matches of later words.
+
+        Parameters
+        ----------
+        names
+            dictionary of name -> unique key, where the unique key of a unique key is itself
+        """
+        self.keys = dict(names)
+        names = sorted((name.casefold(), name) for name in self.keys)
+        self._names = [folded for folded, _ in names]
+        self._name_values = [name for _, name in names]
+
+        words = sorted((folded[start:], name) for folded, name in names for start in _word_starts(folded))
+        self._words = [word for word, _ in words]
+        self._word_values = [name for _, name in words]
+
+    @classmethod
+    def from_keywords(cls, keyword_index) -> "PrefixIndex":
+        """Prefix index of all keywords and synonyms of a `KeywordIndex`."""
+        return cls({name: keyword_index.resolve(name) for name in keyword_index})
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def _range(entries: _t.List[str], prefix: str) -> range:
+        start = _bisect.bisect_left(entries, prefix)
+        # all strings with the prefix sort before the prefix followed by the largest code point
+        stop = _bisect.bisect_left(entries, prefix + "\U0010ffff", start)
+        return range(start, stop)
+
+    def iter_matches(self, prefix: str) -> _t.Iterator[_t.Tuple[str, str]]:
+        """Iterate over (name, unique key) of names that start with `prefix` or have a word that does, each unique key
+        only once: names starting with the prefix in alphabetical order first, then names with a matching word."""
+        prefix = prefix.casefold()
+        seen = set()
+        for entries, values in ((self._names, self._name_values), (self._words, self._word_values)):
+            for position in self._range(entries, prefix):
+                name = values[position]
+                key = self.keys[name]
+                if key not in seen:
+                    seen.add(key)
+                    yield name, key
+
+    def search(self, prefix: str, k: int = 10, offset: int = 0) -> _t.List[_t.Tuple[str, str]]:
+        """Up to `k` matches (name, unique key) of `prefix` (see `iter_matches`), skipping the first `offset`
+        matches, e.g. to show one page of matches at a time."""
+        matches = self.iter_matches(prefix)
+        for _ in range(offset):
+            if next(matches, None) is None:
+                return []
+        return [match for _, match in zip(range(k), matches)]
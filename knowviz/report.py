@@ -0,0 +1,122 @@
+"""Reports of index rescans with per-phase timings and counters.
+"""
+import contextlib as _contextlib
+import time as _time
+import typing as _t
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# phases of a rescan, in the order in which they usually take place
+PHASES = ("walk", "stat", "hash", "grammar", "match", "near_miss", "yaml", "save")
+COUNTERS = ("files_seen", "files_skipped", "files_hashed", "files_parsed", "files_removed", "cache_hits",
+            "cache_misses", "bytes_read", "near_misses")
+
+
+class RescanCancelled(Exception):
+    """Raised by a progress callback to stop a rescan. Entries updated before are kept, but the index is not saved."""
+
+
+class RescanReport:
+
+    def __init__(self, name: str, progress: _t.Callable[["RescanReport"], None] = None):
+        """
+        Report of a rescan (or update) of an index: whether it changed and was saved, the time spent in each phase and
+        counters of the files that have been processed.
+
+        Phases (seconds, see `PHASES`): "walk" (listing documents), "stat" (file stats), "hash" (checksums), "grammar"
+        (building the keyword matcher and trigram index), "match" (finding keywords, terms or citations), "near_miss"
+        (finding mentions similar to keywords), "yaml" (reading keyword documents) and "save" (writing the index).
+        Phases of worker processes are summed over all processes, so they can exceed the wall time of a parallel rescan.
+
+        Counters (see `COUNTERS`): files seen, skipped because their stat is unchanged, hashed and parsed, entries
+        removed, reference cache hits and misses, bytes read while hashing and parsing, and near-misses of keywords.
+
+        A report is true if the index has changed, so it can be used like the boolean result of earlier versions.
+
+        While files are processed, `done` and `total` tell the progress of the rescan, and `progress` is called with
+        the report after each file. It may raise `RescanCancelled` to stop the rescan.
+
+        Parameters
+        ----------
+        name
+            name of the index
+        progress
+            (Optional) callable that receives the report whenever the number of processed files changes
+        """
+        self.name = name
+        self.changed = False
+        self.saved = False
+        self.filename = ""
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # reports of indices rescanned as part of this one, e.g. the keyword index of a relation index
+        self.subreports = []
+        # `ChangeSet` published at the end of the rescan
+        self.changes = None
+        self.progress = progress
+        # processed files and files to process
+        self.done = 0
+        self.total = 0
+        self._start = _time.perf_counter()
+        self.duration = 0.0
+
+    def __bool__(self) -> bool:
+        return self.changed
+
+    def __repr__(self) -> str:
+        return f"RescanReport({self.name!r}, changed={self.changed}, duration={self.duration:.3f})"
+
+    @_contextlib.contextmanager
+    def phase(self, name: str):
+        """Context manager that adds the time spent in its body to the phase `name`."""
+        start = _time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, _time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, number: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    def expect(self, number: int):
+        """Add `number` files to the files to process."""
+        self.total += number
+        if self.progress is not None:
+            self.progress(self)
+
+    def advance(self, number: int = 1):
+        """Mark `number` files as processed."""
+        self.done += number
+        if self.progress is not None:
+            self.progress(self)
+
+    @property
+    def eta(self) -> float:
+        """Estimated number of seconds until all files are processed, assuming a constant rate since the start of the
+        rescan. Infinite until the first file has been processed."""
+        if self.done >= self.total:
+            return 0.0
+        if self.done == 0:
+            return float("inf")
+        return (_time.perf_counter() - self._start) * (self.total - self.done) / self.done
+
+    def finish(self) -> "RescanReport":
+        """Record the total duration since the report has been created."""
+        self.duration = _time.perf_counter() - self._start
+        return self
+
+    def as_dict(self) -> dict:
+        """Content of the report as a dictionary of built-in types, e.g. to export it as JSON."""
+        return dict(name=self.name, changed=self.changed, saved=self.saved, filename=self.filename,
+                    duration=self.duration, timings=dict(self.timings), counters=dict(self.counters),
+                    subreports=[report.as_dict() for report in self.subreports])
+
+    def summary(self) -> str:
+        """One line with the duration, the non-zero counters and the phases of the rescan."""
+        counters = ", ".join(f"{name}={value}" for name, value in self.counters.items() if value)
+        timings = ", ".join(f"{name}={value:.3f}s" for name, value in self.timings.items() if value)
+        return f"'{self.name}' rescanned in {self.duration:.3f}s ({counters or 'no files'}; {timings or 'no phases'})"
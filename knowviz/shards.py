@@ -0,0 +1,375 @@
+"""Indices partitioned into shards (e.g. one per team) with merged read-only views.
+"""
+import os as _os
+import typing as _t
+from collections.abc import Mapping as _Mapping
+
+from knowviz.index import Index, KeywordIndex, RelationIndex
+from knowviz.nearmiss import NearMissIndex
+from knowviz.report import RescanReport
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# shard of the documents directly in the data directory
+ROOT_SHARD = "_root"
+
+
+class ShardCollisionError(ValueError):
+    """Raised if a name is defined differently by two shards, e.g. a synonym of different keywords."""
+
+
+def discover_shards(datadir: str) -> _t.List[str]:
+    """Names of the shards of a data directory: `ROOT_SHARD` for the documents directly in it and one shard per
+    top-level subdirectory (except hidden ones)."""
+    names = [name for name in sorted(_os.listdir(datadir))
+             if not name.startswith(".") and name != ROOT_SHARD and _os.path.isdir(_os.path.join(datadir, name))]
+    return [ROOT_SHARD] + names
+
+
+def _open_shard(spec: dict, keyword_index=None) -> Index:
+    """Index of a shard, loaded from its file if it exists. `spec` holds the file name, data directory and index
+    options of the shard, see `ShardedIndex.shard_spec`."""
+    options = dict(spec)
+    filename = options.pop("filename")
+    recursive = options.pop("recursive")
+    if not _os.path.isfile(filename):
+        # new shard, which is saved to its file on the first rescan
+        options["filename"] = ""
+    else:
+        options["filename"] = filename
+    index = KeywordIndex(**options) if keyword_index is None else RelationIndex(keyword_index, **options)
+    index.filename = filename
+    index.recursive = recursive
+    return index
+
+
+def _rescan_shard(index: Index, extension: str, overwrite_file: bool, paranoid: bool, git: bool,
+                  workers: int = 1, progress: _t.Callable = None) -> RescanReport:
+    """Rescan a single shard, without rescanning the keyword index of a relation shard."""
+    report = RescanReport(index.name, progress)
+    with report.phase("walk"):
+        fnames, removed = index.collect_documents(extension, git)
+    if isinstance(index, RelationIndex):
+        index.update_documents(fnames, removed, workers, paranoid, report)
+    else:
+        index.update_documents(fnames, removed, paranoid, report)
+    return index.report_update(report, overwrite_file)
+
+
+def _rescan_worker(args: tuple) -> RescanReport:
+    spec, keyword_spec, extension, paranoid, git = args
+    keyword_index = None if keyword_spec is None else ShardedKeywordIndex(**keyword_spec)
+    index = _open_shard(spec, keyword_index)
+    report = _rescan_shard(index, extension, True, paranoid, git)
+    # hooks and subscribers of the parent process are called with the report there
+    report.progress = None
+    return report
+
+
+class ShardedIndex(_Mapping):
+
+    def __init__(self, directory: str, datadir: str, shards: _t.Iterable[str] = None, hash_algorithm: str = "md5",
+                 strict: bool = True):
+        """
+        Base class of indices that are partitioned into shards by the top-level subdirectories of their data directory
+        (see `discover_shards`). Each shard is an index of its own with its own file `<directory>/<shard>.yml`, so
+        that shards can be rescanned independently (e.g. by different teams) and in parallel.
+
+        The sharded index is a read-only mapping of all entries of all shards. Names are looked up in a merged map of
+        name -> shard, which is rebuilt whenever a shard has changed. Names that are defined differently by more than
+        one shard are collisions (see `collisions`), which raise a `ShardCollisionError` on access if `strict` is set.
+
+        Parameters
+        ----------
+        directory
+            path/to/directory of the shard index files
+        datadir
+            path/to/directory of the documents, whose top-level subdirectories are the shards
+        shards
+            (Optional) names of the shards. Default: all shards of `datadir`, updated on each rescan
+        hash_algorithm
+            (Optional) name of the `hashlib` algorithm used for document checksums. Default: "md5"
+        strict
+            (Optional) raise a `ShardCollisionError` when entries are accessed while shards collide. Default: True
+        """
+        self.directory = directory
+        self.datadir = datadir
+        self.hash_algorithm = hash_algorithm
+        self.strict = strict
+        self._fixed_shards = shards is not None
+        # callables that receive the `ChangeSet` of each shard that has changed
+        self.subscribers = []
+        self.shards = dict()
+        self._owners = dict()
+        self._collisions = dict()
+        self._owners_version = None
+        self._open_shards(list(shards) if shards is not None else discover_shards(datadir))
+
+    @property
+    def name(self) -> str:
+        return _os.path.basename(_os.path.normpath(self.directory))
+
+    def shard_spec(self, shard: str) -> dict:
+        """File name, data directory and index options of a shard, from which each process can open it."""
+        datadir = self.datadir if shard == ROOT_SHARD else _os.path.join(self.datadir, shard)
+        # documents in subdirectories of the data directory belong to the other shards
+        return dict(filename=_os.path.join(self.directory, f"{shard}.yml"), datadir=datadir,
+                    hash_algorithm=self.hash_algorithm, recursive=shard != ROOT_SHARD)
+
+    def _load_shard(self, shard: str) -> Index:
+        raise NotImplementedError
+
+    def _open_shards(self, names: _t.List[str]):
+        shards = dict()
+        for shard in names:
+            index = self.shards.get(shard)
+            shards[shard] = index if index is not None else self._add_shard(shard)
+        self.shards = shards
+
+    def _add_shard(self, shard: str) -> Index:
+        index = self._load_shard(shard)
+        index.subscribers.append(self._forward_changes)
+        return index
+
+    def _forward_changes(self, changes):
+        for subscriber in self.subscribers:
+            subscriber(changes)
+
+    def _reload_shard(self, shard: str) -> Index:
+        """Load a shard again from its file, e.g. after another process has rescanned it. The hooks and subscribers of
+        the previous index object are kept."""
+        previous = self.shards[shard]
+        index = self._load_shard(shard)
+        index.hooks = previous.hooks
+        index.subscribers = previous.subscribers
+        self.shards[shard] = index
+        return index
+
+    @property
+    def version(self) -> tuple:
+        """Shards and their versions, which changes whenever an entry of a shard is set or removed."""
+        return tuple((shard, id(index), index.version) for shard, index in self.shards.items())
+
+    @staticmethod
+    def _compatible(value, other) -> bool:
+        """Whether two shards may both define a name with these values."""
+        return False
+
+    def _merge(self):
+        version = self.version
+        if self._owners_version == version:
+            return
+        owners = dict()
+        collisions = dict()
+        for shard, index in self.shards.items():
+            for key, value in index.items():
+                owner = owners.setdefault(key, shard)
+                if owner != shard and not self._compatible(self.shards[owner][key], value):
+                    collisions.setdefault(key, [owner]).append(shard)
+        self._owners, self._collisions = owners, collisions
+        self._owners_version = version
+
+    def collisions(self) -> _t.Dict[str, _t.List[str]]:
+        """Names that are defined differently by more than one shard, and the shards that define them."""
+        self._merge()
+        return {key: list(shards) for key, shards in self._collisions.items()}
+
+    def owners(self) -> _t.Dict[str, str]:
+        """Map of name -> shard that defines it (the first one in case of collisions)."""
+        self._merge()
+        if self.strict and self._collisions:
+            details = ", ".join(f"'{key}' ({', '.join(shards)})" for key, shards in sorted(self._collisions.items()))
+            raise ShardCollisionError(f"Names defined differently by several shards of '{self.name}': {details}")
+        return self._owners
+
+    def shard_of(self, key: str) -> str:
+        """Shard that defines the entry `key`."""
+        return self.owners()[key]
+
+    def __getitem__(self, key: str):
+        return self.shards[self.owners()[key]][key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.owners()
+
+    def __iter__(self) -> _t.Iterator[str]:
+        return iter(self.owners())
+
+    def __len__(self) -> int:
+        return len(self.owners())
+
+    def save_to_file(self):
+        """Save all shards to their files."""
+        for index in self.shards.values():
+            index.save_to_file()
+
+    def _extension(self) -> str:
+        raise NotImplementedError
+
+    def _keyword_spec(self) -> _t.Optional[dict]:
+        return None
+
+    def _rescan_shards(self, report: RescanReport, overwrite_file: bool, workers: int, paranoid: bool, git: bool,
+                       progress: _t.Callable = None):
+        """Rescan all shards, in `workers` processes if `overwrite_file` is set (each process rescans whole shards and
+        saves them to their files, which are loaded again afterwards)."""
+        if not self._fixed_shards:
+            self._open_shards(discover_shards(self.datadir))
+
+        extension = self._extension()
+        if workers > 1 and overwrite_file and len(self.shards) > 1:
+            tasks = [(self.shard_spec(shard), self._keyword_spec(), extension, paranoid, git) for shard in self.shards]
+            import multiprocessing as _multiprocessing
+            with _multiprocessing.Pool(min(workers, len(tasks))) as pool:
+                results = pool.map(_rescan_worker, tasks, chunksize=1)
+            for shard, result in zip(list(self.shards), results):
+                index = self._reload_shard(shard)
+                # same order as in `Index.report_update`: subscribers (including `_forward_changes`), then hooks
+                if result.changes:
+                    for subscriber in index.subscribers:
+                        subscriber(result.changes)
+                for hook in index.hooks:
+                    hook(result)
+                report.subreports.append(result)
+        else:
+            for index in self.shards.values():
+                report.subreports.append(_rescan_shard(index, extension, overwrite_file, paranoid, git,
+                                                       progress=progress))
+
+        for result in report.subreports:
+            report.changed = report.changed or result.changed
+            for name, seconds in result.timings.items():
+                report.add_time(name, seconds)
+            for name, number in result.counters.items():
+                report.count(name, number)
+        report.saved = overwrite_file and report.changed
+        return report.finish()
+
+
+class ShardedKeywordIndex(ShardedIndex):
+    """Keyword index partitioned into shards (see `ShardedIndex`), which can be used as the keyword index of a
+    `RelationIndex`. Two shards collide if they define the same unique key, or the same synonym of different keys."""
+
+    def _load_shard(self, shard: str) -> KeywordIndex:
+        return _open_shard(self.shard_spec(shard))
+
+    def _extension(self) -> str:
+        return ".yml"
+
+    @staticmethod
+    def _compatible(value, other) -> bool:
+        return isinstance(value, str) and value == other
+
+    def resolve(self, name: str) -> str:
+        """Unique key of a keyword name, which is either a unique key itself or a synonym."""
+        value = self[name]
+        return value if isinstance(value, str) else name
+
+    def unique_keys(self) -> _t.Iterator[str]:
+        """Iterator of unique keys of all shards."""
+        owners = self.owners()
+        return (key for shard, index in self.shards.items() for key in index.unique_keys() if owners[key] == shard)
+
+    def is_unique(self, name: str) -> bool:
+        return name in self and self.shards[self.owners()[name]].is_unique(name)
+
+    def synonyms_of(self, key: str) -> _t.List[str]:
+        """Synonyms of a unique key, defined by any shard."""
+        synonyms = []
+        for index in self.shards.values():
+            synonyms.extend(synonym for synonym in index.synonyms_of(key) if synonym not in synonyms)
+        return synonyms
+
+    def synonyms(self) -> dict:
+        """Dictionary with unique keys as key and a list of synonyms as values."""
+        return {key: self.synonyms_of(key) for key in self.unique_keys()}
+
+    def keyword_info(self, key: str):
+        """Content of the document of a keyword."""
+        return self.shards[self.shard_of(key)].keyword_info(key)
+
+    def rescan_documents(self, overwrite_file=False, paranoid=False, git=False, progress: _t.Callable = None,
+                         workers: int = 1) -> RescanReport:
+        """Rescan all shards (see `KeywordIndex.rescan_documents`), in `workers` processes if `overwrite_file` is set.
+        Returns a report with the report of each shard."""
+        report = RescanReport(self.name, progress)
+        return self._rescan_shards(report, overwrite_file, workers, paranoid, git, progress)
+
+
+class ShardedRelationIndex(ShardedIndex):
+
+    def __init__(self, keyword_index: ShardedKeywordIndex, directory: str, datadir: str,
+                 shards: _t.Iterable[str] = None, data_file_ext: str = "", backend: str = "matcher",
+                 hash_algorithm: str = "md5", strict: bool = True):
+        """
+        Relation index partitioned into shards (see `ShardedIndex`). Documents of every shard are matched against the
+        keywords of all shards of `keyword_index`. Two shards collide if they contain documents with the same name.
+
+        Parameters
+        ----------
+        keyword_index
+            `ShardedKeywordIndex` (or `KeywordIndex`) that relations refer to
+        directory
+            path/to/directory of the shard index files
+        datadir
+            path/to/directory of the documents, whose top-level subdirectories are the shards
+        shards
+            (Optional) names of the shards. Default: all shards of `datadir`, updated on each rescan
+        data_file_ext
+            (Optional) file extension of documents. Default: all files
+        backend
+            (Optional) engine used to find keywords in documents, see `RelationIndex`. Default: "matcher"
+        hash_algorithm
+            (Optional) name of the `hashlib` algorithm used for document checksums. Default: "md5"
+        strict
+            (Optional) raise a `ShardCollisionError` when entries are accessed while shards collide. Default: True
+        """
+        self.keywords = keyword_index
+        self.data_file_ext = data_file_ext
+        self.backend = backend
+        super().__init__(directory, datadir, shards, hash_algorithm, strict)
+
+    def shard_spec(self, shard: str) -> dict:
+        return dict(super().shard_spec(shard), data_file_ext=self.data_file_ext, backend=self.backend)
+
+    def _load_shard(self, shard: str) -> RelationIndex:
+        return _open_shard(self.shard_spec(shard), self.keywords)
+
+    def _extension(self) -> str:
+        return self.data_file_ext
+
+    def _keyword_spec(self) -> dict:
+        keywords = self.keywords
+        return dict(directory=keywords.directory, datadir=keywords.datadir, shards=list(keywords.shards),
+                    hash_algorithm=keywords.hash_algorithm, strict=keywords.strict)
+
+    def find_relations(self, *names: str, mode: str = "and") -> _t.List[str]:
+        """Relations of all shards that reference all (mode "and") or any (mode "or") of the given keywords or
+        synonyms."""
+        relations = []
+        for index in self.shards.values():
+            relations.extend(index.find_relations(*names, mode=mode))
+        return sorted(relations)
+
+    def suggest_synonyms(self, k: int = 10, keys: _t.Iterable[str] = None) -> list:
+        """Up to `k` suggested synonyms from near-misses of keywords in the documents of all shards (see
+        `RelationIndex.suggest_synonyms`)."""
+        near_misses = NearMissIndex()
+        for index in self.shards.values():
+            near_misses.documents.update(index.near_misses.documents)
+        return near_misses.suggestions(k, keys, self.keywords)
+
+    def rescan_documents(self, overwrite_file=False, workers: int = 1, paranoid=False, git=False,
+                         progress: _t.Callable = None) -> RescanReport:
+        """Rescan the keyword index and then all shards (see `RelationIndex.rescan_documents`), in `workers` processes
+        if `overwrite_file` is set. Returns a report with the report of the keyword index and of each shard."""
+        keyword_report = self.keywords.rescan_documents(overwrite_file=overwrite_file, paranoid=paranoid, git=git,
+                                                        progress=progress, workers=workers)
+        # shards are matched against the keywords of all shards, which must not collide
+        self.keywords.owners()
+
+        report = RescanReport(self.name, progress)
+        self._rescan_shards(report, overwrite_file, workers, paranoid, git, progress)
+        report.subreports.insert(0, keyword_report)
+        return report
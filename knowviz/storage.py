@@ -0,0 +1,426 @@
+"""Storage backends that load and save index data.
+"""
+import contextlib as _contextlib
+import hashlib as _hashlib
+import json as _json
+import os as _os
+import typing as _t
+from collections.abc import Mapping as _Mapping, MutableMapping as _MutableMapping
+
+from knowviz.io import read_yaml_file, write_yaml_file, read_json_file, write_json_file, checksum as _checksum, \
+    file_stat
+
+if _t.TYPE_CHECKING:
+    import sqlite3 as _sqlite3
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+YAML_EXTENSIONS = (".yml", ".yaml")
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+JSON_EXTENSIONS = (".json",)
+
+# directory of JSON copies of parsed YAML index files (see `YamlStorage`), disabled if empty. The command line interface
+# uses indices/ in `knowviz.cache.default_cache_dir()`
+PARSED_CACHE_DIR = ""
+
+
+class Storage:
+    """Base class of storage backends. A backend loads all entries of an index at once and saves either all entries or
+    only those that have changed."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def exists(self) -> bool:
+        return _os.path.isfile(self.filename)
+
+    def load(self) -> dict:
+        raise NotImplementedError
+
+    def save(self, entries: dict, changed: _t.Iterable[str] = None, removed: _t.Iterable[str] = ()):
+        """Save entries. If `changed` is given, only entries with these keys (and the `removed` keys) need to be
+        written."""
+        raise NotImplementedError
+
+    def compact(self, entries: dict):
+        """Rewrite the storage with all entries, removing data that is no longer needed."""
+        self.save(entries)
+
+
+class YamlStorage(Storage):
+
+    def __init__(self, filename: str, compaction_ratio: float = 0.5, min_compaction_size: int = 64 * 2 ** 10):
+        """
+        Storage in a YAML file with an append-only journal of changes next to it.
+
+        Saving only appends the entries that changed to the journal (`<filename>.journal`, one JSON record per line),
+        and loading replays the journal on top of the YAML file. Once the journal grows larger than `compaction_ratio`
+        times the size of the YAML file, the YAML file is rewritten (compacted) and the journal removed. Both the YAML
+        file and the journal are always left in a consistent state: the YAML file is replaced at once and the journal
+        starts with the checksum of the YAML file it belongs to, so that it is ignored if the YAML file has been
+        replaced since. An incomplete last record (e.g. from an interrupted save) is ignored as well.
+
+        Call `compact` before committing an index to version control, so that the YAML file is complete.
+
+        Parsing YAML takes much longer than reading the same data from JSON. If `PARSED_CACHE_DIR` is set, the entries
+        of a parsed YAML file are kept there as JSON, keyed by the path and checksum of the YAML file, and loaded from
+        there as long as the YAML file is unchanged, e.g. by short-lived processes in git hooks.
+
+        Parameters
+        ----------
+        filename
+            path/to/file.yml
+        compaction_ratio
+            (Optional) maximum size of the journal relative to the size of the YAML file. Default: 0.5
+        min_compaction_size
+            (Optional) journals smaller than this number of bytes are never compacted. Default: 64 KiB
+        """
+        super().__init__(filename)
+        self.compaction_ratio = compaction_ratio
+        self.min_compaction_size = min_compaction_size
+        # checksum and stat of the YAML file the journal belongs to
+        self._base_checksum = ""
+        self._base_stat = None
+        self._journal_valid = False
+        self._compact_on_save = False
+
+    @property
+    def journal_file(self) -> str:
+        return self.filename + ".journal"
+
+    def _record_base(self):
+        self._base_checksum = _checksum(self.filename) if self.exists() else ""
+        self._base_stat = file_stat(self.filename) if self.exists() else None
+
+    def _parsed_copy(self) -> str:
+        """Path of the JSON copy of the YAML file in `PARSED_CACHE_DIR`."""
+        name = _hashlib.sha1(_os.path.abspath(self.filename).encode()).hexdigest()
+        return _os.path.join(PARSED_CACHE_DIR, f"{name}-{self._base_checksum}.json")
+
+    def _read_base(self) -> dict:
+        if PARSED_CACHE_DIR == "" or not self.exists():
+            return read_yaml_file(self.filename)
+        copy = self._parsed_copy()
+        try:
+            with open(copy, "r") as file:
+                return _json.load(file)
+        except (OSError, ValueError):
+            pass
+
+        entries = read_yaml_file(self.filename)
+        if _checksum(self.filename) != self._base_checksum:
+            # file has been replaced while it was parsed
+            return entries
+        try:
+            content = _json.dumps(entries)
+            directory, name = _os.path.split(copy)
+            _os.makedirs(directory, exist_ok=True)
+            # copies of previous versions of the file are not needed anymore
+            prefix = name.split("-")[0] + "-"
+            for other in _os.listdir(directory):
+                if other.startswith(prefix):
+                    _os.remove(_os.path.join(directory, other))
+            # written to a temporary file first, so that concurrent readers never see partial copies
+            import tempfile as _tempfile
+            fd, tmpname = _tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with _os.fdopen(fd, "w") as file:
+                file.write(content)
+                file.flush()
+                _os.fsync(file.fileno())
+            _os.replace(tmpname, copy)
+        except (OSError, TypeError, ValueError):
+            # entries that cannot be represented in JSON, or the cache directory is not writable
+            pass
+        return entries
+
+    def _write_base(self, entries: _t.Mapping):
+        write_yaml_file(self.filename, dict(entries))
+
+    def load(self) -> dict:
+        self._record_base()
+        if self.exists() or not _os.path.isfile(self.journal_file):
+            entries = self._read_base()
+        else:
+            entries = dict()
+        self._journal_valid = False
+
+        if not _os.path.isfile(self.journal_file):
+            return entries
+
+        with open(self.journal_file, "r") as file:
+            records = iter(file)
+            try:
+                header = _json.loads(next(records))
+            except (StopIteration, ValueError):
+                return entries
+            if header.get("base") != self._base_checksum:
+                # journal of a previous version of the YAML file, whose changes are already part of it
+                return entries
+            self._journal_valid = True
+
+            for line in records:
+                try:
+                    record = _json.loads(line)
+                except ValueError:
+                    # incomplete record of an interrupted save, further records cannot be appended after it
+                    self._compact_on_save = True
+                    break
+                if "del" in record:
+                    entries.pop(record["del"], None)
+                else:
+                    entries[record["set"]] = record["value"]
+
+        return entries
+
+    def save(self, entries: dict, changed: _t.Iterable[str] = None, removed: _t.Iterable[str] = ()):
+        if changed is None or self._compact_on_save or not self.exists() \
+                or file_stat(self.filename) != self._base_stat:
+            # first save, damaged journal or YAML file has been changed by someone else
+            self.compact(entries)
+            return
+
+        records = [dict(set=key, value=entries[key]) for key in changed if key in entries]
+        records.extend({"del": key} for key in removed)
+        if not records:
+            return
+
+        mode = "a" if self._journal_valid else "w"
+        with open(self.journal_file, mode) as file:
+            if mode == "w":
+                file.write(_json.dumps(dict(base=self._base_checksum)) + "\n")
+            for record in records:
+                file.write(_json.dumps(record) + "\n")
+            file.flush()
+            _os.fsync(file.fileno())
+            size = file.tell()
+        self._journal_valid = True
+
+        if size > max(self.min_compaction_size, self.compaction_ratio * self._base_stat["size"]):
+            self.compact(entries)
+
+    def compact(self, entries: dict):
+        """Write all entries to the YAML file and remove the journal."""
+        self._write_base(entries)
+        self._record_base()
+        # a crash at this point leaves a journal whose checksum does not match the new YAML file anymore
+        if _os.path.isfile(self.journal_file):
+            _os.remove(self.journal_file)
+        self._journal_valid = False
+        self._compact_on_save = False
+
+
+class JsonStorage(YamlStorage):
+    """Storage in a JSON file with an append-only journal of changes next to it, e.g. for the files that
+    `knowviz.index.RelationIndex` keeps next to its index file. See `YamlStorage`, of which only the format of the
+    compacted file differs."""
+
+    def _read_base(self) -> dict:
+        return read_json_file(self.filename) if self.exists() else dict()
+
+    def _write_base(self, entries: _t.Mapping):
+        write_json_file(self.filename, dict(entries))
+
+
+class JsonDocumentIndex:
+
+    def __init__(self, filename: str = ""):
+        """
+        Base class of data that is kept per document in a JSON file next to an index file (e.g.
+        `knowviz.terms.TermIndex`). The file is saved through a `JsonStorage`, so that saving only appends the
+        documents that have been set or removed since loading or saving to its journal.
+
+        Subclasses load their data from `_load_entries`, call `_set_changed` and `_set_removed` whenever the data of
+        a document changes, and return the keys and values as they are stored from `_stored_keys` and
+        `_stored_value`.
+
+        Parameters
+        ----------
+        filename
+            (Optional) path/to/file.json to load previous data from
+        """
+        self.filename = filename
+        self.storage = None
+        self._changed_keys = set()
+        self._removed_keys = set()
+
+    def _load_entries(self) -> dict:
+        if self.filename == "":
+            return dict()
+        self.storage = JsonStorage(self.filename)
+        return self.storage.load()
+
+    def _stored_keys(self) -> _t.List[str]:
+        raise NotImplementedError
+
+    def _stored_value(self, key: str):
+        raise NotImplementedError
+
+    def _stored_entries(self) -> _t.Mapping:
+        return _StoredEntries(self)
+
+    def _set_changed(self, key: str):
+        self._changed_keys.add(key)
+        self._removed_keys.discard(key)
+
+    def _set_removed(self, key: str):
+        self._removed_keys.add(key)
+        self._changed_keys.discard(key)
+
+    def save_to_file(self, filename: str = ""):
+        if filename != "":
+            self.filename = filename
+        entries = self._stored_entries()
+        if self.storage is None or _os.path.normpath(self.storage.filename) != _os.path.normpath(self.filename):
+            self.storage = JsonStorage(self.filename)
+            self.storage.save(entries)
+        else:
+            self.storage.save(entries, self._changed_keys, self._removed_keys)
+        self._changed_keys.clear()
+        self._removed_keys.clear()
+
+    def compact(self):
+        """Rewrite the file with the data of all documents and remove its journal."""
+        if self.storage is None:
+            raise ValueError("Index has not been saved to a file yet.")
+        self.storage.compact(self._stored_entries())
+        self._changed_keys.clear()
+        self._removed_keys.clear()
+
+
+class _StoredEntries(_Mapping):
+    """Read-only view of the data of a `JsonDocumentIndex` as it is stored, which is only converted for the
+    documents that are accessed."""
+
+    def __init__(self, index: JsonDocumentIndex):
+        self.index = index
+
+    def __getitem__(self, key: str):
+        return self.index._stored_value(key)
+
+    def __iter__(self) -> _t.Iterator[str]:
+        return iter(self.index._stored_keys())
+
+    def __len__(self) -> int:
+        return len(self.index._stored_keys())
+
+
+# updates rows in place, unlike INSERT OR REPLACE, which deletes and inserts them again at the end of the table
+_UPSERT = "INSERT INTO entries (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+
+
+class SqliteStorage(Storage, _MutableMapping):
+
+    def __init__(self, filename: str):
+        """
+        Storage in a local SQLite database with one row per entry, values are stored as JSON.
+
+        Apart from loading and saving a whole index, the storage can be used as a mapping itself, which only reads the
+        entries that are accessed (lazy loading), e.g. by tools that look up a few entries of a large index. Indices
+        (`knowviz.index.Index`) are dictionaries and always load all entries, only their saves are incremental. Use
+        `transaction` to batch several changes into one transaction.
+
+        Updated entries keep their position in the order of iteration.
+
+        Parameters
+        ----------
+        filename
+            path/to/file.sqlite, which will be created if it does not exist
+        """
+        super().__init__(filename)
+        self._connection = None
+        self._in_transaction = False
+
+    @property
+    def connection(self) -> "_sqlite3.Connection":
+        if self._connection is None:
+            # imported here, since most indices are stored in YAML files
+            import sqlite3 as _sqlite3
+            self._connection = _sqlite3.connect(self.filename, isolation_level=None)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        return dict(filename=self.filename)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @_contextlib.contextmanager
+    def transaction(self):
+        """Context in which all changes are committed at once, or not at all if an exception is raised."""
+        if self._in_transaction:
+            # nested transactions are part of the outer one
+            yield self
+            return
+
+        self.connection.execute("BEGIN")
+        self._in_transaction = True
+        try:
+            yield self
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        else:
+            self.connection.execute("COMMIT")
+        finally:
+            self._in_transaction = False
+
+    def __getitem__(self, key: str):
+        row = self.connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return _json.loads(row[0])
+
+    def __setitem__(self, key: str, value):
+        self.connection.execute(_UPSERT, (key, _json.dumps(value)))
+
+    def __delitem__(self, key: str):
+        if self.connection.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self.connection.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def __iter__(self) -> _t.Iterator[str]:
+        for row in self.connection.execute("SELECT key FROM entries ORDER BY rowid"):
+            yield row[0]
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def load(self) -> dict:
+        rows = self.connection.execute("SELECT key, value FROM entries ORDER BY rowid")
+        return {key: _json.loads(value) for key, value in rows}
+
+    def save(self, entries: dict, changed: _t.Iterable[str] = None, removed: _t.Iterable[str] = ()):
+        with self.transaction():
+            if changed is None:
+                self.connection.execute("DELETE FROM entries")
+                changed = entries
+            self.connection.executemany("DELETE FROM entries WHERE key = ?", ((key,) for key in removed))
+            self.connection.executemany(_UPSERT,
+                                        ((key, _json.dumps(entries[key])) for key in changed if key in entries))
+
+    def import_yaml(self, fname: str):
+        """Replace all entries with those of a YAML index file."""
+        self.save(read_yaml_file(fname))
+
+    def export_yaml(self, fname: str):
+        """Write all entries to a YAML index file, e.g. to keep a snapshot under version control."""
+        write_yaml_file(fname, self.load())
+
+
+def storage_for(filename: str) -> Storage:
+    """Storage backend for an index file, chosen by file extension."""
+    _, extension = _os.path.splitext(filename)
+    if extension.lower() in SQLITE_EXTENSIONS:
+        return SqliteStorage(filename)
+    if extension.lower() in JSON_EXTENSIONS:
+        return JsonStorage(filename)
+    return YamlStorage(filename)
@@ -0,0 +1,166 @@
+"""Index of the terms contained in documents, used to find documents affected by changes of keywords.
+"""
+import bisect as _bisect
+import re as _re
+import typing as _t
+
+from knowviz.storage import JsonDocumentIndex
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+# runs of word characters. All non-ASCII bytes count as word characters, so that UTF-8 encoded letters are kept
+_TERM = _re.compile(rb"[\w\x80-\xff]+")
+# key of the keywords of the last match in the stored entries, which is never the key of a document
+_KEYWORDS = ""
+
+
+def extract_terms(data: _t.Union[str, bytes]) -> _t.List[str]:
+    """Sorted list of distinct terms (runs of word characters) in a text, which may also be a memory-mapped document
+    (see `knowviz.io.map_document`)."""
+    if isinstance(data, str):
+        data = data.encode()
+    # only distinct terms are kept in memory, not all occurrences
+    terms = {match.group() for match in _TERM.finditer(data)}
+    return sorted(term.decode(errors="surrogateescape") for term in terms)
+
+
+def keyword_fragment(name: str) -> str:
+    """Longest term in a keyword. Every document that contains the keyword also contains a term that contains this
+    fragment. Empty if the keyword does not contain any word characters."""
+    return max(extract_terms(name), key=len, default="")
+
+
+class TermIndex(JsonDocumentIndex):
+
+    def __init__(self, filename: str = ""):
+        """
+        Posting lists of the terms contained in documents (term -> documents), together with the keywords the
+        documents have last been matched against.
+
+        Keywords are matched anywhere in a document, also within words. A document can therefore only contain a
+        keyword if one of its terms contains the longest term of the keyword (see `keyword_fragment`), which is used to
+        find the documents that need to be matched again when keywords are added, removed or changed.
+
+        The terms of each document and the keywords are stored as separate entries, so that saving only writes those
+        that changed (see `knowviz.storage.JsonDocumentIndex`).
+
+        Parameters
+        ----------
+        filename
+            (Optional) path/to/file.json to load previous data from
+        """
+        super().__init__(filename)
+        # document -> terms
+        self.documents = dict()
+        self._keywords = None
+        self._postings = None
+        self._vocabulary = None
+
+        entries = self._load_entries()
+        if isinstance(entries.get("documents"), dict) and "keywords" in entries:
+            # file written before entries were stored separately, which is replaced on the next save
+            entries = dict(entries["documents"], **{_KEYWORDS: entries["keywords"]})
+            self.storage = None
+        self._keywords = entries.pop(_KEYWORDS, None)
+        self.documents = {document: frozenset(terms) for document, terms in entries.items()}
+
+    @property
+    def keywords(self) -> _t.Optional[_t.Dict[str, str]]:
+        """Keyword name -> unique key, as used for the last match, or None if unknown."""
+        return self._keywords
+
+    @keywords.setter
+    def keywords(self, keywords: _t.Optional[_t.Dict[str, str]]):
+        self._keywords = keywords
+        self._set_changed(_KEYWORDS)
+
+    def _stored_keys(self) -> _t.List[str]:
+        keys = sorted(self.documents)
+        return keys if self._keywords is None else [_KEYWORDS] + keys
+
+    def _stored_value(self, key: str):
+        if key == _KEYWORDS:
+            if self._keywords is None:
+                raise KeyError(key)
+            return self._keywords
+        return sorted(self.documents[key])
+
+    @property
+    def postings(self) -> _t.Dict[str, _t.Set[str]]:
+        """Term -> set of documents that contain the term."""
+        if self._postings is None:
+            postings = dict()
+            for document, terms in self.documents.items():
+                for term in terms:
+                    postings.setdefault(term, set()).add(document)
+            self._postings = postings
+        return self._postings
+
+    def set_terms(self, document: str, terms: _t.Iterable[str]):
+        """Set the terms of a document."""
+        self.remove(document)
+        terms = frozenset(terms)
+        self.documents[document] = terms
+        self._set_changed(document)
+        if self._postings is not None:
+            for term in terms:
+                self._postings.setdefault(term, set()).add(document)
+        self._vocabulary = None
+
+    def remove(self, document: str):
+        """Remove a document from the index."""
+        terms = self.documents.pop(document, None)
+        if terms is None:
+            return
+        self._set_removed(document)
+        if self._postings is not None:
+            for term in terms:
+                documents = self._postings[term]
+                documents.discard(document)
+                if not documents:
+                    del self._postings[term]
+        self._vocabulary = None
+
+    def _terms_containing(self, fragment: str) -> _t.Set[str]:
+        # all terms are joined into one string, so that a fragment can be searched for in all of them at once
+        if self._vocabulary is None:
+            terms = sorted(self.postings)
+            starts = []
+            position = 0
+            for term in terms:
+                starts.append(position)
+                position += len(term) + 1
+            self._vocabulary = ("\n".join(terms), starts, terms)
+        text, starts, terms = self._vocabulary
+
+        found = set()
+        position = text.find(fragment)
+        while position != -1:
+            term = terms[_bisect.bisect_right(starts, position) - 1]
+            found.add(term)
+            position = text.find(fragment, position + 1)
+        return found
+
+    def documents_containing(self, names: _t.Iterable[str]) -> _t.Set[str]:
+        """Documents that may contain any of the keyword `names`."""
+        postings = self.postings
+        fragments = {keyword_fragment(name) for name in names}
+        if "" in fragments:
+            # keywords without word characters may be anywhere
+            return set(self.documents)
+
+        documents = set()
+        for fragment in fragments:
+            for term in self._terms_containing(fragment):
+                documents.update(postings[term])
+        return documents
+
+    def changed_keywords(self, keywords: _t.Dict[str, str]) -> _t.Set[str]:
+        """Names that have been added, removed or assigned to a different unique key since the last match. All names
+        are returned if no previous keywords are known."""
+        if self.keywords is None:
+            return set(keywords)
+        changed = {name for name, key in keywords.items() if self.keywords.get(name) != key}
+        changed.update(name for name in self.keywords if name not in keywords)
+        return changed
@@ -0,0 +1,314 @@
+"""Watch the documents of a database and keep indices up to date while they are edited.
+"""
+import ctypes as _ctypes
+import ctypes.util as _ctypes_util
+import logging as _logging
+import os as _os
+import select as _select
+import struct as _struct
+import sys as _sys
+import threading as _threading
+import time as _time
+import typing as _t
+
+from knowviz import ParserError as _ParserError
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+_logger = _logging.getLogger(__name__)
+
+# returned by event sources if changes have been lost and all documents need to be scanned
+RESCAN = None
+
+# inotify constants, see <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+_EVENT = _struct.Struct("iIII")
+
+
+class PollingSource:
+
+    def __init__(self, directories: _t.Iterable[str], interval: float = 1.0):
+        """Detects changed files by comparing modification time, size and inode of all files in `directories` (and
+        below) every `interval` seconds."""
+        self.directories = list(directories)
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = _time.monotonic() + interval
+
+    def _take_snapshot(self) -> _t.Dict[str, tuple]:
+        snapshot = dict()
+        for directory in self.directories:
+            for dirpath, _, filenames in _os.walk(directory):
+                for filename in filenames:
+                    path = _os.path.join(dirpath, filename)
+                    try:
+                        stat = _os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return snapshot
+
+    def read(self, timeout: float) -> _t.Optional[_t.Set[str]]:
+        """Wait up to `timeout` seconds for changes and return the paths of changed files."""
+        wait = self._next_poll - _time.monotonic()
+        if wait > timeout:
+            _time.sleep(timeout)
+            return set()
+        if wait > 0:
+            _time.sleep(wait)
+        self._next_poll = _time.monotonic() + self.interval
+
+        snapshot = self._take_snapshot()
+        previous, self._snapshot = self._snapshot, snapshot
+        changed = {path for path, stat in snapshot.items() if previous.get(path) != stat}
+        changed.update(path for path in previous if path not in snapshot)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifySource:
+
+    def __init__(self, directories: _t.Iterable[str]):
+        """Receives file system events for `directories` (and below) from the Linux kernel (inotify). Directories that
+        are created later are watched as well."""
+        libc_name = _ctypes_util.find_library("c")
+        if libc_name is None:
+            raise OSError("C library not found.")
+        self._libc = _ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(_os.O_NONBLOCK | _os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(_ctypes.get_errno(), "inotify_init1 failed.")
+
+        # watch descriptor -> directory
+        self._watches = dict()
+        for directory in directories:
+            self._add_tree(directory)
+
+    def _add_tree(self, directory: str) -> _t.Set[str]:
+        """Watch a directory and its subdirectories. Returns the files already in there."""
+        files = set()
+        for dirpath, _, filenames in _os.walk(directory):
+            wd = self._libc.inotify_add_watch(self._fd, _os.fsencode(dirpath), _WATCH_MASK)
+            if wd < 0:
+                raise OSError(_ctypes.get_errno(), f"Cannot watch directory {dirpath}.")
+            self._watches[wd] = dirpath
+            files.update(_os.path.join(dirpath, filename) for filename in filenames)
+        return files
+
+    def read(self, timeout: float) -> _t.Optional[_t.Set[str]]:
+        """Wait up to `timeout` seconds for events and return the paths of changed files, or `RESCAN` if events have
+        been lost."""
+        ready, _, _ = _select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                data = _os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+
+                if mask & _IN_Q_OVERFLOW:
+                    return RESCAN
+                if mask & _IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                if wd not in self._watches or not name:
+                    continue
+
+                path = _os.path.join(self._watches[wd], _os.fsdecode(name))
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        # files may have been created before the directory is watched
+                        changed.update(self._add_tree(path))
+                    elif mask & _IN_MOVED_FROM:
+                        return RESCAN
+                else:
+                    changed.add(path)
+
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            _os.close(self._fd)
+            self._fd = -1
+
+
+class Watcher:
+
+    def __init__(self, relation_index, flush_interval: float = 10.0, debounce: float = 0.05, polling: bool = None,
+                 poll_interval: float = 1.0, callback: _t.Callable = None):
+        """
+        Keep a `RelationIndex` and its `KeywordIndex` up to date while documents are edited.
+
+        File system events for the data directories of both indices are collected until no further event arrives for
+        `debounce` seconds, so that a burst of events (e.g. an editor writing a file in several steps) leads to one
+        update. Only the touched entries are updated in memory, the indices are saved to their files at most every
+        `flush_interval` seconds.
+
+        Use `start` and `stop` to watch in a background thread, or `run` to watch in the current thread. Hold `lock`
+        while reading from the indices in other threads.
+
+        Parameters
+        ----------
+        relation_index
+            index to keep up to date, together with its keyword index
+        flush_interval
+            (Optional) seconds between saving changed indices. Default: 10
+        debounce
+            (Optional) seconds without events after which collected events are processed. Default: 0.05
+        polling
+            (Optional) compare file stats periodically instead of receiving events from the operating system.
+            Default: only if inotify is not available
+        poll_interval
+            (Optional) seconds between two polls. Default: 1
+        callback
+            (Optional) function called with the set of changed paths (or `RESCAN`) after each update that changed an
+            index
+        """
+        self.relations = relation_index
+        self.keywords = relation_index.keywords
+        self.flush_interval = flush_interval
+        self.debounce = debounce
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.callback = callback
+
+        self.lock = _threading.RLock()
+        self._stop_event = _threading.Event()
+        self._thread = None
+        self._source = None
+        self._dirty = False
+
+    @property
+    def directories(self) -> _t.List[str]:
+        directories = []
+        for directory in (self.keywords.datadir, self.relations.datadir):
+            directory = _os.path.abspath(directory)
+            if directory not in directories:
+                directories.append(directory)
+        return directories
+
+    def _create_source(self):
+        if not self.polling and _sys.platform.startswith("linux"):
+            try:
+                return InotifySource(self.directories)
+            except OSError:
+                pass
+        return PollingSource(self.directories, self.poll_interval)
+
+    def start(self):
+        """Start watching in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        # create event source before returning, so that no change after `start` is missed
+        self._source = self._create_source()
+        self._thread = _threading.Thread(target=self.run, name="knowviz-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and save changed indices."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        """Watch until `stop` is called."""
+        if self._source is None:
+            self._source = self._create_source()
+        source = self._source
+        last_flush = _time.monotonic()
+
+        try:
+            while not self._stop_event.is_set():
+                paths = source.read(timeout=0.2)
+                if paths is RESCAN or paths:
+                    # collect events until there is a pause
+                    while paths is not RESCAN:
+                        more = source.read(timeout=self.debounce)
+                        if more is RESCAN:
+                            paths = RESCAN
+                        elif more:
+                            paths.update(more)
+                        else:
+                            break
+                    self.process(paths)
+
+                if self._dirty and _time.monotonic() - last_flush >= self.flush_interval:
+                    self.flush()
+                    last_flush = _time.monotonic()
+        finally:
+            self.flush()
+            source.close()
+            self._source = None
+
+    def _classify(self, paths: _t.Iterable[str], datadir: str, extension: str) -> _t.Tuple[list, list]:
+        datadir = _os.path.join(_os.path.abspath(datadir), "")
+        fnames, removed = [], []
+        for path in sorted(paths):
+            path = _os.path.abspath(path)
+            if not path.startswith(datadir) or not path.endswith(extension):
+                continue
+            if _os.path.isfile(path):
+                fnames.append(path)
+            else:
+                removed.append(self.relations.document_key(path))
+        return fnames, removed
+
+    def process(self, paths: _t.Optional[_t.Set[str]]) -> bool:
+        """Update indices for changed files (or all files for `RESCAN`). Returns whether an index has changed."""
+        with self.lock:
+            if paths is RESCAN:
+                keyword_files, removed_keywords = self.keywords.collect_documents(".yml")
+                relation_files, removed_relations = self.relations.collect_documents(self.relations.data_file_ext)
+            else:
+                keyword_files, removed_keywords = self._classify(paths, self.keywords.datadir, ".yml")
+                relation_files, removed_relations = self._classify(paths, self.relations.datadir,
+                                                                   self.relations.data_file_ext)
+
+            changed = self.keywords.update_documents(keyword_files, removed_keywords)
+            changed = self.relations.update_documents([], removed_relations) or changed
+            for fname in relation_files:
+                try:
+                    changed = self.relations.update_documents([fname]) or changed
+                except _ParserError as e:
+                    # documents are often incomplete while they are edited
+                    _logger.warning(f"Skipped '{fname}': {e}")
+
+            self._dirty = self._dirty or changed
+            # subscribers of the indices receive the changes of this update
+            self.keywords.publish_changes()
+            self.relations.publish_changes()
+
+        if changed and self.callback is not None:
+            self.callback(paths)
+        return changed
+
+    def flush(self):
+        """Save indices that have changed to their files."""
+        with self.lock:
+            if self._dirty:
+                self.keywords.save_to_file()
+                self.relations.save_to_file()
+                self._dirty = False
@@ -0,0 +1,156 @@
+"""Co-occurrence statistics and weighted edges between keywords, computed with sparse matrices.
+"""
+import typing as _t
+
+import numpy as _np
+import scipy.sparse as _sparse
+
+__author__ = "Daniel Rose"
+__status__ = "Development"
+
+WEIGHTINGS = ("cooccurrence", "pmi", "tfidf")
+
+
+class KeywordWeights:
+
+    def __init__(self, graph, counts: bool = True):
+        """
+        Weights of the connections between keywords, derived from the sparse relation x keyword matrix of a
+        `KeywordGraph`. All statistics are computed with sparse matrix products rather than loops over relations and
+        are cached until the relation index changes.
+
+        Available weightings of keyword pairs (see `edge_weights`):
+
+        - "cooccurrence": number of relations that reference both keywords
+        - "pmi": pointwise mutual information of both keywords being referenced by a relation
+        - "tfidf": cosine similarity of the TF-IDF vectors of the keywords (one component per relation)
+
+        Parameters
+        ----------
+        graph
+            `KeywordGraph` of a relation index
+        counts
+            (Optional) use the number of occurrences of a keyword in a relation as term frequency, where occurrences
+            are known to the relation index. Otherwise each reference counts once. Default: True
+        """
+        self.graph = graph
+        self.counts = counts
+        self._cache = dict()
+        self._cache_version = None
+
+    def _cached(self, name: str, compute: _t.Callable) -> _t.Any:
+        self.graph.update()
+        # the version of the graph also changes with the occurrence counts of relations
+        version = self.graph.version
+        if self._cache_version != version:
+            self._cache.clear()
+            self._cache_version = version
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    @property
+    def shape(self) -> _t.Tuple[int, int]:
+        return len(self.graph.relation_names), len(self.graph.keyword_names)
+
+    def incidence(self) -> _sparse.csr_matrix:
+        """Relation x keyword matrix of term frequencies (number of occurrences of a keyword in a relation)."""
+        return self._cached("incidence", self._incidence)
+
+    def _incidence(self) -> _sparse.csr_matrix:
+        indptr, indices = self.graph.incidence()
+        if self.counts:
+            data = self.graph.occurrence_counts().astype(float)
+        else:
+            data = _np.ones(len(indices))
+        return _sparse.csr_matrix((data, indices, indptr), shape=self.shape)
+
+    def binary_incidence(self) -> _sparse.csr_matrix:
+        """Relation x keyword matrix with 1 for each reference."""
+        def compute():
+            indptr, indices = self.graph.incidence()
+            return _sparse.csr_matrix((_np.ones(len(indices)), indices, indptr), shape=self.shape)
+        return self._cached("binary", compute)
+
+    def document_frequency(self) -> _np.ndarray:
+        """Number of relations that reference each keyword, by keyword id."""
+        return self._cached("df", lambda: _np.bincount(self.graph.incidence()[1], minlength=self.shape[1]))
+
+    def cooccurrence(self) -> _sparse.csr_matrix:
+        """Keyword x keyword matrix of the number of relations that reference both keywords. The diagonal holds the
+        document frequency of each keyword."""
+        def compute():
+            binary = self.binary_incidence()
+            return (binary.T @ binary).tocsr()
+        return self._cached("cooccurrence", compute)
+
+    def tfidf(self) -> _sparse.csr_matrix:
+        """Relation x keyword matrix of TF-IDF weights, i.e. term frequencies multiplied by log(N / df), where N is the
+        number of relations and df the document frequency of a keyword."""
+        def compute():
+            df = self.document_frequency()
+            idf = _np.zeros(len(df))
+            referenced = df > 0
+            idf[referenced] = _np.log(self.graph.relations / df[referenced])
+            return _sparse.csr_matrix(self.incidence().multiply(idf[_np.newaxis, :]))
+        return self._cached("tfidf", compute)
+
+    def similarity(self) -> _sparse.csr_matrix:
+        """Keyword x keyword matrix of cosine similarities of TF-IDF vectors, without diagonal."""
+        def compute():
+            weights = self.tfidf().tocsc()
+            norms = _np.sqrt(_np.asarray(weights.multiply(weights).sum(axis=0))).ravel()
+            norms[norms == 0] = 1
+            normalized = weights @ _sparse.diags(1 / norms)
+            return self._without_diagonal(normalized.T @ normalized)
+        return self._cached("similarity", compute)
+
+    def pmi(self, positive: bool = True) -> _sparse.csr_matrix:
+        """Keyword x keyword matrix of pointwise mutual information log(p(a, b) / (p(a) p(b))), where p is the fraction
+        of relations that reference a keyword or a pair of keywords. Only pairs that co-occur have an entry, and with
+        `positive` only pairs that co-occur more often than expected by chance."""
+        def compute():
+            pairs = self._without_diagonal(self.cooccurrence()).tocoo()
+            df = self.document_frequency().astype(float)
+            values = _np.log(pairs.data * self.graph.relations / (df[pairs.row] * df[pairs.col]))
+            keep = values > 0 if positive else _np.ones(len(values), dtype=bool)
+            return _sparse.csr_matrix((values[keep], (pairs.row[keep], pairs.col[keep])), shape=pairs.shape)
+        return self._cached(f"pmi{positive}", compute)
+
+    @staticmethod
+    def _without_diagonal(matrix: _sparse.spmatrix) -> _sparse.csr_matrix:
+        matrix = _sparse.csr_matrix(matrix, copy=True)
+        matrix.setdiag(0)
+        matrix.eliminate_zeros()
+        return matrix
+
+    def edge_weights(self, weighting: str = "pmi") -> _sparse.csr_matrix:
+        """Keyword x keyword matrix of edge weights (see `WEIGHTINGS`), without diagonal."""
+        if weighting == "cooccurrence":
+            return self._cached("edges", lambda: self._without_diagonal(self.cooccurrence()))
+        if weighting == "pmi":
+            return self.pmi()
+        if weighting == "tfidf":
+            return self.similarity()
+        raise ValueError(f"Unknown weighting '{weighting}'. Use one of {', '.join(WEIGHTINGS)}.")
+
+    def _top(self, weights: _sparse.csr_matrix, kid: int, k: int) -> _t.List[_t.Tuple[str, float]]:
+        start, end = weights.indptr[kid], weights.indptr[kid + 1]
+        kids, values = weights.indices[start:end], weights.data[start:end]
+        # highest weights first, ties in order of keyword ids
+        order = _np.lexsort((kids, -values))[:k]
+        return [(self.graph.keyword_names[kids[i]], float(values[i])) for i in order]
+
+    def related(self, keyword: str, k: int = 10, weighting: str = "pmi") -> _t.List[_t.Tuple[str, float]]:
+        """The `k` keywords with the highest edge weights to `keyword` (unique key or synonym), as (keyword, weight)."""
+        weights = self.edge_weights(weighting)
+        kid = self.graph.keyword_id(keyword)
+        if kid >= weights.shape[0]:
+            return []
+        return self._top(weights, kid, k)
+
+    def top_related(self, k: int = 10, weighting: str = "pmi") -> _t.Dict[str, _t.List[_t.Tuple[str, float]]]:
+        """The `k` most related keywords of each keyword that has related keywords."""
+        weights = self.edge_weights(weighting)
+        return {self.graph.keyword_names[kid]: self._top(weights, kid, k)
+                for kid in _np.flatnonzero(_np.diff(weights.indptr))}
@@ -6,6 +6,10 @@ INSTALL_REQUIREMENTS = ["ruamel.yaml",
                         "jupyter", 'pyparsing', 'ipywidgets', 'traitlets'
                         ]
 
+# optional dependencies, e.g. pip install knowviz[graph]
+EXTRAS_REQUIREMENTS = {"graph": ["numpy", "scipy"],
+                       }
+
 CLASSIFIERS = ["Programming Language :: Python :: 3",
                "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
                "Operating System :: OS Independent",
@@ -31,4 +35,6 @@ setup(name='knowviz',
       zip_safe=False,
       python_requires='>=3.6',
       install_requires=INSTALL_REQUIREMENTS,
+      extras_require=EXTRAS_REQUIREMENTS,
+      entry_points={"console_scripts": ["knowviz = knowviz.cli:main"]},
       classifiers=CLASSIFIERS)
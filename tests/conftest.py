@@ -0,0 +1,12 @@
+"""Fixtures shared by the test modules."""
+
+import pytest
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Copy of the test database in a temporary directory."""
+    import shutil
+
+    shutil.copytree("data", tmp_path / "data")
+    return tmp_path / "data"
@@ -0,0 +1,61 @@
+"""Test the cache module."""
+
+
+def test_reference_cache(tmp_path):
+    import os
+    from knowviz.cache import ReferenceCache
+
+    cache = ReferenceCache(str(tmp_path), max_size=10 ** 6)
+    assert cache.get("abc", "fp") is None
+    cache.put("abc", "fp", ["q1", "q_2"])
+    assert cache.get("abc", "fp") == ["q1", "q_2"]
+    assert cache.get("abc", "other") is None
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 2)
+
+    for i in range(10):
+        cache.put(str(i), "fp", ["q1"])
+        os.utime(cache.path(cache.key(str(i), "fp")), ns=(i, i))
+    # the first entry has been used most recently and survives
+    cache.get("abc", "fp")
+    assert cache.prune(max_size=stats["size"]) == 10
+    assert cache.get("abc", "fp") == ["q1", "q_2"]
+    assert cache.clear() == 1
+
+
+def test_rescan_with_cache(tmp_path):
+    """A second index (e.g. a fresh checkout) takes keyword references from the cache."""
+    import shutil
+    from knowviz.cache import ReferenceCache
+    from knowviz.index import KeywordIndex, RelationIndex
+
+    cache = ReferenceCache(str(tmp_path / "cache"))
+    indices = []
+    for checkout in ("a", "b"):
+        database = tmp_path / checkout
+        shutil.copytree("data", database)
+        quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+        models = RelationIndex(quantities, datadir=str(database / "models"), cache=cache)
+        models.rescan_documents()
+        indices.append(models)
+
+    assert cache.stats()["entries"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert indices[0]["m1"]["keywords"] == indices[1]["m1"]["keywords"] == ("q1", "q2")
+
+
+def test_pyparsing_fingerprint(tmp_path):
+    """The pyparsing backend stores references under the fingerprint of the matcher without building it."""
+    import shutil
+    from knowviz.cache import ReferenceCache
+    from knowviz.index import KeywordIndex, RelationIndex
+
+    shutil.copytree("data", tmp_path / "data")
+    quantities = KeywordIndex(str(tmp_path / "data" / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, datadir=str(tmp_path / "data" / "models"),
+                           cache=ReferenceCache(str(tmp_path / "cache")), backend="pyparsing")
+    models.rescan_documents()
+
+    assert models._matcher is None
+    assert models.fingerprint == models.matcher.fingerprint
@@ -0,0 +1,57 @@
+"""Test the command line interface."""
+import json
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def workdir(database, monkeypatch):
+    """Directory of the copy of the test database as working directory, with the cache of parsed index files in it."""
+    monkeypatch.setenv("KNOWVIZ_CACHE_DIR", str(database.parent / "cache"))
+    monkeypatch.chdir(database.parent)
+    return database
+
+
+def test_cli(workdir, capsys):
+    """Indices can be rescanned, queried and exported from the command line."""
+    from knowviz.cli import main
+
+    indices = ["data/metadata/quantities.yml", "data/metadata/models.yml"]
+    (workdir / "models" / "m2.tex").write_text("q1 and q3")
+    assert main(["rescan", *indices, "--extension", ".tex", "--dry-run", "--check"]) == 1
+    assert main(["rescan", *indices, "--extension", ".tex"]) == 0
+    assert main(["rescan", *indices, "--extension", ".tex", "--check", "--json"]) == 0
+    output = capsys.readouterr().out
+    reports = json.loads(output[output.index("[\n"):])
+    assert [report["name"] for report in reports] == ["quantities", "models"] and not any(r["changed"] for r in reports)
+
+    assert main(["query", *indices, "q_1"]) == 0
+    assert capsys.readouterr().out.split() == ["m1", "m2"]
+    assert main(["query", *indices, "q1", "q2", "--mode", "and"]) == 0
+    assert capsys.readouterr().out.split() == ["m1"]
+    assert main(["query", *indices, "unknown"]) == 2
+
+    assert main(["stats", *indices, "--json"]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["keywords"] == dict(name="quantities", unique_keys=3, synonyms=2)
+    assert stats["relations"][0]["relations"] == 2
+
+    assert main(["export", "data/metadata/models.yml", "models.sqlite"]) == 0
+    assert main(["export", "models.sqlite", "-"]) == 0
+    assert sorted(json.loads(capsys.readouterr().out)) == ["m1", "m2"]
+
+
+def test_lazy_imports(workdir):
+    """Rescans from the command line do not import the GUI or pyparsing."""
+    import subprocess
+
+    script = ("import sys; from knowviz.cli import main; main(sys.argv[1:]); "
+              "print(' '.join(sorted(name for name in sys.modules if name.split('.')[0] in "
+              "('pyparsing', 'ipywidgets', 'traitlets', 'tkinter', 'numpy', 'multiprocessing'))))")
+    import os
+    import knowviz
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(knowviz.__file__))))
+    result = subprocess.run([sys.executable, "-c", script, "rescan", "data/metadata/quantities.yml",
+                             "data/metadata/models.yml"], env=env, stdout=subprocess.PIPE, check=True)
+    assert result.stdout.decode().splitlines()[-1] == ""
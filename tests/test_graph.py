@@ -0,0 +1,147 @@
+"""Test the graph, weights and layout modules."""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def models():
+    from knowviz.index import KeywordIndex, RelationIndex
+
+    quantities = KeywordIndex()
+    for key in ("a", "b", "c", "d", "e", "f"):
+        quantities[key] = dict(checksum="")
+    quantities["alpha"] = "a"
+
+    models = RelationIndex(quantities)
+    models.update(m1=dict(keywords=("a", "b")), m2=dict(keywords=("b", "c")), m3=dict(keywords=("c", "d")),
+                  m4=dict(keywords=("e",)))
+    return models
+
+
+def test_graph_queries(models):
+    """Neighbourhoods, shortest paths and components of the keyword graph."""
+    from knowviz.graph import KeywordGraph
+
+    graph = KeywordGraph(models)
+    assert graph.edges == 7
+    assert graph.keywords_of("m2") == ["b", "c"]
+    assert graph.relations_of("alpha") == ["m1"]
+
+    assert graph.neighbourhood("a") == {"a": 0, "b": 1}
+    assert graph.neighbourhood("a", hops=3) == {"a": 0, "b": 1, "c": 2, "d": 3}
+    assert graph.shortest_path("alpha", "d") == ["a", "m1", "b", "m2", "c", "m3", "d"]
+    assert graph.shortest_path("a", "e") == []
+    assert graph.connected_components() == [{"a", "b", "c", "d"}, {"e"}, {"f"}]
+
+
+@pytest.mark.parametrize("compaction_ratio", (0.0, 10.0))
+def test_graph_update(models, compaction_ratio):
+    """Changes of the indices are applied incrementally, with or without rebuilding the arrays."""
+    from knowviz.graph import KeywordGraph
+
+    graph = KeywordGraph(models, compaction_ratio=compaction_ratio)
+    assert not graph.update()
+
+    models["m4"] = dict(keywords=("d", "e", "g"))
+    models["m5"] = dict(keywords=("f", "a"))
+    del models["m2"]
+    assert graph.update()
+    assert graph.edges == 9
+
+    assert graph.shortest_path("a", "e") == []
+    assert graph.neighbourhood("a", hops=2) == {"a": 0, "b": 1, "f": 1}
+    assert graph.shortest_path("c", "g") == ["c", "m3", "d", "m4", "g"]
+    assert graph.relations_of("a") == ["m1", "m5"]
+    assert graph.connected_components() == [{"c", "d", "e", "g"}, {"a", "b", "f"}]
+    # components are computed after rebuilding the arrays
+    assert graph.relations_of("a") == ["m1", "m5"]
+
+
+def test_graph_update_visits_changes(models):
+    """Updates only visit the entries that changed, and components include keywords added since the last update."""
+    from knowviz.graph import KeywordGraph
+
+    graph = KeywordGraph(models)
+    visited = []
+    get = models.get
+    models.get = lambda key, *args: visited.append(key) or get(key, *args)
+
+    version = models.version
+    models["m5"] = dict(keywords=("e", "f"))
+    del models["m1"]
+    models["m5"] = dict(keywords=("d", "e", "f"))
+    assert models.changed_since(version) == ["m5", "m1"]
+    assert graph.update() and visited == ["m5", "m1"]
+    assert graph.relations_of("f") == ["m5"] and graph.relations_of("a") == []
+
+    models.keywords["g"] = dict(checksum="")
+    assert graph.connected_components() == [{"b", "c", "d", "e", "f"}, {"a"}, {"g"}]
+
+    # changes that are no longer known are found by comparing all entries
+    assert models.changed_since(-1) is None
+    for _ in range(2 * len(models) + 1025):
+        models["m6"] = dict(keywords=("a",))
+    models["m6"] = dict(keywords=("a", "b"))
+    assert models.changed_since(version) is None
+    visited.clear()
+    assert graph.update() and sorted(visited) == ["m2", "m3", "m4", "m5", "m6"]
+    assert graph.relations_of("b") == ["m2", "m6"]
+
+
+def test_keyword_weights(models):
+    """Co-occurrence, PMI and TF-IDF weights, using occurrence counts where known."""
+    pytest.importorskip("scipy")
+    from knowviz.graph import KeywordGraph
+    from knowviz.weights import KeywordWeights
+
+    models["m2"] = dict(keywords=("a", "b", "c"))
+    models.occurrences.set_occurrences("m2", {"a": (1, 5, 9), "b": (3,), "c": (7,)})
+    weights = KeywordWeights(KeywordGraph(models))
+
+    assert weights.incidence()[1].toarray().tolist() == [[3, 1, 1, 0, 0, 0]]
+    assert weights.document_frequency().tolist() == [2, 2, 2, 1, 1, 0]
+    assert weights.cooccurrence()[0].toarray().tolist() == [[2, 2, 1, 0, 0, 0]]
+
+    assert weights.related("alpha", weighting="cooccurrence") == [("b", 2.0), ("c", 1.0)]
+    assert weights.related("c", k=1) == [("d", pytest.approx(0.693, abs=1e-3))]
+    assert [key for key, _ in weights.related("a", weighting="tfidf")] == ["b", "c"]
+    assert weights.related("f") == []
+    assert sorted(weights.top_related(k=1)) == ["a", "b", "c", "d"]
+
+    # occurrence counts are updated with the entry of a relation
+    models.occurrences.set_occurrences("m2", {"a": (1,), "b": (3, 4), "c": (7,)})
+    models["m2"] = dict(keywords=("a", "b", "c"))
+    assert weights.incidence()[1].toarray().tolist() == [[1, 2, 1, 0, 0, 0]]
+    assert KeywordWeights(KeywordGraph(models), counts=False).incidence()[1].toarray().tolist() == [[1, 1, 1, 0, 0, 0]]
+
+    # statistics follow changes of the index
+    models["m5"] = dict(keywords=("e", "f"))
+    assert weights.related("f", weighting="cooccurrence") == [("e", 1.0)]
+
+
+def test_force_layout(models, tmp_path):
+    """Connected keywords are placed close together, and a warm-started layout only moves known nodes slightly."""
+    import math
+    from knowviz.graph import KeywordGraph
+    from knowviz.layout import ForceLayout
+
+    def dist(a, b):
+        return math.hypot(a[0] - b[0], a[1] - b[1])
+
+    graph = KeywordGraph(models)
+    layout = ForceLayout(graph, filename=str(tmp_path / "models.layout.json"))
+    keywords, relations = layout.run()
+    assert sorted(keywords) == ["a", "b", "c", "d", "e", "f"]
+    assert sorted(relations) == ["m1", "m2", "m3", "m4"]
+    assert dist(keywords["a"], keywords["b"]) < dist(keywords["a"], keywords["d"])
+    layout.save_to_file()
+
+    models["m5"] = dict(keywords=("a", "d"))
+    layout = ForceLayout(graph, filename=str(tmp_path / "models.layout.json"))
+    assert layout.keywords.keys() == keywords.keys()
+    moved, relations = layout.run()
+    # steps of known nodes add up to about the ideal edge length
+    assert all(dist(keywords[key], moved[key]) < 1.1 for key in keywords)
+    assert dist(relations["m5"], moved["a"]) < dist(relations["m5"], moved["e"])
@@ -61,6 +61,35 @@ def test_get_unique_keys():
     assert uniques == expected
 
 
+def test_keyword_index_maps(database):
+    """Unique keys and synonyms are kept up to date on every change, entries are saved as plain dictionaries."""
+    from knowviz.index import KeywordIndex, KeywordEntry
+    from knowviz.io import read_yaml_file
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    assert quantities.synonyms() == dict(q1=["q_1"], q2=["q_2"], q3=[])
+    assert isinstance(quantities["q1"], KeywordEntry) and quantities["q1"]["file"] == dict(quantities["q1"])["file"]
+    assert quantities["q_1"] is next(key for key in quantities if key == "q1")
+
+    quantities["q_3"] = "q3"
+    quantities["q_1"] = "q2"
+    quantities["q4"] = dict(checksum="abc", file="q4.yml")
+    del quantities["q_2"]
+    assert quantities.synonyms() == dict(q1=[], q2=["q_1"], q3=["q_3"], q4=[])
+    assert quantities.is_unique("q4") and not quantities.is_unique("q_3")
+    assert quantities["q4"] == dict(checksum="abc", file="q4.yml")
+
+    assert quantities.remove_document("q3") and not quantities.remove_document("q_1")
+    assert "q_3" not in quantities and list(quantities.unique_keys()) == ["q1", "q2", "q4"]
+    quantities.pop("q_1")
+    assert quantities.synonyms_of("q2") == []
+
+    quantities.save_to_file()
+    quantities.compact()
+    assert read_yaml_file(str(database / "metadata" / "quantities.yml"))["q4"] == dict(checksum="abc", file="q4.yml")
+    assert KeywordIndex(str(database / "metadata" / "quantities.yml")).synonyms() == quantities.synonyms()
+
+
 def test_parse_keyword_reference():
     from knowviz.index import RelationIndex, KeywordIndex
 
@@ -97,3 +126,447 @@ def test_md5_checksum():
     # verify that checksum is identical.
     # if this fails, run the update_data.py script to update the models index.
     assert checksum == models["m1"]["checksum"]
+
+
+def test_parallel_rescan(database):
+    """A parallel rescan writes the same index file as a serial rescan."""
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    for i in range(8):
+        (database / "models" / f"m{i + 2}.tex").write_text(f"model {i} uses q_{i % 3 + 1} and q3")
+
+    contents = []
+    for workers in (1, 3):
+        quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+        models = RelationIndex(quantities, datadir=str(database / "models"))
+        models.filename = str(database / "metadata" / f"models{workers}.yml")
+        assert models.rescan_documents(overwrite_file=True, workers=workers)
+        contents.append((database / "metadata" / f"models{workers}.yml").read_text())
+
+    assert contents[0] == contents[1]
+    assert "m9:" in contents[0]
+
+
+def test_stat_fast_path(database, monkeypatch):
+    """Files with unchanged stat are not hashed again, unless the rescan is paranoid."""
+    import os
+    import knowviz.index
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    # backdate files so that their stat is trusted
+    for dirpath, _, filenames in os.walk(database):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), ns=(10 ** 18, 10 ** 18))
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"), hash_algorithm="blake2b")
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"), hash_algorithm="blake2b")
+    assert models.rescan_documents()
+    assert models["m1"]["mtime_ns"] == 10 ** 18
+    assert len(models["m1"]["checksum"]) == 128
+
+    hashed = []
+    checksum = knowviz.index._checksum
+    monkeypatch.setattr(knowviz.index, "_checksum", lambda fname, *args: hashed.append(fname) or checksum(fname, *args))
+
+    assert not models.rescan_documents()
+    assert hashed == []
+
+    assert not models.rescan_documents(paranoid=True)
+    assert len(hashed) == 4
+
+
+def test_rescan_report(database, caplog):
+    """Rescans return a report with timings and counters, which is passed to hooks and logged."""
+    import logging
+    import os
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    for dirpath, _, filenames in os.walk(database):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), ns=(10 ** 18, 10 ** 18))
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    reports = []
+    models.hooks.append(reports.append)
+
+    with caplog.at_level(logging.DEBUG, logger="knowviz.index"):
+        report = models.rescan_documents(overwrite_file=True)
+    assert report and report.saved and reports == [report]
+    assert report.counters["files_seen"] == 1 and report.counters["files_parsed"] == 1
+    assert report.counters["bytes_read"] == 2 * os.path.getsize(database / "models" / "m1.tex")
+    assert report.timings["match"] > 0 and report.duration >= report.timings["match"]
+    assert report.subreports[0].counters["files_hashed"] == 3
+    assert "Updated 'models' index" in caplog.text and "'models' rescanned in" in caplog.text
+
+    report = models.rescan_documents()
+    assert not report
+    assert report.counters["files_skipped"] == 1 and report.counters["files_hashed"] == 0
+    assert report.as_dict()["subreports"][0]["counters"]["files_skipped"] == 3
+    assert len(reports) == 2
+
+
+def test_rescan_progress(database):
+    """Progress callbacks see the processed and total number of files and can cancel a rescan."""
+    from knowviz.index import RelationIndex, KeywordIndex
+    from knowviz.report import RescanCancelled
+
+    for i in range(4):
+        (database / "models" / f"m{i + 2}.tex").write_text(f"model {i} uses q_{i % 2 + 1} and q3")
+
+    def cancel(report):
+        if report.name == "models" and report.done == 2:
+            raise RescanCancelled()
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    with pytest.raises(RescanCancelled):
+        models.rescan_documents(overwrite_file=True, progress=cancel)
+    assert "m5" not in RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+
+    progress = []
+    report = models.rescan_documents(progress=lambda report: progress.append((report.name, report.done, report.total)))
+    assert report.done == report.total and report.eta == 0
+    assert progress[-1][0] == "models" and progress[-1][1] == progress[-1][2] > 0
+    assert [done for name, done, _ in progress if name == "models"] == list(range(progress[-1][1] + 1))
+    assert "m5" in models
+
+
+def test_change_set(database):
+    """Rescans publish added, modified, removed and renamed entries, and prune entries of removed documents."""
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    (database / "models" / "m2.tex").write_text("q1 and q3")
+    (database / "models" / "m3.tex").write_text("only q2")
+    models.rescan_documents()
+    published = []
+    models.subscribers.append(published.append)
+    quantities.subscribers.append(published.append)
+
+    (database / "models" / "m2.tex").write_text("q1 and q2")
+    (database / "models" / "m3.tex").rename(database / "models" / "m4.tex")
+    (database / "models" / "m1.tex").unlink()
+    (database / "quantities" / "category" / "q3.yml").write_text("synonyms: [q_3]\n")
+    (database / "quantities" / "q1.yml").write_text("synonyms: []\n")
+    report = models.rescan_documents()
+
+    keyword_changes, relation_changes = published
+    assert report.changes is relation_changes and report.subreports[0].changes is keyword_changes
+    assert sorted((change.action, change.key) for change in keyword_changes) == [
+        ("added", "q_3"), ("modified", "q1"), ("modified", "q3"), ("removed", "q_1")]
+    assert "q_1" not in quantities and quantities.synonyms_of("q1") == []
+    assert keyword_changes.filter(kind="synonym")[0].new == "q3"
+
+    assert {(change.action, change.key, change.old_key) for change in relation_changes} == {
+        ("removed", "m1", None), ("modified", "m2", None), ("renamed", "m4", "m3")}
+    modified, = relation_changes.filter("modified")
+    assert modified.old["keywords"] == ("q1", "q3") and modified.new["keywords"] == ("q1", "q2")
+    assert "m1" not in models and "m3" not in models
+    assert relation_changes.keys() == {"m1", "m2", "m3", "m4"}
+
+    assert not models.rescan_documents().changes
+    assert len(published) == 2
+
+
+def test_sharded_index(database):
+    """Shards of the top-level subdirectories are merged into one view, and collisions between shards are detected."""
+    from knowviz.shards import ShardedKeywordIndex, ShardedRelationIndex, ShardCollisionError, discover_shards
+
+    (database / "models" / "team").mkdir()
+    (database / "models" / "team" / "m2.tex").write_text("q1 and q3")
+    (database / "quantities" / "q1.yml").write_text("synonyms: [q_1]\n")
+    assert discover_shards(str(database / "quantities")) == ["_root", "category"]
+
+    quantities = ShardedKeywordIndex(str(database / "shards" / "quantities"), str(database / "quantities"))
+    models = ShardedRelationIndex(quantities, str(database / "shards" / "models"), str(database / "models"),
+                                  data_file_ext=".tex")
+    (database / "shards" / "quantities").mkdir(parents=True)
+    (database / "shards" / "models").mkdir()
+    report = models.rescan_documents(overwrite_file=True, workers=2)
+    assert report and [subreport.name for subreport in report.subreports] == ["quantities", "_root", "team"]
+    assert (database / "shards" / "quantities" / "category.yml").exists()
+
+    assert sorted(quantities.unique_keys()) == ["q1", "q2", "q3"]
+    assert quantities.resolve("q_1") == "q1" and quantities.shard_of("q3") == "category"
+    assert quantities.synonyms() == {"q1": ["q_1"], "q2": [], "q3": []}
+    assert models.find_relations("q_1") == ["m1", "m2"] and models.find_relations("q3") == ["m2"]
+
+    # shards rescanned by other processes are loaded again, with the hooks and subscribers of the previous objects
+    hooked, published, forwarded = [], [], []
+    team = models.shards["team"]
+    team.hooks.append(hooked.append)
+    team.subscribers.append(published.append)
+    models.subscribers.append(forwarded.append)
+    (database / "models" / "team" / "m2.tex").write_text("q1, q2 and q3")
+    models.rescan_documents(overwrite_file=True, workers=2)
+    assert models.shards["team"] is not team and models.find_relations("q2") == ["m1", "m2"]
+    assert [report.name for report in hooked] == ["team"]
+    assert [changes.keys() for changes in published] == [{"m2"}] and forwarded == published
+    assert models.shard_of("m2") == "team"
+    (database / "models" / "team" / "m2.tex").write_text("q1 and Q3")
+    models.rescan_documents()
+    assert models.suggest_synonyms() == [("Q3", "q3", 1.0, ["m2"]), ("q_2", "q2", 1.0, ["m1"])]
+
+    # the same synonym of the same key is no collision, of another key it is
+    (database / "quantities" / "category" / "q3.yml").write_text("synonyms: [q_1]\n")
+    with pytest.raises(ShardCollisionError):
+        models.rescan_documents()
+    assert quantities.collisions() == {"q_1": ["_root", "category"]}
+    (database / "quantities" / "category" / "q3.yml").unlink()
+    assert models.rescan_documents(overwrite_file=True).subreports[0].changed
+    assert quantities.collisions() == {} and "q3" not in quantities and models.find_relations("q_1") == ["m1", "m2"]
+
+
+def test_git_rescan(database, monkeypatch):
+    """With git, only documents that changed since the last rescan are scanned."""
+    import subprocess
+    import knowviz.index
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    def git(*args):
+        subprocess.run(("git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args),
+                       cwd=str(database), check=True, stdout=subprocess.PIPE)
+
+    (database / "models" / "m2.tex").write_text("q3 only")
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-q", "-m", "initial")
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    models.rescan_documents(overwrite_file=True, git=True)
+    assert models.state["commit"] == quantities.state["commit"] != ""
+    # the state of the keyword index is saved with the relation index
+    assert KeywordIndex(str(database / "metadata" / "quantities.yml")).state == quantities.state
+    git("add", ".")
+    git("commit", "-q", "-m", "index")
+
+    (database / "models" / "m3.tex").write_text("q_1 only")
+    git("rm", "-q", "models/m2.tex")
+    git("add", ".")
+    git("commit", "-q", "-m", "change models")
+
+    hashed = []
+    checksum = knowviz.index._checksum
+    monkeypatch.setattr(knowviz.index, "_checksum", lambda fname, *args: hashed.append(fname) or checksum(fname, *args))
+
+    assert models.rescan_documents(git=True)
+    assert [fname.split("models")[-1][1:] for fname in hashed] == ["m3.tex"]
+    assert "m2" not in models and models["m3"]["keywords"] == ("q1",)
+
+    # uncommitted changes force a full scan
+    (database / "models" / "m4.tex").write_text("q2")
+    models.rescan_documents(git=True)
+    assert "commit" not in models.state
+    assert models["m4"]["keywords"] == ("q2",)
+
+
+def test_git_rescan_after_dirty_tree(database):
+    """A rescan of a dirty tree clears the recorded commit in the state file, so that a later git rescan at the same
+    commit scans all documents again, e.g. after the uncommitted changes have been reverted."""
+    import subprocess
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    def git(*args):
+        subprocess.run(("git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args),
+                       cwd=str(database), check=True, stdout=subprocess.PIPE)
+
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-q", "-m", "initial")
+
+    def load():
+        quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+        return RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+
+    models = load()
+    models.rescan_documents(overwrite_file=True, git=True)
+    assert models["m1"]["keywords"] == ("q1", "q2")
+
+    (database / "models" / "m1.tex").write_text("q3 only")
+    models = load()
+    models.rescan_documents(overwrite_file=True, git=True)
+    assert models["m1"]["keywords"] == ("q3",)
+
+    git("checkout", "--", "models/m1.tex")
+    models = load()
+    assert "commit" not in models.state
+    models.rescan_documents(overwrite_file=True, git=True)
+    assert models["m1"]["keywords"] == ("q1", "q2")
+
+
+def test_keyword_dependencies(database, monkeypatch):
+    """After a new synonym is added, only models that may contain it are matched again."""
+    import knowviz.index
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    (database / "models" / "m2.tex").write_text("q1 depends on quantity_3")
+    (database / "models" / "m3.tex").write_text("nothing but q1")
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    models.rescan_documents(overwrite_file=True)
+    assert models["m2"]["keywords"] == ("q1",)
+
+    # reload to check that terms are restored from file
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    assert models.terms.keywords["q_1"] == "q1"
+    assert "quantity_3" in models.terms.documents["m2"]
+
+    (database / "quantities" / "category" / "q3.yml").write_text("synonyms: [tity_3]\n")
+    analysed = []
+    analyse = models.analyse_document
+    monkeypatch.setattr(models, "analyse_document", lambda fname: analysed.append(fname) or analyse(fname))
+
+    assert models.rescan_documents()
+    assert [fname.split("models")[-1][1:] for fname in analysed] == ["m2.tex"]
+    assert models["m2"]["keywords"] == ("q1", "q3")
+    assert "tity_3" in models.terms.keywords
+
+
+@pytest.mark.parametrize("backend", ("matcher", "pyparsing"))
+def test_occurrence_queries(database, backend):
+    """Relations can be looked up by keyword, including positions of occurrences."""
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    (database / "models" / "m2.tex").write_text("Größe q3 and q_1, q1")
+    (database / "models" / "m3.tex").write_text("q3\tq2")
+    # not valid UTF-8
+    (database / "models" / "m4.tex").write_bytes(b"\xff\xfe q1 \xe4 q1")
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"), backend=backend)
+    models.rescan_documents(overwrite_file=True)
+
+    assert models.find_relations("q1", "q3") == ["m2"]
+    assert models.find_relations("q_2", "q3", mode="or") == ["m1", "m2", "m3"]
+    assert models.occurrences.occurrences("q1", "m2") == (15, 20)
+    assert models.occurrences.occurrences("q1", "m4") == (3, 8)
+    assert models.occurrences.count("q3") == 2
+    assert models.occurrences.counts("m1") == {"q1": 2, "q2": 2}
+
+    # queries stay in sync and are restored from file
+    (database / "models" / "m2.tex").write_text("only q1")
+    models.rescan_documents(overwrite_file=True)
+    reloaded = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    assert reloaded.find_relations("q3") == ["m3"]
+
+
+def test_keyword_info_cache(database, monkeypatch):
+    """Keyword info is parsed once and read again only after the file has changed."""
+    import os
+    import knowviz.io
+    from knowviz.index import KeywordIndex
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    info = quantities.keyword_info("q3")
+    assert info["categories"] == ["quantities", "category"]
+    info["categories"].clear()
+
+    parsed = []
+    read_yaml_file = knowviz.io.read_yaml_file
+    monkeypatch.setattr(knowviz.io, "read_yaml_file", lambda *args: parsed.append(args) or read_yaml_file(*args))
+
+    assert quantities.keyword_info("q3")["categories"] == ["quantities", "category"]
+    assert parsed == []
+
+    fname = database / "quantities" / "category" / "q3.yml"
+    fname.write_text("synonyms: [q_3]\n")
+    os.utime(fname, ns=(1, 1))
+    assert quantities.keyword_info("q3") == dict(synonyms=["q_3"])
+    assert len(parsed) == 1
+
+
+def test_citation_index(database):
+    """Citations are indexed per document and can be looked up by reference, and only changed documents are
+    scanned again."""
+    from knowviz.index import CitationIndex
+
+    (database / "models" / "m2.tex").write_text("\\cite{rose2019, smith.2000} and \\cite{rose2019}")
+    (database / "models" / "m3.tex").write_text("\\cite{ smith.2000 }")
+
+    citations = CitationIndex(datadir=str(database / "models"))
+    citations.filename = str(database / "metadata" / "citations.yml")
+    assert citations.rescan_documents(overwrite_file=True)
+    assert citations.citations("m2") == ["rose2019", "smith.2000"]
+    assert citations.citations("m1") == []
+    assert citations.citing("smith.2000") == ["m2", "m3"]
+    assert citations.citing("rose2019", "smith.2000") == ["m2"]
+    assert citations.citing("rose2019", "other", mode="or") == ["m2"]
+
+    (database / "models" / "m3.tex").write_text("\\cite{other}")
+    reloaded = CitationIndex(str(database / "metadata" / "citations.yml"), datadir=str(database / "models"))
+    assert reloaded.citing("smith.2000") == ["m2", "m3"]
+    assert reloaded.rescan_documents(overwrite_file=True)
+    (database / "models" / "m2.tex").unlink()
+    assert reloaded.update_documents([], removed=["m2"])
+    assert reloaded.citing("smith.2000") == []
+    assert reloaded.citing("other") == ["m3"]
+    assert not reloaded.rescan_documents()
+
+
+def test_synthetic_database(tmp_path):
+    """Generated databases are reproducible and every model references a keyword."""
+    from knowviz.corpus import generate_database
+    from knowviz.index import KeywordIndex, RelationIndex
+
+    summary = generate_database(str(tmp_path / "a"), keywords=20, models=10, words=100, tables=0.5)
+    assert summary == generate_database(str(tmp_path / "b"), keywords=20, models=10, words=100, tables=0.5)
+    assert (tmp_path / "a" / "models" / "m3.tex").read_text() == (tmp_path / "b" / "models" / "m3.tex").read_text()
+
+    quantities = KeywordIndex(datadir=str(tmp_path / "a" / "quantities"))
+    quantities.filename = str(tmp_path / "a" / "metadata" / "quantities.yml")
+    models = RelationIndex(quantities, datadir=str(tmp_path / "a" / "models"), data_file_ext=".tex")
+    models.filename = str(tmp_path / "a" / "metadata" / "models.yml")
+    quantities.rescan_documents(overwrite_file=True)
+    models.rescan_documents(overwrite_file=True)
+
+    assert len(list(quantities.unique_keys())) == summary["keywords"]
+    assert len(models) == summary["models"]
+    assert all(models[name]["keywords"] for name in models)
+
+
+def test_near_misses(database):
+    """Mentions similar to keywords are found during a rescan and ranked as suggested synonyms."""
+    from knowviz.index import RelationIndex, KeywordIndex
+    from knowviz.nearmiss import NgramIndex, extract_mentions
+
+    assert extract_mentions("uses q_{1}, c^{2} and heat-capacity, not q1") == ["c^{2}", "heat-capacity", "q_{1}"]
+    ngrams = NgramIndex({"q1": "q1", "q_1": "q1", "temperature": "temperature", "heat_capacity": "heat_capacity"})
+    assert ngrams.search("Q1").key == "q1" and ngrams.search("Q1").score == 1.0
+    assert ngrams.search("q_1") is None and ngrams.search("q2") is None and ngrams.search("1") is None
+    assert ngrams.search("temprature")[1:] == ("temperature", "temperature", 1 - 1 / 11)
+    assert ngrams.search("heat-capacity").name == "heat_capacity" and ngrams.search("pressure") is None
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    (database / "models" / "m2.tex").write_text("q1: Q1 is q_{1}, see also Q1 and Q_2")
+    (database / "models" / "m3.tex").write_text("Q1 and q2")
+    report = models.rescan_documents(overwrite_file=True)
+    assert report.counters["near_misses"] == 4
+    assert models.suggest_synonyms() == [("Q1", "q1", 1.0, ["m2", "m3"]), ("Q_2", "q2", 1.0, ["m2"]),
+                                         ("q_{1}", "q1", 1.0, ["m2"])]
+    assert models.suggest_synonyms(k=1, keys=["q2"]) == [("Q_2", "q2", 1.0, ["m2"])]
+    assert "m1" not in models.near_misses
+
+    (database / "models" / "m3.tex").unlink()
+    models.rescan_documents(overwrite_file=True)
+    assert RelationIndex(quantities, str(database / "metadata" / "models.yml")).suggest_synonyms(k=1) == [
+        ("Q1", "q1", 1.0, ["m2"])]
+
+    # near-misses of removed keywords are checked again, although the documents do not contain the keyword itself
+    (database / "quantities" / "temperature.yml").write_text("synonyms: []\n")
+    (database / "models" / "m4.tex").write_text("q1 and temprature")
+    models.rescan_documents(overwrite_file=True)
+    assert ("temprature", "temperature", 1 - 1 / 11, ["m4"]) in models.suggest_synonyms()
+    (database / "quantities" / "temperature.yml").unlink()
+    models.rescan_documents(overwrite_file=True)
+    assert "temperature" not in quantities and "m4" not in models.near_misses
+    assert all(key != "temperature" for _, key, _, _ in models.suggest_synonyms())
+
+    # suggestions are checked against the current keywords, also before the next rescan
+    quantities.remove_document("q2")
+    assert models.suggest_synonyms() == [("Q1", "q1", 1.0, ["m2"]), ("q_{1}", "q1", 1.0, ["m2"])]
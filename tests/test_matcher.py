@@ -0,0 +1,73 @@
+"""Test the matcher module."""
+
+import pytest
+
+
+@pytest.mark.parametrize(("text", "keywords"),
+                         (("abc kij lasd def ölkl abc", ("abc", "def")),
+                          ("q_1 q1 q_12 q12", ("q1", "q_1", "q_12", "q")),
+                          ("abcd abc ab a", ("a", "ab", "abcd")),
+                          ("Größe und Masse, größer", ("Größe", "Masse", "ö")),
+                          ))
+def test_matcher_equals_grammar(text, keywords):
+    """Matcher and pyparsing grammar find the same keywords (longest match wins)."""
+    from knowviz.index import RelationIndex
+    from knowviz.matcher import KeywordMatcher
+
+    expected = list(RelationIndex.create_grammar(keywords).parseString(text))
+
+    assert KeywordMatcher(keywords).findall(text) == expected
+
+
+def test_matcher_offsets():
+    from knowviz.matcher import KeywordMatcher
+
+    matcher = KeywordMatcher(("ab", "abc", "c"))
+    assert list(matcher.finditer("xabcab c")) == [(1, "abc"), (4, "ab"), (7, "c")]
+    assert KeywordMatcher(()).findall("abc") == []
+
+
+def test_matcher_backends():
+    from knowviz.index import RelationIndex, KeywordIndex
+
+    quantities = KeywordIndex("data/metadata/quantities.yml")
+    index = RelationIndex(quantities, data_file_ext=".tex")
+
+    path = "data/models/m1.tex"
+    assert index.find_keyword_references(path) == index.find_keyword_references(path, backend="pyparsing")
+
+    # matcher is only rebuilt after changes to the keyword index
+    matcher = index.matcher
+    assert index.matcher is matcher
+    quantities["q_3"] = "q3"
+    assert index.matcher is not matcher
+    assert "q_3" in index.matcher.keywords
+
+
+@pytest.mark.parametrize("chunk_size", (0, 1, 3, 7, 64))
+def test_scan_document(tmp_path, chunk_size):
+    """Scanning in chunks finds the same matches as scanning the memory-mapped document, also across chunk
+    boundaries."""
+    from knowviz.io import scan_document
+    from knowviz.matcher import KeywordMatcher
+
+    path = tmp_path / "model.tex"
+    path.write_bytes("q_1 Größe q_12 and q1q_1 Größer ab".encode() * 3)
+    matcher = KeywordMatcher(("q1", "q_1", "q_12", "Größe", "ab"))
+
+    expected = list(matcher.finditer(path.read_bytes()))
+    results = [(offset, match.group().decode())
+               for offset, match in scan_document(str(path), matcher.pattern, chunk_size, matcher.max_length)]
+    assert results == expected
+
+    (tmp_path / "empty.tex").write_bytes(b"")
+    assert list(scan_document(str(tmp_path / "empty.tex"), matcher.pattern, chunk_size, matcher.max_length)) == []
+
+
+def test_find_citations(tmp_path):
+    from knowviz.citation import find_citations, scan_citations
+
+    path = tmp_path / "model.md"
+    path.write_text("See \\cite{rose2019} and \\cite{Müller} or \\cite{a.b-c_d}.\n")
+    assert find_citations(str(path)) == ["rose2019", "a.b-c_d"]
+    assert list(scan_citations(str(path), chunk_size=5)) == [(4, "rose2019"), (42, "a.b-c_d")]
@@ -0,0 +1,19 @@
+"""Test the prefix module."""
+
+
+def test_prefix_index():
+    """Names and synonyms are found by the prefix of the name or of one of its words, each unique key only once."""
+    from knowviz.prefix import PrefixIndex
+
+    index = PrefixIndex(dict(temperature="temperature", T="temperature", surface_temperature="surface_temperature",
+                             Tension="tension", heat_capacity="heat_capacity", c_p="heat_capacity"))
+
+    assert index.search("t") == [("T", "temperature"), ("Tension", "tension"),
+                                 ("surface_temperature", "surface_temperature")]
+    assert [key for _, key in index.search("te")] == ["temperature", "tension", "surface_temperature"]
+    assert index.search("TEMP", k=1) == [("temperature", "temperature")]
+    assert index.search("temp", k=1, offset=1) == [("surface_temperature", "surface_temperature")]
+    assert index.search("cap") == [("heat_capacity", "heat_capacity")]
+    assert index.search("c_") == [("c_p", "heat_capacity")]
+    assert index.search("x") == []
+    assert len(index.search("", k=100)) == 4
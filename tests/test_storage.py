@@ -0,0 +1,155 @@
+"""Test the storage module."""
+
+import pytest
+
+
+def test_sqlite_index(tmp_path):
+    """An index can be converted to SQLite and back, and keeps its mapping API."""
+    from knowviz.index import KeywordIndex
+    from knowviz.io import read_yaml_file
+
+    quantities = KeywordIndex("data/metadata/quantities.yml")
+    quantities.save_to_file(str(tmp_path / "quantities.sqlite"))
+
+    loaded = KeywordIndex(str(tmp_path / "quantities.sqlite"))
+    assert loaded == quantities
+    assert tuple(loaded.unique_keys()) == ("q1", "q2", "q3")
+
+    # only changed entries are written
+    loaded["q_3"] = "q3"
+    del loaded["q_2"]
+    loaded.save_to_file()
+    assert (loaded._changed_keys, loaded._removed_keys) == (set(), set())
+
+    loaded.save_to_file(str(tmp_path / "quantities.yml"))
+    snapshot = read_yaml_file(str(tmp_path / "quantities.yml"))
+    assert snapshot["q_3"] == "q3" and "q_2" not in snapshot
+    assert KeywordIndex(str(tmp_path / "quantities.sqlite")) == snapshot
+
+
+def test_sqlite_storage(tmp_path):
+    from knowviz.storage import SqliteStorage
+
+    storage = SqliteStorage(str(tmp_path / "index.db"))
+    storage.import_yaml("data/metadata/models.yml")
+    assert storage["m1"]["keywords"] == ["q1", "q2"]
+    assert "m2" not in storage and len(storage) == 1
+
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage["m2"] = dict(keywords=["q3"])
+            raise RuntimeError
+    assert "m2" not in storage
+
+    with storage.transaction():
+        storage["m2"] = dict(keywords=["q3"])
+        del storage["m1"]
+    assert list(storage) == ["m2"]
+
+    # updated entries keep their position
+    storage.save(dict(m2=dict(keywords=["q3"]), m3=dict(keywords=[]), m4=dict(keywords=[])))
+    storage["m2"] = dict(keywords=["q1"])
+    storage.save(dict(m3=dict(keywords=["q2"])), changed=["m3"])
+    assert list(storage) == ["m2", "m3", "m4"] and storage["m3"]["keywords"] == ["q2"]
+    del storage["m3"], storage["m4"]
+    storage["m2"] = dict(keywords=["q3"])
+
+    storage.export_yaml(str(tmp_path / "index.yml"))
+    storage.close()
+    assert SqliteStorage(str(tmp_path / "index.db")).load() == {"m2": {"keywords": ["q3"]}}
+
+
+def test_yaml_journal(tmp_path):
+    """Changes are appended to a journal, which is replayed on load and merged on compaction."""
+    import shutil
+    from knowviz.index import KeywordIndex
+
+    fname = tmp_path / "quantities.yml"
+    shutil.copy("data/metadata/quantities.yml", str(fname))
+    original = fname.read_text()
+
+    quantities = KeywordIndex(str(fname))
+    quantities["q_3"] = "q3"
+    del quantities["q_1"]
+    quantities.save_to_file()
+    journal = tmp_path / "quantities.yml.journal"
+    assert fname.read_text() == original
+    assert len(journal.read_text().splitlines()) == 3
+
+    # interrupted save
+    with open(str(journal), "a") as file:
+        file.write('{"set": "q_2", "val')
+    loaded = KeywordIndex(str(fname))
+    assert loaded == quantities
+
+    loaded["q_4"] = "q3"
+    loaded.save_to_file()
+    assert not journal.exists()
+    assert KeywordIndex(str(fname)) == loaded
+
+    # journal of an older version of the YAML file is ignored
+    loaded["q_5"] = "q3"
+    loaded.save_to_file()
+    stale = journal.read_text()
+    loaded.compact()
+    journal.write_text(stale.replace("q_5", "q_6"))
+    assert "q_6" not in KeywordIndex(str(fname))
+
+
+def test_parsed_copy(tmp_path, monkeypatch):
+    """Parsed YAML files are loaded from a JSON copy as long as they are unchanged."""
+    import shutil
+    from knowviz import storage
+    from knowviz.index import KeywordIndex
+
+    fname = tmp_path / "quantities.yml"
+    shutil.copy("data/metadata/quantities.yml", str(fname))
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(storage, "PARSED_CACHE_DIR", str(cache_dir))
+
+    quantities = KeywordIndex(str(fname))
+    copy, = cache_dir.iterdir()
+    monkeypatch.setattr(storage, "read_yaml_file", lambda fname: pytest.fail("YAML file parsed again"))
+    assert KeywordIndex(str(fname)) == quantities
+
+    # changes in the journal are replayed on top of the copy, a new YAML file replaces the copy
+    monkeypatch.undo()
+    monkeypatch.setattr(storage, "PARSED_CACHE_DIR", str(cache_dir))
+    quantities["q_3"] = "q3"
+    quantities.save_to_file()
+    assert KeywordIndex(str(fname)) == quantities
+    quantities.compact()
+    assert KeywordIndex(str(fname)) == quantities
+    assert [path.name for path in cache_dir.iterdir()] != [copy.name] and len(list(cache_dir.iterdir())) == 1
+
+
+def test_relation_index_journals(database):
+    """Terms, occurrences and near-misses of relation documents are saved through journals as well."""
+    import json
+    from knowviz.index import KeywordIndex, RelationIndex
+
+    (database / "models" / "m2.tex").write_text("q1 and Q3")
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    models.rescan_documents(overwrite_file=True)
+    files = [database / "metadata" / f"models.{name}.json" for name in ("terms", "occurrences", "near_misses")]
+    contents = [fname.read_text() for fname in files]
+
+    (database / "models" / "m2.tex").write_text("q2 and Q2")
+    models.rescan_documents(overwrite_file=True)
+    assert [fname.read_text() for fname in files] == contents
+    for fname in files:
+        records = (fname.parent / (fname.name + ".journal")).read_text().splitlines()[1:]
+        assert [json.loads(record)["set"] for record in records] == ["m2"]
+
+    loaded = RelationIndex(KeywordIndex(str(database / "metadata" / "quantities.yml")),
+                           str(database / "metadata" / "models.yml"))
+    assert loaded.terms.documents == models.terms.documents and loaded.terms.keywords == models.terms.keywords
+    assert loaded.occurrences.relations == models.occurrences.relations
+    assert loaded.near_misses.documents == models.near_misses.documents
+    assert loaded.find_relations("q2") == ["m1", "m2"] and loaded.suggest_synonyms() == models.suggest_synonyms()
+
+    loaded.compact()
+    assert not any((fname.parent / (fname.name + ".journal")).exists() for fname in files)
+    compacted = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    assert compacted.terms.documents == models.terms.documents
@@ -0,0 +1,48 @@
+"""Test the watch module."""
+
+import pytest
+
+
+def wait_for(condition, timeout=10.0):
+    import time
+
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.mark.parametrize("polling", (True, False))
+def test_watch(database, polling):
+    """Edits of models and keywords are reflected in the indices without a rescan."""
+    from knowviz.index import RelationIndex, KeywordIndex
+    from knowviz.watch import Watcher
+
+    quantities = KeywordIndex(str(database / "metadata" / "quantities.yml"))
+    models = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    models.rescan_documents(overwrite_file=True)
+
+    updates = []
+    watcher = Watcher(models, polling=polling, poll_interval=0.05, callback=updates.append)
+    watcher.start()
+    try:
+        (database / "models" / "m2.tex").write_text("q3 and q_1")
+        assert wait_for(lambda: "m2" in models)
+        assert models["m2"]["keywords"] == ("q1", "q3")
+
+        # incomplete documents do not stop the watcher
+        (database / "models" / "m3.tex").write_text("no keyword yet")
+        (database / "quantities" / "category" / "q3.yml").write_text("synonyms: [keyword]\n")
+        assert wait_for(lambda: "m3" in models)
+        assert models["m3"]["keywords"] == ("q3",)
+
+        (database / "models" / "m2.tex").unlink()
+        assert wait_for(lambda: "m2" not in models)
+    finally:
+        watcher.stop()
+
+    assert updates
+    saved = RelationIndex(quantities, str(database / "metadata" / "models.yml"))
+    assert "m2" not in saved and saved["m3"]["keywords"] == ["q3"]
@@ -16,3 +16,7 @@ if __name__ == "__main__":
         print("Models index has been updated.")
     else:
         print("Nothing has changed.")
+
+    # rescans only append changes to the journals of the index files, the snapshots in the repository are complete
+    quantities.compact()
+    models.compact()